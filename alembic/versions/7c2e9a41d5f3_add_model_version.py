@@ -0,0 +1,29 @@
+"""Add model version to transactions
+
+Revision ID: 7c2e9a41d5f3
+Revises: 55841ff1b300
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2e9a41d5f3"
+down_revision: Union[str, Sequence[str], None] = "55841ff1b300"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("transactions", sa.Column("model_version", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("transactions", "model_version")
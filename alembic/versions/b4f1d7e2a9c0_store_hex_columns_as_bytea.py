@@ -0,0 +1,101 @@
+"""Store hex columns as bytea and index the input selector
+
+Revision ID: b4f1d7e2a9c0
+Revises: 7c2e9a41d5f3
+Create Date: 2026-10-19 18:02:13.402117
+
+"""
+
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b4f1d7e2a9c0"
+down_revision: Union[str, Sequence[str], None] = "7c2e9a41d5f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HEX_COLUMNS = ("tx_hash", "from_address", "to_address")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in HEX_COLUMNS:
+        op.alter_column(
+            "transactions",
+            column,
+            type_=sa.LargeBinary(),
+            postgresql_using=f"decode(substr({column}, 3), 'hex')",
+        )
+    # Same layout as src.db.types.InputData, existing rows are left uncompressed:
+    # marker 0 and the decoded bytes for hex, marker 2 and the text otherwise
+    op.alter_column(
+        "transactions",
+        "input_data",
+        type_=sa.LargeBinary(),
+        postgresql_using=(
+            "CASE WHEN input_data ~ '^0[xX]([0-9a-fA-F]{2})*$' "
+            "THEN '\\x00'::bytea || decode(substr(input_data, 3), 'hex') "
+            "ELSE '\\x02'::bytea || convert_to(input_data, 'UTF8') END"
+        ),
+    )
+    op.add_column(
+        "transactions", sa.Column("input_selector", sa.LargeBinary(), nullable=True)
+    )
+    op.execute(
+        "UPDATE transactions SET input_selector = substring(input_data FROM 2 FOR 4) "
+        "WHERE get_byte(input_data, 0) = 0 AND length(input_data) >= 5"
+    )
+    op.create_index(
+        op.f("ix_transactions_input_selector"),
+        "transactions",
+        ["input_selector"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_transactions_tx_hash"), "transactions", ["tx_hash"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_transactions_tx_hash"), table_name="transactions")
+    op.drop_index(op.f("ix_transactions_input_selector"), table_name="transactions")
+    op.drop_column("transactions", "input_selector")
+
+    # zlib is not available in SQL, compressed rows are inflated here first
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.text(
+            "SELECT id, input_data FROM transactions "
+            "WHERE get_byte(input_data, 0) & 1 = 1"
+        )
+    ).all()
+    for row in rows:
+        data = bytes(row.input_data)
+        connection.execute(
+            sa.text("UPDATE transactions SET input_data = :data WHERE id = :id"),
+            {"data": bytes((data[0] & ~1,)) + zlib.decompress(data[1:]), "id": row.id},
+        )
+
+    op.alter_column(
+        "transactions",
+        "input_data",
+        type_=sa.Text(),
+        postgresql_using=(
+            "CASE WHEN get_byte(input_data, 0) = 2 "
+            "THEN convert_from(substring(input_data FROM 2), 'UTF8') "
+            "ELSE '0x' || encode(substring(input_data FROM 2), 'hex') END"
+        ),
+    )
+    for column in HEX_COLUMNS:
+        op.alter_column(
+            "transactions",
+            column,
+            type_=sa.Text(),
+            postgresql_using=f"'0x' || encode({column}, 'hex')",
+        )
@@ -0,0 +1,40 @@
+"""Add stream offsets
+
+Revision ID: d8a3c5f1e7b2
+Revises: b4f1d7e2a9c0
+Create Date: 2026-10-19 21:34:52.118406
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d8a3c5f1e7b2"
+down_revision: Union[str, Sequence[str], None] = "b4f1d7e2a9c0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "stream_offsets",
+        sa.Column("name", sa.Text(), nullable=False),
+        sa.Column("offset", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("timezone('utc', now())"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("stream_offsets")
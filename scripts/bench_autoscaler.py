@@ -0,0 +1,171 @@
+"""
+Drain time of a large backlog with a fixed worker count and with the autoscaler.
+
+The throughput of one worker is measured first with the real WorkerConsumer on
+the in-process broker (dummy classifier with the configured CALCULATION_TIME_*
+and executor threads, prefetch WORKER_PREFETCH_COUNT), and its cold start by
+spawning `python -c "import src.worker.main"`. Both feed a simulation of
+`--messages` published at `--publish-rate` per second, as scripts/load_test.py
+does, and drained by either `--static` workers (the docker compose replicas) or
+the workers decided by the real ScalingPolicy polled every
+AUTOSCALER_POLL_INTERVAL_S with the AUTOSCALER_* settings. A new worker only
+consumes once it has started. The report shows the time from the first publish
+until the queue is empty, the peak workers and the worker-seconds spent.
+
+Usage:
+    uv run python -m scripts.bench_autoscaler [--messages 100000]
+        [--publish-rate 2000] [--static 2] [--calibrate-s 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from src.autoscaler.policy import ScalingPolicy
+from src.config.config import settings
+from src.pubsub.inprocess import InProcessBroker
+from src.pubsub.pubsub import QueueName, publish_transaction
+from src.schemas.transaction import TransactionInput
+from src.worker.main import WorkerConsumer
+
+# Simulation step in seconds
+STEP_S = 0.05
+
+
+def transaction() -> TransactionInput:
+    return TransactionInput(
+        tx_hash="0x" + os.urandom(32).hex(),
+        from_address="0x" + os.urandom(20).hex(),
+        to_address="0x" + os.urandom(20).hex(),
+        value_eth=1.0,
+        gas_price_gwei=10,
+        input_data="0x",
+        timestamp=int(time.time()),
+    )
+
+
+async def measure_worker_rate(duration_s: float) -> float:
+    """Messages per second drained by one worker from a full queue."""
+    settings.watchlist_file = ""
+    messages = 20_000
+    broker = InProcessBroker(messages)
+    channel = broker.channel()
+    queue = await channel.declare_queue(name=QueueName.TRANSACTION, durable=True)
+    for _ in range(messages):
+        await publish_transaction(broker, transaction())
+
+    worker_channel = broker.channel()
+    await worker_channel.set_qos(prefetch_count=settings.worker_prefetch_count)
+    consumer = WorkerConsumer(worker_channel, persist=False)
+    await consumer.start()
+    # Skip the ramp-up of the executor threads
+    await asyncio.sleep(1.0)
+    start_count = queue.declaration_result.message_count
+    await asyncio.sleep(duration_s)
+    drained = start_count - queue.declaration_result.message_count
+    await consumer.stop()
+    await broker.close()
+    return drained / duration_s
+
+
+def measure_startup_s(runs: int = 3) -> float:
+    """Median time to spawn a worker process and import it."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import src.worker.main"], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def make_policy() -> ScalingPolicy:
+    return ScalingPolicy(
+        min_workers=settings.autoscaler_min_workers,
+        max_workers=settings.autoscaler_max_workers,
+        target_backlog_per_worker=settings.autoscaler_target_backlog_per_worker,
+        scale_down_backlog_per_worker=settings.autoscaler_scale_down_backlog_per_worker,
+        scale_down_polls=settings.autoscaler_scale_down_polls,
+        cooldown_s=settings.autoscaler_cooldown_s,
+    )
+
+
+def simulate(
+    args: argparse.Namespace,
+    worker_rate: float,
+    startup_s: float,
+    policy: ScalingPolicy | None,
+) -> dict:
+    # Time at which every worker starts consuming
+    workers = [0.0] * (settings.autoscaler_min_workers if policy else args.static)
+    now = backlog = published = worker_seconds = 0.0
+    next_poll = 0.0
+    peak = len(workers)
+    while published < args.messages or backlog >= 1:
+        if now > args.max_s:
+            break
+        if published < args.messages:
+            batch = min(args.publish_rate * STEP_S, args.messages - published)
+            published += batch
+            backlog += batch
+        ready = sum(1 for ready_at in workers if ready_at <= now)
+        backlog = max(backlog - ready * worker_rate * STEP_S, 0.0)
+
+        if policy is not None and now >= next_poll:
+            desired = policy.decide(int(backlog), ready, len(workers), now)
+            while len(workers) < desired:
+                workers.append(now + startup_s)
+            # Retired workers drain what they prefetched, negligible here
+            del workers[desired:]
+            next_poll += settings.autoscaler_poll_interval_s
+        peak = max(peak, len(workers))
+        worker_seconds += len(workers) * STEP_S
+        now += STEP_S
+    return {"drain_s": now, "peak": peak, "worker_s": worker_seconds}
+
+
+async def main(args: argparse.Namespace):
+    settings.use_dummy = True
+    worker_rate = args.worker_rate or await measure_worker_rate(args.calibrate_s)
+    startup_s = args.startup_s or measure_startup_s()
+    print(
+        f"{args.messages} messages published at {args.publish_rate:.0f}/s, "
+        f"one worker drains {worker_rate:.0f}/s and starts in {startup_s:.2f} s"
+    )
+    print(
+        f"Autoscaler {settings.autoscaler_min_workers}-"
+        f"{settings.autoscaler_max_workers} workers, target "
+        f"{settings.autoscaler_target_backlog_per_worker} per worker, poll "
+        f"{settings.autoscaler_poll_interval_s:.0f} s, cooldown "
+        f"{settings.autoscaler_cooldown_s:.0f} s"
+    )
+    print(f"{'MODE':<14} {'DRAIN (s)':>10} {'PEAK WORKERS':>13} {'WORKER-S':>9}")
+    runs = {
+        f"static x{args.static}": None,
+        "autoscaler": make_policy(),
+    }
+    for name, policy in runs.items():
+        result = simulate(args, worker_rate, startup_s, policy)
+        print(
+            f"{name:<14} {result['drain_s']:>10.0f} {result['peak']:>13} "
+            f"{result['worker_s']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backlog drain time by scaling")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--publish-rate", type=float, default=2_000.0)
+    parser.add_argument("--static", type=int, default=2, help="Fixed workers")
+    parser.add_argument("--calibrate-s", type=float, default=5.0)
+    parser.add_argument(
+        "--worker-rate", type=float, default=0.0, help="Skip the measurement"
+    )
+    parser.add_argument(
+        "--startup-s", type=float, default=0.0, help="Skip the measurement"
+    )
+    parser.add_argument("--max-s", type=float, default=3_600.0)
+    asyncio.run(main(parser.parse_args()))
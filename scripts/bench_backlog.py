@@ -0,0 +1,169 @@
+"""
+Backlog recovery of the worker with and without the staleness handling.
+
+For every mode an in-process broker (no container needed) is preloaded with a
+backlog of transactions already `--backlog-age` seconds old, then fresh ones
+are published at `--rate` per second, below the worker capacity, for
+`--duration` seconds. The report shows how long until fresh transactions are
+scored within a second of being published again (recovery), their latency and
+what happened to the backlog. The classifier is the dummy one sleeping
+`--inference-ms` on `--workers` executor threads.
+
+Usage:
+    uv run python -m scripts.bench_backlog [--backlog 3000] [--rate 200]
+        [--duration 20] [--workers 4] [--inference-ms 10] [--prefetch 256]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from src.config.config import settings
+from src.pubsub.inprocess import InProcessBroker
+from src.pubsub.pubsub import (
+    QueueName,
+    declare_results_exchange,
+    publish_transaction,
+)
+from src.schemas.transaction import ClassifiedTransaction, TransactionInput
+from src.worker.main import WorkerConsumer
+
+# Fresh transactions scored within this many seconds count as recovered
+RECOVERED_LATENCY_S = 1.0
+
+
+def transaction(timestamp: int) -> TransactionInput:
+    return TransactionInput(
+        tx_hash="0x" + os.urandom(32).hex(),
+        from_address="0x" + os.urandom(20).hex(),
+        to_address="0x" + os.urandom(20).hex(),
+        value_eth=1.0,
+        gas_price_gwei=10,
+        input_data="0x",
+        timestamp=timestamp,
+    )
+
+
+def recovery_s(fresh: list[tuple[float, float | None]], duration: float) -> float:
+    """Publish offset of the first fresh transaction after which all were on time."""
+    recovered = duration
+    for published, latency in reversed(fresh):
+        if latency is None or latency >= RECOVERED_LATENCY_S:
+            break
+        recovered = published
+    return recovered
+
+
+async def run_mode(args: argparse.Namespace, scheduling: str, stale_after_s: float):
+    settings.worker_scheduling = scheduling
+    settings.stale_after_s = stale_after_s
+    broker = InProcessBroker(args.backlog + int(args.rate * args.duration) + 1)
+    published: dict[str, float] = {}
+    scored: dict[str, float] = {}
+
+    async def on_result(message) -> None:
+        scored[ClassifiedTransaction.model_validate_json(message.body).tx_hash] = (
+            time.monotonic()
+        )
+        await message.ack()
+
+    channel = broker.channel()
+    results = await channel.declare_queue(exclusive=True)
+    await results.bind(await declare_results_exchange(channel), "#")
+    await results.consume(on_result)
+
+    # Declared before the worker starts, so the backlog is not dropped unrouted
+    await channel.declare_queue(name=QueueName.TRANSACTION, durable=True)
+    old = int(time.time()) - args.backlog_age
+    backlog = set()
+    for _ in range(args.backlog):
+        tx = transaction(old)
+        backlog.add(tx.tx_hash)
+        await publish_transaction(broker, tx)
+
+    worker_channel = broker.channel()
+    await worker_channel.set_qos(prefetch_count=args.prefetch)
+    consumer = WorkerConsumer(worker_channel, persist=False)
+    await consumer.start()
+
+    start = time.monotonic()
+    sent = 0
+    while (elapsed := time.monotonic() - start) < args.duration:
+        for _ in range(int(elapsed * args.rate) - sent):
+            tx = transaction(int(time.time()))
+            published[tx.tx_hash] = time.monotonic()
+            await publish_transaction(broker, tx)
+            sent += 1
+        await asyncio.sleep(0.01)
+
+    # Let the fresh transactions still queued finish, the backlog may be left
+    deadline = time.monotonic() + args.drain_timeout
+    while time.monotonic() < deadline and not published.keys() <= scored.keys():
+        await asyncio.sleep(0.1)
+    await consumer.stop()
+    await broker.close()
+
+    fresh = [
+        (sent_at - start, scored[tx_hash] - sent_at if tx_hash in scored else None)
+        for tx_hash, sent_at in published.items()
+    ]
+    latencies = sorted(latency for _, latency in fresh if latency is not None)
+    return {
+        "recovery_s": recovery_s(fresh, args.duration),
+        "p50_ms": statistics.median(latencies) * 1_000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1_000
+        if latencies
+        else float("nan"),
+        "backlog_scored": len(backlog & scored.keys()),
+        "fresh_missing": len(published.keys() - scored.keys()),
+    }
+
+
+async def main(args: argparse.Namespace):
+    settings.use_dummy = True
+    settings.calculation_time_min_ms = args.inference_ms
+    settings.calculation_time_max_ms = args.inference_ms
+    settings.inference_max_workers = args.workers
+    settings.inference_timeout_s = 0.0
+    settings.stale_policy = "skip"
+    settings.watchlist_file = ""
+
+    modes = {
+        "fifo": ("fifo", 0.0),
+        "fifo + skip": ("fifo", args.stale_after),
+        "lifo": ("lifo", 0.0),
+        "lifo + skip": ("lifo", args.stale_after),
+    }
+    capacity = args.workers * 1_000 / args.inference_ms
+    print(
+        f"Backlog {args.backlog} tx aged {args.backlog_age} s, fresh at "
+        f"{args.rate:.0f}/s for {args.duration:.0f} s, capacity ~{capacity:.0f}/s, "
+        f"stale after {args.stale_after:.0f} s"
+    )
+    print(
+        f"{'MODE':<12} {'RECOVERY (s)':>12} {'P50 (ms)':>9} {'P99 (ms)':>9} "
+        f"{'BACKLOG SCORED':>15} {'FRESH MISSING':>14}"
+    )
+    for name, (scheduling, stale_after_s) in modes.items():
+        result = await run_mode(args, scheduling, stale_after_s)
+        print(
+            f"{name:<12} {result['recovery_s']:>12.1f} {result['p50_ms']:>9.0f} "
+            f"{result['p99_ms']:>9.0f} {result['backlog_scored']:>15} "
+            f"{result['fresh_missing']:>14}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backlog recovery by worker mode")
+    parser.add_argument("--backlog", type=int, default=3_000)
+    parser.add_argument("--backlog-age", type=int, default=120)
+    parser.add_argument("--stale-after", type=float, default=60.0)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--inference-ms", type=int, default=10)
+    parser.add_argument("--prefetch", type=int, default=256)
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,123 @@
+"""
+Export throughput of the transactions table as NDJSON and Parquet.
+
+Generated transactions (the mix of scripts/bench_storage.py) are copied into a
+scratch `transactions` table in the schema `bench_export` of the configured
+Postgres, and exported with `src.db.export.export_chunks` through a
+schema_translate_map. The first line reads the batches without encoding them,
+the cost of the server-side cursor and the column types; the others add the
+NDJSON or Parquet encoding. Parquet is skipped without pyarrow.
+
+Usage:
+    uv run python -m scripts.bench_export [--rows 500000] [--batch-size 10000]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from scripts.bench_storage import bytea_row, generate_transaction
+from src.config.config import settings
+from src.db import export
+from src.db.models import Transaction
+
+SCHEMA = "bench_export"
+PRIORITIES = ("LOW", "MEDIUM", "HIGH")
+
+
+def transaction_row() -> tuple:
+    risk = random.random()
+    return (
+        *bytea_row(generate_transaction()),
+        risk,
+        PRIORITIES[min(int(risk * 3), 2)],
+        random.randint(1, 50),
+        "dummy",
+    )
+
+
+async def fill_table(rows: int) -> None:
+    conn = await asyncpg.connect(settings.db_url.replace("+asyncpg", ""))
+    try:
+        await conn.copy_records_to_table(
+            "transactions",
+            schema_name=SCHEMA,
+            columns=[*export.COLUMNS[:-1]],
+            records=(transaction_row() for _ in range(rows)),
+        )
+        await conn.execute(f"VACUUM ANALYZE {SCHEMA}.transactions")
+    finally:
+        await conn.close()
+
+
+async def read_only(engine: AsyncEngine, batch_size: int) -> None:
+    batches = export.stream_batches(engine, export.ExportFilter(), batch_size)
+    async for _ in batches:
+        pass
+
+
+async def encoded(engine: AsyncEngine, format: str, batch_size: int) -> int:
+    """Size in bytes of the export."""
+    size = 0
+    chunks = export.export_chunks(engine, export.ExportFilter(), format, batch_size)
+    async for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+async def main(args: argparse.Namespace):
+    random.seed(0)
+    engine = create_async_engine(settings.db_url).execution_options(
+        schema_translate_map={None: SCHEMA}
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            await conn.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+            await conn.run_sync(Transaction.__table__.create)
+        start = time.perf_counter()
+        await fill_table(args.rows)
+        print(
+            f"{args.rows} transactions copied in {time.perf_counter() - start:.1f} s, "
+            f"batches of {args.batch_size}"
+        )
+
+        runs = {"read only": lambda: read_only(engine, args.batch_size)}
+        for format in export.FORMATS:
+            try:
+                if format == "parquet":
+                    export.require_pyarrow()
+            except export.ExportFormatError:
+                print(f"{format}: skipped, pyarrow is not installed")
+                continue
+            runs[format] = lambda format=format: encoded(
+                engine, format, args.batch_size
+            )
+
+        print(f"{'EXPORT':<10} {'ROWS/S':>10} {'MB/S':>8} {'SIZE (MB)':>10}")
+        for name, run in runs.items():
+            start = time.perf_counter()
+            size = await run()
+            elapsed = time.perf_counter() - start
+            if size is None:
+                print(f"{name:<10} {args.rows / elapsed:>10.0f} {'-':>8} {'-':>10}")
+                continue
+            print(
+                f"{name:<10} {args.rows / elapsed:>10.0f} "
+                f"{size / 2**20 / elapsed:>8.1f} {size / 2**20:>10.1f}"
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the export throughput")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=settings.export_batch_size)
+    asyncio.run(main(parser.parse_args()))
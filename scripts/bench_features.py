@@ -0,0 +1,58 @@
+"""
+Benchmark of the per-sender rolling aggregates (`AddressFeatureStore.observe`).
+
+Transactions from a pool of senders are replayed with increasing timestamps, the
+cost per message (update + read of every window) is reported as the best of
+several runs.
+
+Usage:
+    uv run python -m scripts.bench_features [--messages 100000] [--senders 10000]
+"""
+
+import argparse
+import os
+import random
+import time
+
+from src.oracle.features import AddressFeatureStore
+from src.oracle.registry import synthetic_transaction
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AddressFeatureStore")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--senders", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--memory-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    store = AddressFeatureStore(max_bytes=args.memory_mb * 1024 * 1024)
+    senders = ["0x" + os.urandom(20).hex() for _ in range(args.senders)]
+    base = synthetic_transaction()
+    # ~100 messages per second of event time
+    transactions = [
+        base.model_copy(
+            update={
+                "from_address": random.choice(senders),
+                "timestamp": base.timestamp + i // 100,
+            }
+        )
+        for i in range(args.messages)
+    ]
+
+    best = float("inf")
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        for transaction in transactions:
+            store.observe(transaction)
+        best = min(best, time.perf_counter() - start)
+
+    print(f"Windows: {store.windows_s} s, {store.buckets} buckets each")
+    print(f"Slots: {store.capacity} ({args.memory_mb} MB), senders seen: {len(store)}")
+    print(
+        f"observe(): {best / args.messages * 1e6:.2f} µs/message (best of {args.runs})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark of the ingest path of `POST /transactions/`.
+
+Compares the previous handler (FastAPI body parsing + `model_dump_json` on publish +
+`TransactionResponse` instantiation) with the current single-pass handler. The ASGI
+apps are driven directly with a no-op broker, so the numbers only include the API cost.
+
+Usage:
+    uv run python -m scripts.bench_ingest [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from aio_pika.pool import Pool
+
+from src.api.dependencies import get_channel_pool
+from src.api.routes import transactions
+from src.pubsub.pubsub import publish_transaction
+from src.schemas.transaction import TransactionInput, TransactionResponse
+
+
+class NullExchange:
+    async def publish(self, message, routing_key, **kwargs):
+        return None
+
+
+class NullChannel:
+    default_exchange = NullExchange()
+
+
+class NullChannelPool:
+    @asynccontextmanager
+    async def acquire(self):
+        yield NullChannel()
+
+
+legacy_router = APIRouter()
+
+
+@legacy_router.post("/", status_code=202, response_model=TransactionResponse)
+async def legacy_process_transaction(
+    tx_input: TransactionInput, channel_pool: Pool = Depends(get_channel_pool)
+):
+    msg, success = await publish_transaction(channel_pool, tx_input)
+    if not success:
+        raise HTTPException(status_code=503, detail=msg)
+    return TransactionResponse(tx_hash=tx_input.tx_hash)
+
+
+def build_app(router: APIRouter) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router, prefix="/transactions")
+    app.dependency_overrides[get_channel_pool] = NullChannelPool
+    return app
+
+
+def build_body() -> bytes:
+    return json.dumps(
+        {
+            "tx_hash": "0x" + os.urandom(32).hex(),
+            "from_address": "0x" + os.urandom(20).hex(),
+            "to_address": "0x" + os.urandom(20).hex(),
+            "value_eth": 2.5,
+            "gas_price_gwei": 45,
+            "input_data": "0x" + os.urandom(68).hex(),
+            "timestamp": int(time.time()),
+        }
+    ).encode()
+
+
+async def call(app: FastAPI, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/transactions/",
+        "raw_path": b"/transactions/",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 5000),
+        "server": ("127.0.0.1", 8000),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app: FastAPI, bodies: list[bytes]) -> float:
+    # Warm-up, so route compilation and first-call caches are not measured
+    for body in bodies[:500]:
+        assert await call(app, body) == 202
+
+    start = time.perf_counter()
+    for body in bodies:
+        await call(app, body)
+    return (time.perf_counter() - start) / len(bodies) * 1_000_000
+
+
+async def run(num_requests: int):
+    bodies = [build_body() for _ in range(num_requests)]
+    legacy_us = await measure(build_app(legacy_router), bodies)
+    current_us = await measure(build_app(transactions.router), bodies)
+
+    print("=" * 50)
+    print("INGEST PATH (µs/request)")
+    print("=" * 50)
+    print(f"Previous process_transaction:    {legacy_us:.1f}")
+    print(f"Single-pass process_transaction: {current_us:.1f}")
+    print(f"Saved:                           {legacy_us - current_us:.1f}")
+    print(f"Speed-up:                        {legacy_us / current_us:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest endpoint")
+    parser.add_argument(
+        "--requests", type=int, default=20_000, help="Requests per variant"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Throughput of the API runner (`src.api.server`) by number of processes.
+
+For every process count the runner is started on a free port and the load
+generator of `scripts.load_test` sends the same number of requests from several
+client processes, so the client is not the bottleneck. Against the compose stack
+(RabbitMQ reachable through the .env settings) only the API scales; with
+--embedded every API process also runs its own in-memory worker and no
+container is needed.
+
+Usage:
+    uv run python -m scripts.bench_server [--processes 1 2 4] [--requests 20000]
+        [--concurrency 64] [--clients 4] [--embedded]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from scripts.load_test import Stats, send_request
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout_s: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            # Any answer means the lifespan finished, 503 only flags a dependency
+            httpx.get(f"{url}/healthz", timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise TimeoutError(f"API at {url} did not start in {timeout_s:.0f} s")
+
+
+async def generate_load(url: str, requests: int, concurrency: int) -> Stats:
+    stats = Stats()
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        await asyncio.gather(
+            *(send_request(client, url, stats, semaphore) for _ in range(requests))
+        )
+    return stats
+
+
+def run_client(url: str, requests: int, concurrency: int) -> tuple[int, int]:
+    stats = asyncio.run(generate_load(url, requests, concurrency))
+    return stats.success, stats.failed
+
+
+def bench(processes: int, args: argparse.Namespace) -> tuple[float, int]:
+    """Returns the requests per second and the failed requests."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    if args.embedded:
+        env.update(PIPELINE_MODE="embedded", EMBEDDED_PERSIST="0")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "src.api.server",
+            "--workers",
+            str(processes),
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url)
+        # Warm up every process (connections, pools, first request paths)
+        run_client(url, 100 * processes, args.concurrency)
+
+        per_client = args.requests // args.clients
+        concurrency = max(args.concurrency // args.clients, 1)
+        with ProcessPoolExecutor(args.clients) as pool:
+            start = time.perf_counter()
+            results = list(
+                pool.map(
+                    run_client,
+                    [url] * args.clients,
+                    [per_client] * args.clients,
+                    [concurrency] * args.clients,
+                )
+            )
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    success = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    return success / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API runner")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="API process counts to compare",
+    )
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--clients", type=int, default=4, help="Load generator processes"
+    )
+    parser.add_argument(
+        "--embedded",
+        action="store_true",
+        help="Run every API process with the in-memory broker, no containers",
+    )
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.requests} requests per run")
+    print(f"{'PROCESSES':>9}  {'REQ/S':>10}  {'SPEEDUP':>7}  {'FAILED':>6}")
+    baseline = None
+    for processes in args.processes:
+        rate, failed = bench(processes, args)
+        baseline = baseline or rate
+        print(f"{processes:>9}  {rate:>10.0f}  {rate / baseline:>6.2f}x  {failed:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Cold-start report of the API and worker processes based on `python -X importtime`.
+
+Each entry point is imported in a fresh interpreter several times, the median
+import time is reported together with the slowest top-level imports.
+
+Usage:
+    uv run python -m scripts.bench_startup [--runs 5] [--top 15]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = {
+    "worker": "src.worker.main",
+    "api": "src.api.main",
+}
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """Returns (module, self_us, cumulative_us) for every import done by `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        # The name column is indented two spaces per nesting level
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(label: str, module: str, runs: int, top: int) -> None:
+    totals = []
+    rows = []
+    for _ in range(runs):
+        rows = import_times(module)
+        totals.append(next(r[2] for r in rows if r[0] == module))
+
+    print("=" * 60)
+    print(f"{label.upper()} ({module})")
+    print("=" * 60)
+    print(f"Import time (median of {runs}): {statistics.median(totals) / 1_000:.1f} ms")
+    print()
+    print("Slowest direct imports (last run, cumulative ms):")
+    top_level = [r for r in rows if r[0].startswith("  ") and r[0][2] != " "]
+    for name, _, cumulative_us in sorted(top_level, key=lambda r: -r[2])[:top]:
+        print(f"  {cumulative_us / 1_000:>8.1f}  {name.strip()}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report process cold-start cost")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per entry point")
+    parser.add_argument("--top", type=int, default=15, help="Imports to list")
+    args = parser.parse_args()
+
+    for label, module in ENTRY_POINTS.items():
+        report(label, module, args.runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
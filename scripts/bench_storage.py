@@ -0,0 +1,172 @@
+"""
+Storage report of the transactions table: hex text columns against bytea.
+
+The same generated transactions (plain transfers and contract calls with ABI
+encoded arguments of up to a few KB) are inserted into two scratch tables in the
+configured Postgres, one with the previous text layout and one with the current
+bytea layout of `src.db.models.Transaction`, and the table size (heap and TOAST),
+index size and insert throughput of both are reported. The bytea timings include
+the hex conversion and compression done in Python.
+
+Usage:
+    uv run python -m scripts.bench_storage [--rows 100000] [--batch 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import asyncpg
+
+from src.config.config import settings
+from src.db.types import encode_input_data, hex_to_bytes, input_selector
+
+SCHEMA = "bench_storage"
+
+LAYOUTS = {
+    "text": """
+        CREATE TABLE {table} (
+            id SERIAL PRIMARY KEY,
+            tx_hash TEXT NOT NULL,
+            from_address TEXT NOT NULL,
+            to_address TEXT NOT NULL,
+            value_eth FLOAT NOT NULL,
+            gas_price_gwei INTEGER NOT NULL,
+            input_data TEXT NOT NULL,
+            tx_timestamp INTEGER NOT NULL
+        );
+        CREATE INDEX ON {table} (tx_hash);
+    """,
+    "bytea": """
+        CREATE TABLE {table} (
+            id SERIAL PRIMARY KEY,
+            tx_hash BYTEA NOT NULL,
+            from_address BYTEA NOT NULL,
+            to_address BYTEA NOT NULL,
+            value_eth FLOAT NOT NULL,
+            gas_price_gwei INTEGER NOT NULL,
+            input_data BYTEA NOT NULL,
+            input_selector BYTEA,
+            tx_timestamp INTEGER NOT NULL
+        );
+        CREATE INDEX ON {table} (tx_hash);
+        CREATE INDEX ON {table} (input_selector);
+    """,
+}
+
+SELECTORS = ["a9059cbb", "095ea7b3", "23b872dd", "7ff36ab5", "38ed1739"]
+
+
+def abi_word() -> str:
+    # Arguments are 32-byte words: addresses and amounts are left padded with zeros
+    if random.random() < 0.5:
+        return "00" * 12 + os.urandom(20).hex()
+    return f"{random.randint(0, 10**24):064x}"
+
+
+def generate_transaction() -> tuple:
+    if random.random() < 0.4:
+        input_data = "0x"
+    else:
+        words = random.choice([2, 3, 8, 40, 120])
+        input_data = "0x" + random.choice(SELECTORS)
+        input_data += "".join(abi_word() for _ in range(words))
+    return (
+        "0x" + os.urandom(32).hex(),
+        "0x" + os.urandom(20).hex(),
+        "0x" + os.urandom(20).hex(),
+        round(random.uniform(0, 100), 4),
+        random.randint(1, 500),
+        input_data,
+        int(time.time()),
+    )
+
+
+def text_row(tx: tuple) -> tuple:
+    return tx
+
+
+def bytea_row(tx: tuple) -> tuple:
+    tx_hash, from_address, to_address, value, gas, input_data, timestamp = tx
+    selector = input_selector(input_data)
+    return (
+        hex_to_bytes(tx_hash),
+        hex_to_bytes(from_address),
+        hex_to_bytes(to_address),
+        value,
+        gas,
+        encode_input_data(input_data),
+        hex_to_bytes(selector) if selector else None,
+        timestamp,
+    )
+
+
+async def bench(
+    conn: asyncpg.Connection, layout: str, transactions: list[tuple], batch: int
+) -> dict:
+    table = f"{SCHEMA}.transactions_{layout}"
+    await conn.execute(LAYOUTS[layout].format(table=table))
+    to_row = bytea_row if layout == "bytea" else text_row
+    columns = 8 if layout == "bytea" else 7
+    placeholders = ", ".join(f"${i + 1}" for i in range(columns))
+    names = (
+        "tx_hash, from_address, to_address, value_eth, gas_price_gwei, input_data, "
+        + ("input_selector, " if layout == "bytea" else "")
+        + "tx_timestamp"
+    )
+    query = f"INSERT INTO {table} ({names}) VALUES ({placeholders})"
+
+    start = time.perf_counter()
+    for i in range(0, len(transactions), batch):
+        rows = [to_row(tx) for tx in transactions[i : i + batch]]
+        await conn.executemany(query, rows)
+    elapsed = time.perf_counter() - start
+
+    await conn.execute(f"VACUUM ANALYZE {table}")
+    table_size, index_size = await conn.fetchrow(
+        "SELECT pg_table_size($1::regclass), pg_indexes_size($1::regclass)", table
+    )
+    return {
+        "table": table_size,
+        "indexes": index_size,
+        "rows_per_s": len(transactions) / elapsed,
+    }
+
+
+async def main(rows: int, batch: int):
+    random.seed(0)
+    transactions = [generate_transaction() for _ in range(rows)]
+    conn = await asyncpg.connect(settings.db_url.replace("+asyncpg", ""))
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        results = {
+            layout: await bench(conn, layout, transactions, batch) for layout in LAYOUTS
+        }
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+    before, after = results["text"], results["bytea"]
+    print(f"{rows} transactions, batches of {batch}")
+    print(f"{'':<16} {'TEXT':>12} {'BYTEA':>12} {'CHANGE':>8}")
+    for key, label in (("table", "Table (MB)"), ("indexes", "Indexes (MB)")):
+        print(
+            f"{label:<16} {before[key] / 2**20:>12.1f} {after[key] / 2**20:>12.1f} "
+            f"{after[key] / before[key] - 1:>+7.0%}"
+        )
+    print(
+        f"{'Inserts/s':<16} {before['rows_per_s']:>12.0f} "
+        f"{after['rows_per_s']:>12.0f} "
+        f"{after['rows_per_s'] / before['rows_per_s'] - 1:>+7.0%}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the table storage layouts")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch))
@@ -0,0 +1,128 @@
+"""
+Sustained ingest throughput of the transaction queue: classic queue against stream.
+
+The same transactions are published as persistent messages with publisher
+confirms, `--window` unconfirmed at a time, to a scratch classic queue and a
+scratch stream in the configured RabbitMQ, then consumed back with
+`--prefetch` credit: acked one by one from the classic queue, as the worker
+does, and every `--ack-batch` messages from the stream, as StreamConsumer does.
+The scratch queues are deleted afterwards.
+
+Usage:
+    uv run python -m scripts.bench_stream [--messages 200000] [--window 500]
+        [--prefetch 1000] [--ack-batch 100]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from aio_pika import DeliveryMode, Message
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+
+from src.pubsub.pubsub import get_connection
+from src.pubsub.stream import STREAM_OFFSET, stream_queue_arguments
+from src.schemas.transaction import TransactionInput
+
+QUEUES = {
+    "classic": ("bench.transaction.classic", None),
+    "stream": ("bench.transaction.stream", stream_queue_arguments()),
+}
+
+
+def transaction_body() -> bytes:
+    return (
+        TransactionInput(
+            tx_hash="0x" + os.urandom(32).hex(),
+            from_address="0x" + os.urandom(20).hex(),
+            to_address="0x" + os.urandom(20).hex(),
+            value_eth=1.5,
+            gas_price_gwei=30,
+            input_data="0xa9059cbb" + os.urandom(64).hex(),
+            timestamp=int(time.time()),
+        )
+        .model_dump_json()
+        .encode()
+    )
+
+
+async def publish(
+    channel: AbstractChannel, queue: str, bodies: list[bytes], window: int
+) -> float:
+    exchange = channel.default_exchange
+    start = time.perf_counter()
+    for i in range(0, len(bodies), window):
+        await asyncio.gather(
+            *(
+                exchange.publish(
+                    Message(body, delivery_mode=DeliveryMode.PERSISTENT),
+                    routing_key=queue,
+                )
+                for body in bodies[i : i + window]
+            )
+        )
+    return len(bodies) / (time.perf_counter() - start)
+
+
+async def consume(
+    channel: AbstractChannel,
+    queue_name: str,
+    arguments: dict | None,
+    messages: int,
+    ack_batch: int,
+) -> float:
+    queue = await channel.declare_queue(queue_name, durable=True, arguments=arguments)
+    done = asyncio.Event()
+    received = 0
+    start = time.perf_counter()
+
+    async def on_message(message: AbstractIncomingMessage) -> None:
+        nonlocal received
+        received += 1
+        if arguments is None:
+            await message.ack()
+        elif received % ack_batch == 0 or received == messages:
+            await message.ack(multiple=True)
+        if received == messages:
+            done.set()
+
+    consume_arguments = {STREAM_OFFSET: "first"} if arguments else None
+    tag = await queue.consume(on_message, arguments=consume_arguments)
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await queue.cancel(tag)
+    return messages / elapsed
+
+
+async def main(messages: int, window: int, prefetch: int, ack_batch: int):
+    bodies = [transaction_body() for _ in range(messages)]
+    connection = await get_connection()
+    async with connection:
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=prefetch)
+        results = {}
+        for kind, (name, arguments) in QUEUES.items():
+            await channel.queue_delete(name)
+            await channel.declare_queue(name, durable=True, arguments=arguments)
+            try:
+                published = await publish(channel, name, bodies, window)
+                consumed = await consume(channel, name, arguments, messages, ack_batch)
+            finally:
+                await channel.queue_delete(name)
+            results[kind] = (published, consumed)
+
+    print(f"{messages} persistent messages of {len(bodies[0])} bytes")
+    print(f"{'':<12} {'PUBLISH/s':>10} {'CONSUME/s':>10}")
+    for kind, (published, consumed) in results.items():
+        print(f"{kind:<12} {published:>10.0f} {consumed:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classic queue against stream")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--window", type=int, default=500)
+    parser.add_argument("--prefetch", type=int, default=1_000)
+    parser.add_argument("--ack-batch", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.window, args.prefetch, args.ack_batch))
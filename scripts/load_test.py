@@ -165,10 +165,14 @@ async def get_queue_message_count() -> int:
     )
     async with connection:
         channel = await connection.channel()
-        queue = await channel.declare_queue(
-            name="transaction", durable=True, passive=True
-        )
-        return queue.declaration_result.message_count
+        count = 0
+        # With SHARD_COUNT > 0 the backlog is spread over the shard queues
+        shard_count = int(os.getenv("SHARD_COUNT", "0"))
+        names = ["transaction"] + [f"transaction.shard.{i}" for i in range(shard_count)]
+        for name in names:
+            queue = await channel.declare_queue(name=name, durable=True, passive=True)
+            count += queue.declaration_result.message_count
+        return count
 
 
 async def get_db_transaction_count() -> int:
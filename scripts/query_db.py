@@ -53,7 +53,8 @@ def get_recent_transactions(conn, limit: int):
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT tx_hash, risk_score, priority, inference_time_ms
+            SELECT '0x' || encode(tx_hash, 'hex'), risk_score, priority,
+                inference_time_ms
             FROM transactions
             ORDER BY created_at DESC
             LIMIT %s
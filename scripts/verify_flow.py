@@ -10,9 +10,16 @@
 """
 Verification script: sends 20 transactions, waits, then queries DB for high-risk matches.
 Usage: uv run scripts/verify_flow.py
+
+With --embedded the API and the worker run inside this process, with the in-memory
+broker and without a database, and the high-risk transactions are read from the
+results stream instead. No containers are needed:
+    uv run python -m scripts.verify_flow --embedded
 """
 
+import argparse
 import asyncio
+import json
 import os
 import random
 import time
@@ -43,6 +50,56 @@ def generate_transaction() -> dict:
     }
 
 
+def print_results(rows: list[dict], num_requests: int, source: str) -> None:
+    if rows:
+        print(f"{'TX HASH':<68} {'RISK':>6} {'TIME':>6}")
+        print("-" * 82)
+        for row in rows:
+            print(
+                f"{row['tx_hash']}  {row['risk_score']:>5.3f}  {row['inference_time_ms']:>4}ms"
+            )
+        print("-" * 82)
+        print(f"Found {len(rows)}/{num_requests} transactions (risk_score > 0.8)")
+    else:
+        print(f"No high-risk transactions found in {source}.")
+
+
+async def main_embedded(num_requests: int, wait_seconds: float):
+    os.environ["PIPELINE_MODE"] = "embedded"
+    os.environ.setdefault("EMBEDDED_PERSIST", "false")
+    from asgi_lifespan import LifespanManager
+    from src.api.main import app
+
+    transactions = [generate_transaction() for _ in range(num_requests)]
+    sent_hashes = {tx["tx_hash"] for tx in transactions}
+
+    print(f"Sending {num_requests} transactions to the embedded pipeline...")
+
+    async with LifespanManager(app) as manager:
+        results = app.state.result_broadcaster.subscribe()
+        transport = httpx.ASGITransport(app=manager.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://embedded", timeout=30.0
+        ) as client:
+            for tx in transactions:
+                response = await client.post("/transactions/", json=tx)
+                status = "ok" if response.status_code == 202 else "fail"
+                print(f"  {tx['tx_hash'][:18]}... -> {status}")
+
+        print(f"\nWaiting {wait_seconds} seconds for processing...")
+        await asyncio.sleep(wait_seconds)
+
+        # Read before shutting down, closing the stream discards its pending events
+        print("\nReading high-risk transactions from the results stream...\n")
+        rows = []
+        while not results.empty():
+            row = json.loads(results.get_nowait())
+            if row["tx_hash"] in sent_hashes:
+                rows.append(row)
+    rows.sort(key=lambda row: row["risk_score"], reverse=True)
+    print_results(rows, num_requests, "the results stream")
+
+
 async def main():
     num_requests = 20
     wait_seconds = 3
@@ -76,29 +133,30 @@ async def main():
     try:
         rows = await conn.fetch(
             """
-            SELECT tx_hash, risk_score, inference_time_ms
+            SELECT '0x' || encode(tx_hash, 'hex') AS tx_hash, risk_score,
+                inference_time_ms
             FROM transactions
-            WHERE tx_hash = ANY($1)
+            WHERE tx_hash = ANY($1::bytea[])
             ORDER BY risk_score DESC
             """,
-            sent_hashes,
+            [bytes.fromhex(tx_hash[2:]) for tx_hash in sent_hashes],
         )
 
-        if rows:
-            print(f"{'TX HASH':<68} {'RISK':>6} {'TIME':>6}")
-            print("-" * 82)
-            for row in rows:
-                print(
-                    f"{row['tx_hash']}  {row['risk_score']:>5.3f}  {row['inference_time_ms']:>4}ms"
-                )
-            print("-" * 82)
-            print(f"Found {len(rows)}/{num_requests} transactions (risk_score > 0.8)")
-        else:
-            print("No high-risk transactions found in database.")
+        print_results(rows, num_requests, "database")
 
     finally:
         await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--embedded",
+        action="store_true",
+        help="Run the whole flow in this process, without RabbitMQ nor Postgres",
+    )
+    args = parser.parse_args()
+    if args.embedded:
+        asyncio.run(main_embedded(num_requests=20, wait_seconds=3))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from aio_pika.abc import AbstractIncomingMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ResultBroadcaster:
+    """Fans out classification results to every subscribed client.
+
+    Each subscriber gets a bounded buffer. A subscriber whose buffer is full is
+    considered too slow and is dropped, so it never delays the rest of the clients
+    nor makes the broker consumer block.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.buffer_size = buffer_size
+        self._subscribers: set[asyncio.Queue[bytes | None]] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue[bytes | None]:
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=self.buffer_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[bytes | None]) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, data: bytes) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self._drop(queue)
+
+    def close(self) -> None:
+        for queue in list(self._subscribers):
+            self._drop(queue)
+
+    def _drop(self, queue: asyncio.Queue[bytes | None]) -> None:
+        self.unsubscribe(queue)
+        # Pending events are discarded to make room for the end of stream marker
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+        logger.info("Dropped results stream subscriber")
+
+    async def on_message(self, message: AbstractIncomingMessage) -> None:
+        self.publish(message.body)
@@ -0,0 +1,27 @@
+from .broadcast import ResultBroadcaster
+
+
+def test_publish_reaches_every_subscriber():
+    broadcaster = ResultBroadcaster(buffer_size=4)
+    first = broadcaster.subscribe()
+    second = broadcaster.subscribe()
+
+    broadcaster.publish(b"result")
+
+    assert first.get_nowait() == b"result"
+    assert second.get_nowait() == b"result"
+
+
+def test_slow_subscriber_is_dropped():
+    broadcaster = ResultBroadcaster(buffer_size=2)
+    slow = broadcaster.subscribe()
+    fast = broadcaster.subscribe()
+
+    for i in range(3):
+        broadcaster.publish(str(i).encode())
+        fast.get_nowait()
+
+    assert broadcaster.subscriber_count == 1
+    # The slow subscriber only receives the end of stream marker
+    assert slow.get_nowait() is None
+    assert slow.empty()
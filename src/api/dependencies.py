@@ -1,6 +1,57 @@
-from fastapi import Request
+import secrets
+from fastapi import Header, HTTPException, Request, status
 from aio_pika.pool import Pool
+from src.api.broadcast import ResultBroadcaster
+from src.api.ratelimit import RateLimiter, retry_after_header
+from src.pubsub.outbox import Outbox
+from src.pubsub.rpc import RpcClient
+from src.config.config import get_settings
 
 
 async def get_channel_pool(request: Request) -> Pool:
     return request.app.state.channel_pool
+
+
+async def get_result_broadcaster(request: Request) -> ResultBroadcaster:
+    return request.app.state.result_broadcaster
+
+
+async def get_outbox(request: Request) -> Outbox | None:
+    # Opt-in, apps without an outbox answer 503 when the broker is unavailable
+    return getattr(request.app.state, "outbox", None)
+
+
+async def get_rpc_client(request: Request) -> RpcClient:
+    return request.app.state.rpc_client
+
+
+async def require_admin(x_admin_token: str = Header(default="")) -> None:
+    settings = get_settings()
+    # Without a configured token the admin routes do not exist
+    if not settings.admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+
+def rate_limit_key(request: Request) -> str:
+    settings = get_settings()
+    # Only configured keys get their own bucket, otherwise a client could rotate
+    # keys to get fresh buckets and evict the other clients
+    key = request.headers.get(settings.ratelimit_key_header)
+    if key and key in settings.ratelimit_api_keys:
+        return key
+    return request.client.host if request.client else ""
+
+
+async def rate_limit(request: Request) -> None:
+    limiter: RateLimiter | None = getattr(request.app.state, "rate_limiter", None)
+    if limiter is None:
+        return
+    retry_after = limiter.acquire(rate_limit_key(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": retry_after_header(retry_after)},
+        )
@@ -1,43 +1,184 @@
+import asyncio
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
 from sqlalchemy import text
-from src.pubsub.pubsub import QueueName, get_connection
-from src.api.routes import transactions
-from src.config.config import settings
-from src.db.database import SessionLocal
+from src.pubsub.inprocess import InProcessBroker
+from src.pubsub.outbox import (
+    InvalidRecordError,
+    Outbox,
+    orphan_outbox_dirs,
+    replay_outboxes,
+)
+from src.pubsub.pubsub import (
+    QueueName,
+    declare_results_exchange,
+    declare_transaction_queue,
+    get_connection,
+    publish_transaction,
+)
+from src.api.broadcast import ResultBroadcaster
+from src.api.ratelimit import RateLimiter
+from src.pubsub.rpc import RpcClient
+from src.pubsub.sharding import declare_shard_queues
+from src.telemetry import metrics, tracing
+from src.api.routes import admin, results, transactions
+from src.config.config import get_settings
+from src.db.database import SessionLocal, init_engine
+from src.schemas.transaction import Priority, TransactionInput
 from aio_pika import Channel
 from aio_pika.pool import Pool
 
 
 async def get_channel() -> Channel:
+    if app.state.broker is not None:
+        return app.state.broker.channel()
     async with app.state.connection_pool.acquire() as connection:
         return await connection.channel()
 
 
+async def replay_outbox_message(body: bytes, enqueued_ns: int) -> bool:
+    try:
+        tx = TransactionInput.model_validate_json(body)
+    except ValidationError as e:
+        # Retrying does not help, e.g. a record from before a schema change
+        raise InvalidRecordError(e) from e
+    _, success = await publish_transaction(
+        app.state.channel_pool, tx, body, enqueued_ns=enqueued_ns
+    )
+    return success
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.connection_pool = Pool(get_connection, max_size=2)
-    app.state.channel_pool = Pool(get_channel, max_size=settings.rabbitmq_max_channels)
+    settings = get_settings()
+    init_engine()
+    tracing.configure_tracing("api")
+    app.state.broker = None
+    if settings.pipeline_mode == "embedded":
+        # Same flow without RabbitMQ, the broker pool interface is implemented in memory
+        app.state.broker = InProcessBroker(settings.embedded_queue_size)
+        app.state.connection_pool = None
+        app.state.channel_pool = app.state.broker
+    else:
+        app.state.connection_pool = Pool(
+            get_connection, max_size=settings.rabbitmq_max_connections
+        )
+        app.state.channel_pool = Pool(
+            get_channel, max_size=settings.rabbitmq_max_channels
+        )
 
     async with app.state.channel_pool.acquire() as channel:
-        await channel.declare_queue(name=QueueName.TRANSACTION, durable=True)
+        await declare_transaction_queue(channel)
+        await channel.declare_queue(name=QueueName.CLASSIFY, durable=True)
+        await declare_shard_queues(channel, settings.shard_count)
+
+    app.state.rpc_client = RpcClient()
+    app.state.rpc_channel = await get_channel()
+    await app.state.rpc_client.start(app.state.rpc_channel)
+
+    # Results stream: an exclusive queue per API process bound to the HIGH results
+    app.state.result_broadcaster = ResultBroadcaster(
+        settings.results_stream_buffer_size
+    )
+    app.state.results_channel = await get_channel()
+    results_exchange = await declare_results_exchange(app.state.results_channel)
+    results_queue = await app.state.results_channel.declare_queue(
+        exclusive=True, auto_delete=True
+    )
+    await results_queue.bind(results_exchange, routing_key=Priority.HIGH.value)
+    await results_queue.consume(app.state.result_broadcaster.on_message, no_ack=True)
+
+    app.state.embedded_worker = None
+    if app.state.broker is not None:
+        from src.worker.main import WorkerConsumer
+
+        worker_channel = await get_channel()
+        await worker_channel.set_qos(prefetch_count=settings.worker_prefetch_count)
+        classify_channel = await get_channel()
+        await classify_channel.set_qos(prefetch_count=settings.classify_prefetch_count)
+        app.state.embedded_worker = WorkerConsumer(
+            worker_channel, settings.embedded_persist, classify_channel
+        )
+        await app.state.embedded_worker.start()
+
+    app.state.rate_limiter = None
+    if (
+        settings.ratelimit_client_rate_per_s > 0
+        or settings.ratelimit_global_rate_per_s > 0
+    ):
+        app.state.rate_limiter = RateLimiter(
+            settings.ratelimit_client_rate_per_s,
+            settings.ratelimit_client_burst,
+            settings.ratelimit_global_rate_per_s,
+            settings.ratelimit_global_burst,
+            settings.ratelimit_idle_s,
+            settings.ratelimit_max_clients,
+        )
+
+    app.state.outbox = None
+    outbox_task = None
+    orphans_task = None
+    if settings.outbox_enabled:
+        app.state.outbox = Outbox(
+            settings.outbox_dir,
+            settings.outbox_segment_max_bytes,
+            settings.outbox_fsync_interval_s,
+        )
+        app.state.outbox.open()
+        outbox_task = asyncio.create_task(
+            app.state.outbox.replay(
+                replay_outbox_message, settings.outbox_replay_rate_per_s
+            )
+        )
+        if settings.api_process_index == 0:
+            # Left by the processes of a previous run with more of them
+            orphans = orphan_outbox_dirs(settings.outbox_dir, settings.api_workers)
+            if orphans:
+                orphans_task = asyncio.create_task(
+                    replay_outboxes(
+                        orphans,
+                        replay_outbox_message,
+                        settings.outbox_replay_rate_per_s,
+                    )
+                )
 
     yield
 
+    if orphans_task is not None:
+        orphans_task.cancel()
+        # Lets it close the outbox it is replaying
+        await asyncio.gather(orphans_task, return_exceptions=True)
+    if outbox_task is not None:
+        outbox_task.cancel()
+        await app.state.outbox.close()
+    if app.state.embedded_worker is not None:
+        await app.state.embedded_worker.stop()
+    app.state.result_broadcaster.close()
+    if app.state.results_channel:
+        await app.state.results_channel.close()
+    app.state.rpc_client.close()
+    if app.state.rpc_channel:
+        await app.state.rpc_channel.close()
     if app.state.channel_pool:
         await app.state.channel_pool.close()
     if app.state.connection_pool:
         await app.state.connection_pool.close()
+    tracing.tracer.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(transactions.router, prefix="/transactions")
+app.include_router(results.router, prefix="/results")
+app.include_router(admin.router, prefix="/admin", include_in_schema=False)
 
 
 @app.get("/healthz")
 async def healthz():
+    settings = get_settings()
     health = {"status": "ok", "rabbitmq": "ok", "postgres": "ok"}
 
     try:
@@ -49,12 +190,23 @@ async def healthz():
         health["rabbitmq"] = "error"
         health["status"] = "degraded"
 
-    try:
-        async with SessionLocal() as session:
-            await session.execute(text("SELECT 1"))
-    except Exception:
-        health["postgres"] = "error"
-        health["status"] = "degraded"
+    if app.state.broker is not None and not settings.embedded_persist:
+        health["postgres"] = "disabled"
+    else:
+        try:
+            async with SessionLocal() as session:
+                await session.execute(text("SELECT 1"))
+        except Exception:
+            health["postgres"] = "error"
+            health["status"] = "degraded"
+
+    if app.state.outbox is not None:
+        health["outbox"] = asdict(app.state.outbox.stats())
 
     status_code = 200 if health["status"] == "ok" else 503
     return JSONResponse(content=health, status_code=status_code)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
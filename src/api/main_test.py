@@ -8,7 +8,9 @@ from src.schemas.transaction import TransactionInput, TransactionResponse
 from testcontainers.rabbitmq import RabbitMqContainer
 from src.config.config import settings
 
-from .main import app
+from src.pubsub.outbox import InvalidRecordError
+
+from .main import app, replay_outbox_message
 
 
 def create_random_hex_with_suffix(length: int) -> str:
@@ -51,3 +53,9 @@ async def test_publish_message():
                 assert TransactionResponse(**response.json()) == TransactionResponse(
                     tx_hash=tx_input.tx_hash
                 )
+
+
+@pytest.mark.anyio
+async def test_replay_rejects_records_that_are_not_transactions():
+    with pytest.raises(InvalidRecordError):
+        await replay_outbox_message(b'{"tx_hash": "0x"}', time.time_ns())
@@ -0,0 +1,127 @@
+import math
+import time
+from collections import OrderedDict
+from src.telemetry.metrics import REGISTRY, Counter, Gauge
+
+RATELIMIT_DECISIONS_TOTAL = REGISTRY.register(
+    Counter(
+        "api_ratelimit_decisions_total",
+        "Admission decisions for the ingest routes",
+        ["decision"],
+    )
+)
+RATELIMIT_CLIENTS = REGISTRY.register(
+    Gauge("api_ratelimit_clients", "Clients with rate limiter state")
+)
+
+# Long keys are cut, so a client can not make the limiter hold arbitrary strings
+MAX_KEY_LENGTH = 128
+
+
+class TokenBucket:
+    """Holds up to `burst` tokens, refilled at `rate_per_s`."""
+
+    def __init__(self, rate_per_s: float, burst: float, now: float):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Takes a token, returns 0 or the seconds until one is available."""
+        tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate_per_s)
+        self.updated = now
+        if tokens >= 1:
+            self.tokens = tokens - 1
+            return 0.0
+        self.tokens = tokens
+        return (1 - tokens) / self.rate_per_s
+
+
+class RateLimiter:
+    """Token buckets per client plus an optional global one.
+
+    A client bucket is two floats in an OrderedDict kept in least recently seen
+    order, so the clients idle for `idle_s` are evicted from the front in O(1)
+    each. A client idle long enough to refill its bucket loses nothing when it is
+    evicted. A rate of 0 disables that limit.
+    """
+
+    def __init__(
+        self,
+        client_rate_per_s: float,
+        client_burst: int,
+        global_rate_per_s: float = 0.0,
+        global_burst: int = 0,
+        idle_s: float = 300.0,
+        max_clients: int = 100_000,
+        clock=time.monotonic,
+    ):
+        self.client_rate_per_s = client_rate_per_s
+        self.client_burst = float(client_burst)
+        # Evicting earlier would hand a fresh full bucket to a throttled client
+        refill_s = client_burst / client_rate_per_s if client_rate_per_s > 0 else 0.0
+        self.idle_s = max(idle_s, refill_s)
+        self.max_clients = max_clients
+        self._clock = clock
+        self._clients: OrderedDict[str, list[float]] = OrderedDict()
+        self._global = (
+            TokenBucket(global_rate_per_s, global_burst or 1, clock())
+            if global_rate_per_s > 0
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def _evict(self, now: float) -> None:
+        clients = self._clients
+        while clients:
+            _, (_, seen) = next(iter(clients.items()))
+            if now - seen < self.idle_s and len(clients) <= self.max_clients:
+                break
+            clients.popitem(last=False)
+        RATELIMIT_CLIENTS.set(len(clients))
+
+    def acquire(self, key: str) -> float:
+        """Admits a request of `key`, returns 0 or the seconds to wait."""
+        now = self._clock()
+        state = None
+        if self.client_rate_per_s > 0:
+            key = key[:MAX_KEY_LENGTH]
+            clients = self._clients
+            state = clients.get(key)
+            if state is None:
+                state = clients[key] = [self.client_burst, now]
+                self._evict(now)
+            else:
+                clients.move_to_end(key)
+                if now - next(iter(clients.values()))[1] >= self.idle_s:
+                    self._evict(now)
+
+            tokens = state[0] + (now - state[1]) * self.client_rate_per_s
+            if tokens > self.client_burst:
+                tokens = self.client_burst
+            state[1] = now
+            if tokens < 1:
+                state[0] = tokens
+                RATELIMIT_DECISIONS_TOTAL.inc("client_limited")
+                return (1 - tokens) / self.client_rate_per_s
+            state[0] = tokens - 1
+
+        if self._global is not None:
+            retry_after = self._global.take(now)
+            if retry_after:
+                if state is not None:
+                    # Not admitted, the client keeps its token
+                    state[0] += 1
+                RATELIMIT_DECISIONS_TOTAL.inc("global_limited")
+                return retry_after
+
+        RATELIMIT_DECISIONS_TOTAL.inc("allowed")
+        return 0.0
+
+
+def retry_after_header(seconds: float) -> str:
+    # Retry-After only takes whole seconds
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,140 @@
+import time
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.api.dependencies import rate_limit
+from src.config.config import settings
+from .ratelimit import RATELIMIT_DECISIONS_TOTAL, RateLimiter, retry_after_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_client_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = RateLimiter(client_rate_per_s=2, client_burst=3, clock=clock)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    # Other clients have their own bucket
+    assert limiter.acquire("b") == 0.0
+
+    clock.now += 0.5
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+
+
+def test_global_bucket_limits_all_clients_without_charging_them():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        client_rate_per_s=1,
+        client_burst=2,
+        global_rate_per_s=10,
+        global_burst=2,
+        clock=clock,
+    )
+    before = RATELIMIT_DECISIONS_TOTAL.value("global_limited")
+
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("b") == 0.0
+    assert limiter.acquire("a") == pytest.approx(0.1)
+    assert RATELIMIT_DECISIONS_TOTAL.value("global_limited") == before + 1
+
+    # The rejected request did not use the token of "a"
+    clock.now += 0.1
+    assert limiter.acquire("a") == 0.0
+
+
+def test_idle_clients_are_evicted():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        client_rate_per_s=10, client_burst=10, idle_s=60, max_clients=3, clock=clock
+    )
+    for key in "abc":
+        limiter.acquire(key)
+    assert len(limiter) == 3
+
+    # Over the cap, the least recently seen client goes first
+    limiter.acquire("a")
+    limiter.acquire("d")
+    assert len(limiter) == 3
+    assert limiter.acquire("b") == 0.0
+    assert len(limiter) == 3
+
+    clock.now += 61
+    limiter.acquire("e")
+    assert len(limiter) == 1
+
+
+def test_acquire_cost_is_a_few_microseconds():
+    limiter = RateLimiter(
+        client_rate_per_s=1e9, client_burst=10, global_rate_per_s=1e9, global_burst=10
+    )
+    keys = [f"10.0.{i // 256}.{i % 256}" for i in range(10_000)]
+    for key in keys:
+        limiter.acquire(key)
+
+    start = time.perf_counter()
+    for key in keys * 5:
+        limiter.acquire(key)
+    per_call = (time.perf_counter() - start) / (len(keys) * 5)
+    # Generous bound for slow CI machines, it takes one or two µs
+    assert per_call < 20e-6
+
+
+def test_retry_after_rounds_up_to_whole_seconds():
+    assert retry_after_header(0.01) == "1"
+    assert retry_after_header(2.2) == "3"
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_route_answers_429(monkeypatch):
+    monkeypatch.setattr(settings, "ratelimit_api_keys", {"a", "b"})
+    app = FastAPI()
+    app.state.rate_limiter = RateLimiter(client_rate_per_s=0.5, client_burst=1)
+
+    @app.post("/", dependencies=[Depends(rate_limit)])
+    async def ingest():
+        return {}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        assert (await ac.post("/", headers={"X-API-Key": "a"})).status_code == 200
+        response = await ac.post("/", headers={"X-API-Key": "a"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+        assert (await ac.post("/", headers={"X-API-Key": "b"})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_rotating_unknown_keys_does_not_bypass_the_limit(monkeypatch):
+    monkeypatch.setattr(settings, "ratelimit_api_keys", {"known"})
+    app = FastAPI()
+    app.state.rate_limiter = RateLimiter(
+        client_rate_per_s=0.5, client_burst=2, max_clients=4
+    )
+
+    @app.post("/", dependencies=[Depends(rate_limit)])
+    async def ingest():
+        return {}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        assert (await ac.post("/", headers={"X-API-Key": "known"})).status_code == 200
+        # Unknown keys share the bucket of the client IP
+        statuses = [
+            (await ac.post("/", headers={"X-API-Key": f"key-{i}"})).status_code
+            for i in range(10)
+        ]
+        assert statuses == [200, 200] + [429] * 8
+        # and do not evict the bucket of the configured key
+        assert (await ac.post("/", headers={"X-API-Key": "known"})).status_code == 200
+        response = await ac.post("/", headers={"X-API-Key": "known"})
+        assert response.status_code == 429
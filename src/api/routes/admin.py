@@ -0,0 +1,22 @@
+from dataclasses import asdict
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from src.api.dependencies import require_admin
+from src.config.config import get_settings
+from src.telemetry import profiler
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile")
+async def profile(seconds: float | None = Query(default=None, gt=0, le=300)):
+    settings = get_settings()
+    try:
+        report = await profiler.profile(
+            "api",
+            seconds or settings.profile_duration_s,
+            settings.profile_dir,
+            settings.profile_interval_s,
+        )
+    except profiler.ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return asdict(report)
@@ -0,0 +1,34 @@
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.config.config import settings
+
+from .admin import router
+
+
+def create_client() -> AsyncClient:
+    app = FastAPI()
+    app.include_router(router, prefix="/admin")
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_admin_token(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+
+    async with create_client() as client:
+        monkeypatch.setattr(settings, "admin_token", "")
+        response = await client.post("/admin/profile", headers={"X-Admin-Token": ""})
+        assert response.status_code == 404
+
+        monkeypatch.setattr(settings, "admin_token", "secret")
+        response = await client.post("/admin/profile", headers={"X-Admin-Token": "x"})
+        assert response.status_code == 401
+
+        response = await client.post(
+            "/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"}
+        )
+        assert response.status_code == 200
+        assert response.json()["samples"] > 0
+        assert Path(response.json()["speedscope_file"]).exists()
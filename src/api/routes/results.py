@@ -0,0 +1,44 @@
+import asyncio
+from collections.abc import AsyncIterator
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from src.api.broadcast import ResultBroadcaster
+from src.api.dependencies import get_result_broadcaster
+from src.config.config import get_settings
+
+router = APIRouter()
+
+
+async def stream_events(
+    broadcaster: ResultBroadcaster, queue: asyncio.Queue[bytes | None]
+) -> AsyncIterator[bytes]:
+    settings = get_settings()
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(
+                    queue.get(), timeout=settings.results_stream_keepalive_s
+                )
+            except asyncio.TimeoutError:
+                # SSE comment, keeps proxies from closing an idle connection
+                yield b": keepalive\n\n"
+                continue
+
+            if data is None:
+                return
+            yield b"event: result\ndata: " + data + b"\n\n"
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+@router.get("/stream")
+async def stream_results(
+    broadcaster: ResultBroadcaster = Depends(get_result_broadcaster),
+):
+    """Server-Sent Events stream with the HIGH priority classification results."""
+    queue = broadcaster.subscribe()
+    return StreamingResponse(
+        stream_events(broadcaster, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,17 +1,155 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 from aio_pika.pool import Pool
-from src.api.dependencies import get_channel_pool
-from src.schemas.transaction import TransactionInput, TransactionResponse
+from pydantic import ValidationError
+from src.api.dependencies import (
+    get_channel_pool,
+    get_outbox,
+    get_rpc_client,
+    rate_limit,
+    require_admin,
+)
+from src.config.config import get_settings
+from src.db import export
+from src.db.database import init_engine
+from src.schemas.transaction import (
+    ClassifiedTransaction,
+    TransactionInput,
+    TransactionResponse,
+)
+from src.pubsub.outbox import Outbox
 from src.pubsub.pubsub import publish_transaction
+from src.pubsub.rpc import RpcClient
+from src.telemetry import tracing
 
 router = APIRouter()
 
+# The body is read and validated by hand, so the schema is declared here to keep
+# the request documented in /docs.
+TRANSACTION_INPUT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": TransactionInput.model_json_schema()}
+        },
+    }
+}
 
-@router.post("/", status_code=202, response_model=TransactionResponse)
+ACCEPTED_RESPONSE_PREFIX = b'{"status":"accepted","tx_hash":"'
+ACCEPTED_RESPONSE_SUFFIX = b'","message":"Transaction queued for processing"}'
+
+
+def validate_transaction_body(body: bytes) -> TransactionInput:
+    """Validates the raw JSON body in a single pass, without building a dict first."""
+    try:
+        return TransactionInput.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ],
+            body=body,
+        )
+
+
+def accepted_response(tx_hash: str) -> Response:
+    # Same payload as TransactionResponse, tx_hash is validated hex so it needs no escaping
+    return Response(
+        content=ACCEPTED_RESPONSE_PREFIX
+        + tx_hash.encode("ascii")
+        + ACCEPTED_RESPONSE_SUFFIX,
+        status_code=202,
+        media_type="application/json",
+    )
+
+
+@router.post(
+    "/",
+    status_code=202,
+    response_model=TransactionResponse,
+    openapi_extra=TRANSACTION_INPUT_OPENAPI,
+    dependencies=[Depends(rate_limit)],
+)
 async def process_transaction(
-    tx_input: TransactionInput, channel_pool: Pool = Depends(get_channel_pool)
+    request: Request,
+    channel_pool: Pool = Depends(get_channel_pool),
+    outbox: Outbox | None = Depends(get_outbox),
 ):
-    msg, success = await publish_transaction(channel_pool, tx_input)
+    tracer = tracing.tracer
+    root = tracer.start_span("POST /transactions") if tracer.sample() else None
+    trace = root.context if root else None
+    try:
+        with tracer.span("http.receive", trace):
+            body = await request.body()
+            tx_input = validate_transaction_body(body)
+        with tracer.span("amqp.publish", trace):
+            msg, success = await publish_transaction(
+                channel_pool, tx_input, body, trace
+            )
+        if not success and outbox is not None:
+            with tracer.span("outbox.append", trace):
+                try:
+                    # Accepted once on disk, the outbox replays it to the broker
+                    await outbox.append(body)
+                    success = True
+                except Exception as e:
+                    msg = f"Error: {e}"
+    finally:
+        if root:
+            tracer.end_span(root)
+
     if not success:
         raise HTTPException(status_code=503, detail=msg)
-    return TransactionResponse(tx_hash=tx_input.tx_hash)
+    return accepted_response(tx_input.tx_hash)
+
+
+@router.post(
+    "/classify",
+    response_model=ClassifiedTransaction,
+    openapi_extra=TRANSACTION_INPUT_OPENAPI,
+    dependencies=[Depends(rate_limit)],
+)
+async def classify_transaction(
+    request: Request, rpc_client: RpcClient = Depends(get_rpc_client)
+):
+    """Classifies the transaction inline, waiting for a worker to reply."""
+    settings = get_settings()
+    body = await request.body()
+    validate_transaction_body(body)
+    try:
+        reply = await rpc_client.call(body, timeout=settings.classify_timeout_s)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Classification timed out")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Error: {e}")
+    # The worker reply is already a serialized ClassifiedTransaction
+    return Response(content=reply, media_type="application/json")
+
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|parquet)$"),
+    since: int | None = Query(None, description="Epoch seconds, included"),
+    until: int | None = Query(None, description="Epoch seconds, excluded"),
+    min_risk: float | None = Query(None, ge=0, le=1),
+    max_risk: float | None = Query(None, ge=0, le=1),
+):
+    """Streams the stored transactions matching the filters as NDJSON or Parquet."""
+    settings = get_settings()
+    export_filter = export.ExportFilter(since, until, min_risk, max_risk)
+    try:
+        chunks = export.export_chunks(
+            init_engine(), export_filter, format, settings.export_batch_size
+        )
+    except export.ExportFormatError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type=export.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="transactions.{format}"'
+        },
+    )
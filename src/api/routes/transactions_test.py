@@ -0,0 +1,153 @@
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.api.dependencies import get_channel_pool
+from src.config.config import settings
+from src.pubsub.outbox import Outbox
+from src.schemas.transaction import TransactionResponse
+
+from .transactions import router
+
+
+def create_body() -> bytes:
+    return (
+        '{"tx_hash": "0x%s", "from_address": "0x%s", "to_address": "0x%s", '
+        '"value_eth": 2.5, "gas_price_gwei": 45, "input_data": "0x", "timestamp": %d}'
+        % (
+            os.urandom(32).hex(),
+            os.urandom(20).hex(),
+            os.urandom(20).hex(),
+            time.time(),
+        )
+    ).encode()
+
+
+def create_app(publish: AsyncMock) -> FastAPI:
+    channel = AsyncMock()
+    channel.default_exchange.publish = publish
+
+    class ChannelPool:
+        @asynccontextmanager
+        async def acquire(self):
+            yield channel
+
+    app = FastAPI()
+    app.include_router(router, prefix="/transactions")
+    app.dependency_overrides[get_channel_pool] = ChannelPool
+    return app
+
+
+@pytest.mark.asyncio
+async def test_process_transaction_forwards_raw_body():
+    publish = AsyncMock()
+    body = create_body()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=create_app(publish)), base_url="http://test"
+    ) as ac:
+        response = await ac.post("/transactions/", content=body)
+
+    assert response.status_code == 202
+    published = publish.call_args.args[0]
+    assert published.body == body
+    # The hand-written bytes must match what TransactionResponse would serialize
+    expected = TransactionResponse(tx_hash=json.loads(body)["tx_hash"])
+    assert response.json() == expected.model_dump(mode="json")
+    assert response.content == expected.model_dump_json().encode()
+
+
+@pytest.mark.asyncio
+async def test_process_transaction_rejects_invalid_hex():
+    publish = AsyncMock()
+    body = create_body().replace(b'"0x', b'"0xzz', 1)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=create_app(publish)), base_url="http://test"
+    ) as ac:
+        response = await ac.post("/transactions/", content=body)
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "tx_hash"]
+    publish.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_process_transaction_spills_to_outbox(tmp_path):
+    publish = AsyncMock(side_effect=ConnectionError("broker down"))
+    body = create_body()
+    app = create_app(publish)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post("/transactions/", content=body)
+        assert response.status_code == 503
+
+        app.state.outbox = Outbox(tmp_path, fsync_interval_s=0)
+        app.state.outbox.open()
+        response = await ac.post("/transactions/", content=body)
+
+    assert response.status_code == 202
+    assert app.state.outbox.pending == 1
+    assert app.state.outbox.read_batch(1)[0][0] == body
+    await app.state.outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_export_requires_admin_token(monkeypatch):
+    async with AsyncClient(
+        transport=ASGITransport(app=create_app(AsyncMock())), base_url="http://test"
+    ) as ac:
+        monkeypatch.setattr(settings, "admin_token", "")
+        response = await ac.get("/transactions/export")
+        assert response.status_code == 404
+
+        monkeypatch.setattr(settings, "admin_token", "secret")
+        response = await ac.get("/transactions/export")
+        assert response.status_code == 401
+        response = await ac.get(
+            "/transactions/export", headers={"X-Admin-Token": "other"}
+        )
+        assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_export_rejects_unknown_format(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    async with AsyncClient(
+        transport=ASGITransport(app=create_app(AsyncMock())), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/transactions/export",
+            params={"format": "csv"},
+            headers={"X-Admin-Token": "secret"},
+        )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_parquet_export_needs_pyarrow(monkeypatch):
+    try:
+        import pyarrow  # noqa: F401
+
+        pytest.skip("pyarrow is installed")
+    except ImportError:
+        pass
+
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    async with AsyncClient(
+        transport=ASGITransport(app=create_app(AsyncMock())), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/transactions/export",
+            params={"format": "parquet"},
+            headers={"X-Admin-Token": "secret"},
+        )
+
+    assert response.status_code == 501
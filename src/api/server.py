@@ -0,0 +1,175 @@
+"""
+Production runner of the API: one uvicorn process per core on the same port.
+
+Every process opens its own listening socket with SO_REUSEPORT, so the kernel
+spreads the incoming connections among them without an accept lock. uvloop and
+httptools are used when installed. The broker and database pools of every process
+are sized by RABBITMQ_MAX_CONNECTIONS, RABBITMQ_MAX_CHANNELS, POSTGRES_POOL_SIZE
+and POSTGRES_MAX_OVERFLOW, the totals are those values times the processes.
+
+Usage:
+    uv run python -m src.api.server [--workers 4] [--port 8000]
+"""
+
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from multiprocessing.connection import wait
+from src.config.config import get_settings
+from src.pubsub.outbox import process_outbox_dir
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+APP = "src.api.main:app"
+# Processes crashing faster than this are restarted after a pause
+MIN_UPTIME_S = 1.0
+# Time given to the processes to finish their requests and lifespan on shutdown
+SHUTDOWN_TIMEOUT_S = 30.0
+
+
+def event_loop_implementation() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_implementation() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve(
+    index: int, host: str, port: int, shared: socket.socket | None, processes: int
+) -> None:
+    """Entry point of every API process."""
+    import uvicorn
+
+    settings = get_settings()
+
+    # uvicorn handles the signals itself and re-raises them once it has shut down
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    settings.outbox_dir = str(process_outbox_dir(settings.outbox_dir, index))
+    settings.api_process_index = index
+    settings.api_workers = processes
+    sock = shared or bind_socket(host, port, reuse_port=True)
+    config = uvicorn.Config(
+        APP,
+        loop=event_loop_implementation(),
+        http=http_implementation(),
+        lifespan="on",
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT_S,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the API processes and restarts the ones that exit unexpectedly."""
+
+    def __init__(self, workers: int, host: str, port: int):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self._context = multiprocessing.get_context("fork")
+        self._processes: dict[int, multiprocessing.process.BaseProcess] = {}
+        self._started: dict[int, float] = {}
+        self._stopping = False
+        # Without SO_REUSEPORT the processes share one socket bound here
+        self._shared = (
+            None
+            if hasattr(socket, "SO_REUSEPORT")
+            else bind_socket(host, port, reuse_port=False)
+        )
+
+    def start(self, index: int) -> None:
+        process = self._context.Process(
+            target=serve,
+            args=(index, self.host, self.port, self._shared, self.workers),
+            name=f"api-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+        self._started[index] = time.monotonic()
+        logger.info("Started API process %d (pid %d)", index, process.pid)
+
+    def stop(self, sig: int, frame=None) -> None:
+        if self._stopping:
+            return
+        logger.info("Received %s, stopping API processes...", signal.Signals(sig).name)
+        self._stopping = True
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        logger.info(
+            "Serving %s on %s:%d with %d processes (%s, %s)",
+            APP,
+            self.host,
+            self.port,
+            self.workers,
+            event_loop_implementation(),
+            http_implementation(),
+        )
+        for index in range(self.workers):
+            self.start(index)
+
+        while not self._stopping:
+            wait([p.sentinel for p in self._processes.values()], timeout=1.0)
+            for index, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+                logger.warning(
+                    "API process %d exited with code %s", index, process.exitcode
+                )
+                if time.monotonic() - self._started[index] < MIN_UPTIME_S:
+                    time.sleep(MIN_UPTIME_S)
+                self.start(index)
+
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT_S + 5
+        for index, process in self._processes.items():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning("API process %d did not exit, killing it", index)
+                process.kill()
+                process.join()
+        logger.info("API shutdown complete")
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API on every core")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.api_workers or os.cpu_count() or 1,
+        help="API processes, one per core by default",
+    )
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    args = parser.parse_args()
+
+    Supervisor(args.workers, args.host, args.port).run()
+
+
+if __name__ == "__main__":
+    main()
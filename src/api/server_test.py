@@ -0,0 +1,55 @@
+import socket
+import pytest
+from src.pubsub.outbox import (
+    Outbox,
+    orphan_outbox_dirs,
+    process_outbox_dir,
+    replay_outboxes,
+)
+from .server import bind_socket, event_loop_implementation, http_implementation
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="needs SO_REUSEPORT")
+def test_processes_can_listen_on_the_same_port():
+    first = bind_socket("127.0.0.1", 0, reuse_port=True)
+    port = first.getsockname()[1]
+    second = bind_socket("127.0.0.1", port, reuse_port=True)
+    try:
+        assert second.getsockname()[1] == port
+    finally:
+        first.close()
+        second.close()
+
+
+def test_implementations_fall_back_when_not_installed(mocker):
+    mocker.patch("importlib.util.find_spec", return_value=None)
+    assert event_loop_implementation() == "asyncio"
+    assert http_implementation() == "h11"
+
+
+@pytest.mark.asyncio
+async def test_shrinking_the_processes_replays_their_outboxes(tmp_path):
+    # A previous run with 4 processes left records in every outbox
+    for index in range(4):
+        outbox = Outbox(process_outbox_dir(tmp_path, index), fsync_interval_s=0)
+        outbox.open()
+        await outbox.append(f"message-{index}".encode())
+        await outbox.close()
+    # Process 1 of the new run with 2 processes is already up
+    live = Outbox(process_outbox_dir(tmp_path, 1), fsync_interval_s=0)
+    live.open()
+    published = []
+
+    async def publish(payload: bytes, enqueued_ns: int) -> bool:
+        published.append(payload)
+        return True
+
+    orphans = orphan_outbox_dirs(tmp_path, 2)
+    assert [path.name for path in orphans] == ["api-2", "api-3"]
+    assert await replay_outboxes(orphans, publish, rate_per_s=0) == 2
+    assert published == [b"message-2", b"message-3"]
+
+    # A directory in use by a live process is left to it
+    assert await replay_outboxes(orphan_outbox_dirs(tmp_path, 1), publish, 0) == 0
+    assert live.pending == 1
+    await live.close()
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import signal
+import sys
+import time
+from aio_pika.abc import AbstractChannel
+from src.autoscaler.policy import ScalingPolicy
+from src.config.config import get_settings
+from src.pubsub.pubsub import QueueName, declare_transaction_queue, get_connection
+from src.pubsub.sharding import declare_shard_queues, shard_queue_name
+from src.pubsub.stream import stream_mode
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+shutdown_event = asyncio.Event()
+
+
+class WorkerPool:
+    """Local `src.worker.main` processes, retired with SIGTERM so they drain."""
+
+    def __init__(self, drain_timeout_s: float):
+        self.drain_timeout_s = drain_timeout_s
+        self._workers: list[asyncio.subprocess.Process] = []
+        self._retiring: set[asyncio.Task] = set()
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def reap(self) -> None:
+        for process in [p for p in self._workers if p.returncode is not None]:
+            logger.warning(
+                "Worker %d exited with code %d", process.pid, process.returncode
+            )
+            self._workers.remove(process)
+
+    async def spawn(self) -> None:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "src.worker.main"
+        )
+        self._workers.append(process)
+        logger.info("Started worker %d", process.pid)
+
+    def retire(self) -> None:
+        # The newest worker is retired first, it has the least warmed-up state
+        process = self._workers.pop()
+        task = asyncio.create_task(self._stop(process))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def scale_to(self, desired: int) -> None:
+        while self.size < desired:
+            await self.spawn()
+        while self.size > desired:
+            self.retire()
+
+    async def close(self) -> None:
+        while self._workers:
+            self.retire()
+        await asyncio.gather(*self._retiring)
+
+    async def _stop(self, process: asyncio.subprocess.Process) -> None:
+        logger.info("Retiring worker %d", process.pid)
+        process.terminate()
+        try:
+            # The worker drains for drain_timeout_s, give it some margin to exit
+            await asyncio.wait_for(process.wait(), timeout=self.drain_timeout_s + 5)
+        except asyncio.TimeoutError:
+            logger.warning("Worker %d did not exit, killing it", process.pid)
+            process.kill()
+            await process.wait()
+
+
+async def get_queue_stats(channel: AbstractChannel) -> tuple[int, int]:
+    """Returns the backlog of the transaction queue and its shards and the number of
+    consumers of the transaction queue, which every worker consumes."""
+    settings = get_settings()
+    queue = await channel.declare_queue(
+        name=QueueName.TRANSACTION, durable=True, passive=True
+    )
+    message_count = queue.declaration_result.message_count or 0
+    for shard in range(settings.shard_count):
+        shard_queue = await channel.declare_queue(
+            name=shard_queue_name(shard), durable=True, passive=True
+        )
+        message_count += shard_queue.declaration_result.message_count or 0
+    return message_count, queue.declaration_result.consumer_count or 0
+
+
+def handle_shutdown(sig: signal.Signals) -> None:
+    logger.info("Received %s, retiring workers...", sig.name)
+    shutdown_event.set()
+
+
+async def main() -> None:
+    settings = get_settings()
+    if stream_mode():
+        # Every worker reads the whole stream, the queue depth is not a backlog
+        raise ValueError("The autoscaler does not support stream queues")
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, handle_shutdown, sig)
+
+    policy = ScalingPolicy(
+        min_workers=settings.autoscaler_min_workers,
+        max_workers=settings.autoscaler_max_workers,
+        target_backlog_per_worker=settings.autoscaler_target_backlog_per_worker,
+        scale_down_backlog_per_worker=settings.autoscaler_scale_down_backlog_per_worker,
+        scale_down_polls=settings.autoscaler_scale_down_polls,
+        cooldown_s=settings.autoscaler_cooldown_s,
+    )
+    pool = WorkerPool(settings.worker_drain_timeout_s)
+
+    connection = await get_connection()
+    async with connection:
+        channel = await connection.channel()
+        await declare_transaction_queue(channel)
+        await declare_shard_queues(channel, settings.shard_count)
+
+        while not shutdown_event.is_set():
+            pool.reap()
+            try:
+                message_count, consumer_count = await get_queue_stats(channel)
+            except Exception:
+                logger.exception("Could not read queue depth")
+            else:
+                desired = policy.decide(
+                    message_count, consumer_count, pool.size, time.monotonic()
+                )
+                if desired != pool.size:
+                    logger.info(
+                        "Backlog %d messages, %d consumers: scaling %d -> %d workers",
+                        message_count,
+                        consumer_count,
+                        pool.size,
+                        desired,
+                    )
+                    await pool.scale_to(desired)
+
+            try:
+                await asyncio.wait_for(
+                    shutdown_event.wait(), timeout=settings.autoscaler_poll_interval_s
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    await pool.close()
+    logger.info("Autoscaler shutdown complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
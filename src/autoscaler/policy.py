@@ -0,0 +1,57 @@
+import math
+from dataclasses import dataclass
+
+
+@dataclass
+class ScalingPolicy:
+    """Decides the number of worker processes from the queue backlog.
+
+    Scaling up jumps straight to the number of workers needed to keep the backlog
+    per worker under `target_backlog_per_worker`. Scaling down removes one worker
+    at a time and only after `scale_down_polls` consecutive polls under
+    `scale_down_backlog_per_worker`. The gap between both thresholds and the
+    cooldown after every change avoid flapping.
+    """
+
+    min_workers: int
+    max_workers: int
+    target_backlog_per_worker: int
+    scale_down_backlog_per_worker: int
+    scale_down_polls: int
+    cooldown_s: float
+
+    def __post_init__(self):
+        self._low_polls = 0
+        self._last_change = -math.inf
+
+    def decide(
+        self, message_count: int, consumer_count: int, workers: int, now: float
+    ) -> int:
+        """Returns the desired number of workers, given the current ones."""
+        desired = min(max(workers, self.min_workers), self.max_workers)
+        if desired != workers:
+            # Out of bounds (startup or crashed workers), no cooldown applies
+            return desired
+        if consumer_count < workers:
+            # Some workers are still starting, their effect is not visible yet
+            return workers
+
+        backlog_per_worker = message_count / max(workers, 1)
+        if backlog_per_worker < self.scale_down_backlog_per_worker:
+            self._low_polls += 1
+        else:
+            self._low_polls = 0
+
+        if now - self._last_change < self.cooldown_s:
+            return workers
+
+        if backlog_per_worker > self.target_backlog_per_worker:
+            desired = math.ceil(message_count / self.target_backlog_per_worker)
+            desired = min(desired, self.max_workers)
+        elif self._low_polls >= self.scale_down_polls:
+            desired = max(workers - 1, self.min_workers)
+
+        if desired != workers:
+            self._last_change = now
+            self._low_polls = 0
+        return desired
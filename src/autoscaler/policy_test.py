@@ -0,0 +1,49 @@
+from .policy import ScalingPolicy
+
+
+def make_policy(**overrides) -> ScalingPolicy:
+    params = dict(
+        min_workers=1,
+        max_workers=8,
+        target_backlog_per_worker=500,
+        scale_down_backlog_per_worker=50,
+        scale_down_polls=3,
+        cooldown_s=10.0,
+    )
+    params.update(overrides)
+    return ScalingPolicy(**params)
+
+
+def test_clamps_to_bounds():
+    policy = make_policy(min_workers=2)
+
+    assert policy.decide(0, 0, workers=0, now=0.0) == 2
+    assert policy.decide(0, 10, workers=10, now=0.0) == 8
+
+
+def test_scales_up_to_backlog_and_max():
+    policy = make_policy()
+
+    assert policy.decide(2_600, 1, workers=1, now=0.0) == 6
+    # Cooldown after the change
+    assert policy.decide(100_000, 6, workers=6, now=5.0) == 6
+    assert policy.decide(100_000, 6, workers=6, now=11.0) == 8
+
+
+def test_waits_for_starting_workers():
+    policy = make_policy()
+
+    assert policy.decide(100_000, 1, workers=2, now=100.0) == 2
+
+
+def test_scales_down_one_at_a_time_after_consecutive_low_polls():
+    policy = make_policy(cooldown_s=0.0)
+
+    assert policy.decide(10, 4, workers=4, now=0.0) == 4
+    assert policy.decide(10, 4, workers=4, now=1.0) == 4
+    # A busy poll resets the count (hysteresis)
+    assert policy.decide(1_000, 4, workers=4, now=2.0) == 4
+    assert policy.decide(10, 4, workers=4, now=3.0) == 4
+    assert policy.decide(10, 4, workers=4, now=4.0) == 4
+    assert policy.decide(10, 4, workers=4, now=5.0) == 3
+    assert policy.decide(0, 1, workers=1, now=100.0) == 1
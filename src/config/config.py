@@ -1,3 +1,4 @@
+from functools import cache
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,16 +14,152 @@ class Settings(BaseSettings):
     postgres_db: str = "test"
     postgres_host: str = "localhost"
     postgres_external_port: str = "5432"
+    # connection pool of every process
+    postgres_pool_size: int = 5
+    postgres_max_overflow: int = 10
     # rabbitmq
     rabbitmq_queue_port: int = 5672
     rabbitmq_host: str = "localhost"
+    # per process, the API runner starts one process per core
+    rabbitmq_max_connections: int = 2
     rabbitmq_max_channels: int = 10
+    # publisher confirm timeout, an unconfirmed message counts as not published
+    publish_confirm_timeout_s: float = 2.0
+    # sharding by from_address, 0 publishes everything to the single transaction queue
+    shard_count: int = 0
+    shard_heartbeat_interval_s: float = 2.0
+    shard_member_ttl_s: float = 6.0
+    # "classic", or "stream" to make the transaction queue a RabbitMQ stream: acked
+    # messages are kept for stream_max_age, so they can be replayed into a new model
+    # version (python -m src.worker.replay). Needs shard_count 0 and RabbitMQ
+    transaction_queue_type: str = "classic"
+    stream_max_age: str = "7D"
+    stream_max_length_bytes: int = 20 * 1024**3
+    # where a consumer without a committed offset starts: "first", "last" or "next"
+    stream_start_offset: str = "first"
+    # credit window of the stream consumers, acked every stream_ack_batch messages
+    stream_prefetch_count: int = 1_000
+    stream_ack_batch: int = 100
+    stream_commit_interval_s: float = 1.0
+    # a failed stream message is retried in place, the delay doubles every attempt
+    stream_retry_delay_s: float = 1.0
+    stream_retry_max_delay_s: float = 60.0
+    # every worker reads the whole stream and scores the offsets where
+    # offset % stream_partitions == stream_partition
+    stream_partitions: int = 1
+    stream_partition: int = 0
+
+    # "rabbitmq", or "embedded" to run the worker inside the API process with an
+    # in-memory broker, for single-node deployments and tests
+    pipeline_mode: str = "rabbitmq"
+    embedded_queue_size: int = 10_000
+    # without it HIGH transactions are only published as results, no database needed
+    embedded_persist: bool = True
+
+    # outbox, messages that could not be published are spilled to disk and replayed
+    outbox_enabled: bool = False
+    outbox_dir: str = "outbox"
+    outbox_segment_max_bytes: int = 64 * 1024 * 1024
+    outbox_fsync_interval_s: float = 0.005
+    outbox_replay_rate_per_s: float = 2_000.0
+
+    # api runner (src.api.server), 0 workers starts one process per core
+    api_workers: int = 0
+    # set by the runner in every process. With the outbox, process 0 replays the
+    # outboxes of the processes numbered API_WORKERS or above of a previous run
+    api_process_index: int = 0
+    api_host: str = "0.0.0.0"
+    api_port: int = 8000
+
+    # admission control of the ingest routes, per API process, a rate of 0 disables
+    # the limit. Clients are told apart by the key header when it holds one of
+    # the configured keys, else by IP
+    ratelimit_client_rate_per_s: float = 0.0
+    ratelimit_client_burst: int = 100
+    # size it to the measured worker throughput, e.g. from scripts/load_test.py
+    ratelimit_global_rate_per_s: float = 0.0
+    ratelimit_global_burst: int = 1_000
+    ratelimit_key_header: str = "X-API-Key"
+    # JSON list, e.g. RATELIMIT_API_KEYS='["key-a", "key-b"]'
+    ratelimit_api_keys: set[str] = set()
+    ratelimit_idle_s: float = 300.0
+    ratelimit_max_clients: int = 100_000
+
+    # results stream
+    results_stream_buffer_size: int = 1024
+    results_stream_keepalive_s: float = 15.0
+    # rows fetched per round trip by the transactions export, a Parquet row group
+    export_batch_size: int = 10_000
+    # synchronous classification, consumed on its own channel and run on its own
+    # executor threads (or processes), so it does not queue behind the ingest backlog
+    classify_timeout_s: float = 5.0
+    classify_prefetch_count: int = 8
+    classify_max_workers: int = 1
+
+    # telemetry
+    trace_sample_rate: float = 0.0
+    trace_exporter: str = "file"  # "file" or "otlp"
+    trace_file: str = "traces.jsonl"
+    trace_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    worker_metrics_port: int = 0  # 0 disables the worker metrics endpoint
+    # profiling
+    admin_token: str = ""  # empty disables the admin routes
+    profile_dir: str = "profiles"
+    profile_duration_s: float = 10.0
+    profile_interval_s: float = 0.005
+
+    # worker
+    worker_prefetch_count: int = 32
+    worker_drain_timeout_s: float = 30.0
+    # deadline of each classification, including the wait for a free executor slot,
+    # 0 waits forever
+    inference_timeout_s: float = 2.0
+    # "thread", or "process" to predict in child processes that are killed when stuck
+    inference_executor: str = "thread"
+    inference_max_workers: int = 0  # 0 uses the pool default
+    # on a missed deadline: "requeue" up to inference_max_retries times and then
+    # fall back, "fallback" to score with inference_fallback_version (a version in
+    # model_dir, unscored without one) or "unscored" to use the fixed score
+    inference_timeout_policy: str = "requeue"
+    inference_max_retries: int = 2
+    inference_fallback_version: str = ""
+    inference_unscored_risk_score: float = 0.0
+    # staleness, a transaction is only worth scoring until it is mined. Published
+    # messages expire in the broker transaction_ttl_s after the transaction
+    # timestamp; the worker checks the age before inference and, past
+    # stale_after_s, will "skip" it (ack, no result) or score it with the
+    # inference "fallback". 0 disables either check
+    transaction_ttl_s: float = 0.0
+    stale_after_s: float = 0.0
+    stale_policy: str = "skip"
+    # "lifo" hands a free inference slot to the newest prefetched message, so
+    # under overload fresh transactions go first; "fifo" keeps delivery order
+    worker_scheduling: str = "fifo"
+
+    # autoscaler
+    autoscaler_min_workers: int = 1
+    autoscaler_max_workers: int = 8
+    autoscaler_poll_interval_s: float = 2.0
+    autoscaler_target_backlog_per_worker: int = 500
+    autoscaler_scale_down_backlog_per_worker: int = 50
+    autoscaler_scale_down_polls: int = 5
+    autoscaler_cooldown_s: float = 20.0
 
     # oracle ml
     risk_threshold: float = 0.8
     calculation_time_min_ms: int = 50
     calculation_time_max_ms: int = 500
     use_dummy: bool = True
+    model_dir: str = "models"
+    model_poll_interval_s: float = 5.0
+    model_warmup_samples: int = 100
+    # per sender rolling aggregates, an empty list disables them
+    address_feature_windows_s: list[int] = [60, 600, 3600]
+    address_feature_buckets: int = 12
+    address_feature_memory_mb: int = 64
+    # compiled address watchlist, matches are HIGH without calling the model
+    watchlist_file: str = ""
+    watchlist_poll_interval_s: float = 5.0
 
     @computed_field
     @property
@@ -30,4 +167,13 @@ class Settings(BaseSettings):
         return f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_external_port}/{self.postgres_db}"
 
 
-settings = Settings()  # type: ignore
+@cache
+def get_settings() -> Settings:
+    return Settings()  # type: ignore
+
+
+def __getattr__(name: str):
+    # `settings` is built on first use instead of at import time
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,9 @@
-from src.db.models import Transaction
+from src.db.models import StreamOffset, Transaction
+from src.db.types import input_selector
 from src.schemas.transaction import TransactionInput, ClassificationResult
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
 
 
 async def create_transaction(
@@ -16,10 +18,12 @@ async def create_transaction(
         value_eth=tx_input.value_eth,
         gas_price_gwei=tx_input.gas_price_gwei,
         input_data=tx_input.input_data,
+        input_selector=input_selector(tx_input.input_data),
         tx_timestamp=tx_input.timestamp,
         risk_score=classification.risk_score,
         priority=classification.priority,
         inference_time_ms=classification.inference_time_ms,
+        model_version=classification.model_version,
     )
 
     session.add(transaction)
@@ -31,3 +35,24 @@ async def create_transaction(
 async def get_transactions(session: AsyncSession, offset: int, limit: int):
     result = await session.execute(select(Transaction).limit(limit).offset(offset))
     return result.scalars().all()
+
+
+async def get_stream_offset(session: AsyncSession, name: str) -> int | None:
+    result = await session.execute(
+        select(StreamOffset.offset).where(StreamOffset.name == name)
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_stream_offset(session: AsyncSession, name: str, offset: int) -> None:
+    statement = insert(StreamOffset).values(name=name, offset=offset)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[StreamOffset.name],
+            set_={
+                "offset": statement.excluded.offset,
+                "updated_at": text("timezone('utc', now())"),
+            },
+        )
+    )
+    await session.commit()
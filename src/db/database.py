@@ -1,9 +1,23 @@
 from sqlalchemy.orm import MappedAsDataclass, DeclarativeBase
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from src.config.config import settings
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
+from src.config.config import get_settings
 
-engine = create_async_engine(settings.db_url)
-SessionLocal = async_sessionmaker(engine)
+engine: AsyncEngine | None = None
+# Bound to the engine by init_engine, so importing this module does not load the driver
+SessionLocal = async_sessionmaker()
+
+
+def init_engine() -> AsyncEngine:
+    global engine
+    if engine is None:
+        settings = get_settings()
+        engine = create_async_engine(
+            settings.db_url,
+            pool_size=settings.postgres_pool_size,
+            max_overflow=settings.postgres_max_overflow,
+        )
+        SessionLocal.configure(bind=engine)
+    return engine
 
 
 class Base(MappedAsDataclass, DeclarativeBase):
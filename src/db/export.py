@@ -0,0 +1,245 @@
+"""
+Streaming export of the transactions table as NDJSON or Parquet.
+
+Rows are read through a server-side cursor in batches of `batch_size`, so memory
+stays constant whatever the size of the export. Parquet needs the optional
+`pyarrow` dependency (`uv sync --group export`), every batch is a row group.
+
+Usage:
+    uv run python -m src.db.export --since 1700000000 --min-risk 0.8 \\
+        --format parquet -o high_risk.parquet
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import sys
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from src.db.models import Transaction
+
+FORMATS = ("ndjson", "parquet")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+COLUMNS = (
+    "tx_hash",
+    "from_address",
+    "to_address",
+    "value_eth",
+    "gas_price_gwei",
+    "input_data",
+    "input_selector",
+    "tx_timestamp",
+    "risk_score",
+    "priority",
+    "inference_time_ms",
+    "model_version",
+    "created_at",
+)
+
+
+class ExportFormatError(Exception):
+    pass
+
+
+@dataclass
+class ExportFilter:
+    """Time window on the transaction timestamp (epoch seconds, `until` excluded)
+    and risk score range, both ends included."""
+
+    since: int | None = None
+    until: int | None = None
+    min_risk: float | None = None
+    max_risk: float | None = None
+
+
+def export_query(export_filter: ExportFilter) -> Select:
+    table = Transaction.__table__
+    query = select(*(table.c[name] for name in COLUMNS)).order_by(table.c.id)
+    if export_filter.since is not None:
+        query = query.where(table.c.tx_timestamp >= export_filter.since)
+    if export_filter.until is not None:
+        query = query.where(table.c.tx_timestamp < export_filter.until)
+    if export_filter.min_risk is not None:
+        query = query.where(table.c.risk_score >= export_filter.min_risk)
+    if export_filter.max_risk is not None:
+        query = query.where(table.c.risk_score <= export_filter.max_risk)
+    return query
+
+
+async def stream_batches(
+    engine: AsyncEngine, export_filter: ExportFilter, batch_size: int
+) -> AsyncIterator[Sequence[Sequence[Any]]]:
+    """Yields the matching rows as tuples, `batch_size` at a time."""
+    query = export_query(export_filter).execution_options(yield_per=batch_size)
+    async with engine.connect() as connection:
+        result = await connection.stream(query)
+        async for partition in result.partitions():
+            yield partition
+
+
+def ndjson_batch(rows: Sequence[Sequence[Any]]) -> bytes:
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    lines = []
+    for row in rows:
+        record = dict(zip(COLUMNS, row))
+        record["created_at"] = record["created_at"].isoformat()
+        lines.append(dumps(record))
+    lines.append("")
+    return "\n".join(lines).encode("utf-8")
+
+
+async def ndjson_chunks(
+    batches: AsyncIterator[Sequence[Sequence[Any]]],
+) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield ndjson_batch(rows)
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer emits until drained."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("tx_hash", pa.string()),
+            ("from_address", pa.string()),
+            ("to_address", pa.string()),
+            ("value_eth", pa.float64()),
+            ("gas_price_gwei", pa.int64()),
+            ("input_data", pa.string()),
+            ("input_selector", pa.string()),
+            ("tx_timestamp", pa.int64()),
+            ("risk_score", pa.float64()),
+            ("priority", pa.string()),
+            ("inference_time_ms", pa.int64()),
+            ("model_version", pa.string()),
+            ("created_at", pa.timestamp("us")),
+        ]
+    )
+
+
+def require_pyarrow() -> None:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ExportFormatError(
+            "Parquet export needs pyarrow, install it with `uv sync --group export`"
+        )
+
+
+async def parquet_chunks(
+    batches: AsyncIterator[Sequence[Sequence[Any]]],
+) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        # Writes the footer, without it the file is not readable
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(
+    engine: AsyncEngine, export_filter: ExportFilter, format: str, batch_size: int
+) -> AsyncIterator[bytes]:
+    if format not in FORMATS:
+        raise ExportFormatError(f"Unknown export format {format!r}")
+    batches = stream_batches(engine, export_filter, batch_size)
+    if format == "parquet":
+        require_pyarrow()
+        return parquet_chunks(batches)
+    return ndjson_chunks(batches)
+
+
+async def export_to_file(
+    output: io.BufferedIOBase,
+    export_filter: ExportFilter,
+    format: str,
+    batch_size: int,
+) -> None:
+    from src.db.database import init_engine
+
+    engine = init_engine()
+    try:
+        async for chunk in export_chunks(engine, export_filter, format, batch_size):
+            output.write(chunk)
+    finally:
+        await engine.dispose()
+
+
+def timestamp(value: str) -> int:
+    # Epoch seconds or an ISO 8601 date, e.g. 2026-01-31 or 2026-01-31T12:00:00+00:00
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def main():
+    from src.config.config import settings
+
+    parser = argparse.ArgumentParser(description="Export transactions")
+    parser.add_argument("--since", type=timestamp, help="Epoch seconds or ISO date")
+    parser.add_argument("--until", type=timestamp, help="Epoch seconds or ISO date")
+    parser.add_argument("--min-risk", type=float)
+    parser.add_argument("--max-risk", type=float)
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=settings.export_batch_size)
+    parser.add_argument("-o", "--output", help="Output file, stdout by default")
+    args = parser.parse_args()
+
+    export_filter = ExportFilter(args.since, args.until, args.min_risk, args.max_risk)
+    if args.output:
+        with open(args.output, "wb") as output:
+            asyncio.run(
+                export_to_file(output, export_filter, args.format, args.batch_size)
+            )
+    else:
+        asyncio.run(
+            export_to_file(
+                sys.stdout.buffer, export_filter, args.format, args.batch_size
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import io
+import json
+from datetime import datetime
+import pytest
+import pytest_asyncio
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from testcontainers.postgres import PostgresContainer
+from src.db import crud
+from src.db.database import Base
+from src.schemas.transaction import ClassificationResult, Priority, TransactionInput
+from .export import (
+    COLUMNS,
+    ExportFilter,
+    export_chunks,
+    export_query,
+    ndjson_chunks,
+    parquet_chunks,
+)
+
+ROW = (
+    "0x" + "ab" * 32,
+    "0x" + "11" * 20,
+    "0x" + "22" * 20,
+    1.5,
+    30,
+    "0xa9059cbb",
+    "0xa9059cbb",
+    1_700_000_000,
+    0.93,
+    "HIGH",
+    120,
+    "v1",
+    datetime(2026, 1, 31, 12, 0, 0),
+)
+
+
+async def batches_of(*batches):
+    for batch in batches:
+        yield batch
+
+
+def test_export_query_applies_filters():
+    query = export_query(ExportFilter(since=10, until=20, min_risk=0.8))
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "transactions.tx_timestamp >= " in sql
+    assert "transactions.tx_timestamp < " in sql
+    assert "transactions.risk_score >= " in sql
+    assert "risk_score <=" not in sql
+    assert sql.endswith("ORDER BY transactions.id")
+
+
+@pytest.mark.asyncio
+async def test_ndjson_writes_a_line_per_row():
+    chunks = [chunk async for chunk in ndjson_chunks(batches_of([ROW, ROW], [ROW]))]
+
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert len(lines) == 3
+    record = json.loads(lines[0])
+    assert list(record) == list(COLUMNS)
+    assert record["created_at"] == "2026-01-31T12:00:00"
+
+
+@pytest.mark.asyncio
+async def test_parquet_writes_a_row_group_per_batch():
+    pq = pytest.importorskip("pyarrow.parquet")
+    chunks = [chunk async for chunk in parquet_chunks(batches_of([ROW, ROW], [ROW]))]
+
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read()
+    assert table.num_rows == 3
+    assert table.column("tx_hash")[0].as_py() == ROW[0]
+
+
+def test_unknown_format_is_rejected():
+    from .export import ExportFormatError
+
+    with pytest.raises(ExportFormatError):
+        export_chunks(None, ExportFilter(), "csv", 100)
+
+
+@pytest_asyncio.fixture
+async def engine():
+    with PostgresContainer("postgres:16-alpine") as postgres:
+        engine = create_async_engine(
+            f"postgresql+asyncpg://{postgres.username}:{postgres.password}"
+            f"@{postgres.get_container_host_ip()}:{postgres.get_exposed_port(5432)}"
+            f"/{postgres.dbname}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        yield engine
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_export_streams_filtered_rows(engine):
+    session_factory = async_sessionmaker(engine)
+    async with session_factory() as session:
+        for i, risk in enumerate((0.5, 0.85, 0.95)):
+            tx = TransactionInput(
+                tx_hash=f"0x{i:064x}",
+                from_address="0x" + "11" * 20,
+                to_address="0x" + "22" * 20,
+                value_eth=1.0,
+                gas_price_gwei=10,
+                input_data="0xa9059cbb" + "00" * 512,
+                timestamp=1_700_000_000 + i,
+            )
+            result = ClassificationResult(
+                risk_score=risk, inference_time_ms=1, priority=Priority.HIGH
+            )
+            await crud.create_transaction(session, tx, result)
+
+    chunks = export_chunks(
+        engine, ExportFilter(min_risk=0.8, until=1_700_000_002), "ndjson", 1
+    )
+    lines = b"".join([chunk async for chunk in chunks]).decode().splitlines()
+
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["tx_hash"] == f"0x{1:064x}"
+    assert record["input_data"] == "0xa9059cbb" + "00" * 512
+    assert record["input_selector"] == "0xa9059cbb"
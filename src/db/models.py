@@ -1,26 +1,45 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, Integer, Float, Text, text
+from sqlalchemy import BigInteger, DateTime, Integer, Float, Text, text
 from sqlalchemy.orm import Mapped, mapped_column
 from src.db.database import Base
+from src.db.types import HexBytes, InputData
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True, init=False)
-    tx_hash: Mapped[str] = mapped_column(Text)
-    from_address: Mapped[str] = mapped_column(Text)
-    to_address: Mapped[str] = mapped_column(Text)
+    # Hex strings in Python, bytea in the table
+    tx_hash: Mapped[str] = mapped_column(HexBytes, index=True)
+    from_address: Mapped[str] = mapped_column(HexBytes)
+    to_address: Mapped[str] = mapped_column(HexBytes)
     value_eth: Mapped[float] = mapped_column(Float)
     gas_price_gwei: Mapped[int] = mapped_column(Integer)
-    input_data: Mapped[str] = mapped_column(Text)
+    input_data: Mapped[str] = mapped_column(InputData)
+    # Function selector of contract calls, kept apart to filter by it
+    input_selector: Mapped[str | None] = mapped_column(
+        HexBytes, nullable=True, index=True
+    )
     tx_timestamp: Mapped[int] = mapped_column(Integer)
 
     risk_score: Mapped[float] = mapped_column(Float)
     priority: Mapped[str] = mapped_column(Text)
     inference_time_ms: Mapped[int] = mapped_column(Integer)
+    model_version: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=text("timezone('utc', now())"), init=False
     )
+
+
+class StreamOffset(Base):
+    """Last processed offset of a consumer of a RabbitMQ stream."""
+
+    __tablename__ = "stream_offsets"
+
+    name: Mapped[str] = mapped_column(Text, primary_key=True)
+    offset: Mapped[int] = mapped_column(BigInteger)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=text("timezone('utc', now())"), init=False
+    )
@@ -0,0 +1,79 @@
+import re
+import zlib
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+# input_data is stored behind a marker byte: bit 0 set when the rest is zlib
+# compressed, bit 1 set when the rest is the original text instead of hex decoded
+# bytes (the API accepts any string, e.g. odd-length hex)
+COMPRESSED = 0x01
+TEXT = 0x02
+# Smaller payloads gain nothing from compression
+COMPRESS_MIN_BYTES = 256
+SELECTOR_SIZE = 4
+
+HEX_DATA = re.compile(r"0[xX](?:[0-9a-fA-F]{2})*")
+
+
+def hex_to_bytes(value: str) -> bytes:
+    return bytes.fromhex(value[2:])
+
+
+def bytes_to_hex(value: bytes) -> str:
+    return "0x" + value.hex()
+
+
+def encode_input_data(value: str) -> bytes:
+    if HEX_DATA.fullmatch(value):
+        marker, data = 0, hex_to_bytes(value)
+    else:
+        marker, data = TEXT, value.encode("utf-8")
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            marker, data = marker | COMPRESSED, compressed
+    return bytes((marker,)) + data
+
+
+def decode_input_data(value: bytes) -> str:
+    marker, data = value[0], value[1:]
+    if marker & COMPRESSED:
+        data = zlib.decompress(data)
+    if marker & TEXT:
+        return data.decode("utf-8")
+    return bytes_to_hex(data)
+
+
+def input_selector(value: str) -> str | None:
+    """The 4-byte function selector of contract call data, as hex."""
+    if len(value) < 2 + SELECTOR_SIZE * 2 or not HEX_DATA.fullmatch(value):
+        return None
+    return value[: 2 + SELECTOR_SIZE * 2].lower()
+
+
+class HexBytes(TypeDecorator):
+    """`0x` hex strings stored as bytea, half the size of the text. Read back in
+    lower case, the mixed case of checksummed addresses is not kept."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: str | None, dialect) -> bytes | None:
+        return hex_to_bytes(value) if value is not None else None
+
+    def process_result_value(self, value: bytes | None, dialect) -> str | None:
+        return bytes_to_hex(value) if value is not None else None
+
+
+class InputData(TypeDecorator):
+    """Transaction input data stored as bytea behind a marker byte, compressed
+    when it is large enough for it to pay off."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: str | None, dialect) -> bytes | None:
+        return encode_input_data(value) if value is not None else None
+
+    def process_result_value(self, value: bytes | None, dialect) -> str | None:
+        return decode_input_data(value) if value is not None else None
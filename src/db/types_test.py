@@ -0,0 +1,50 @@
+import os
+import pytest
+from .types import (
+    COMPRESSED,
+    TEXT,
+    decode_input_data,
+    encode_input_data,
+    input_selector,
+)
+
+
+@pytest.mark.parametrize(
+    "input_data",
+    [
+        "0x",
+        "0xa9059cbb" + "00" * 64,
+        "0x" + os.urandom(600).hex(),
+        "0xabc",
+        "not hex",
+        "0x" + "ab" * 1_000 + "c",
+    ],
+)
+def test_input_data_round_trips(input_data: str):
+    assert decode_input_data(encode_input_data(input_data)) == input_data
+
+
+def test_hex_input_data_is_stored_as_bytes():
+    stored = encode_input_data("0xa9059cbb")
+    assert stored == b"\x00\xa9\x05\x9c\xbb"
+
+
+def test_large_input_data_is_compressed():
+    # ABI encoded arguments are mostly zero padding
+    input_data = "0xa9059cbb" + "00" * 2_000
+    stored = encode_input_data(input_data)
+    assert stored[0] == COMPRESSED
+    assert len(stored) < 100
+
+    random_data = "0x" + os.urandom(2_000).hex()
+    assert encode_input_data(random_data)[0] == 0
+
+    odd_length = "0x" + "0" * 2_001
+    assert encode_input_data(odd_length)[0] == TEXT | COMPRESSED
+
+
+def test_input_selector():
+    assert input_selector("0xA9059CBB" + "00" * 64) == "0xa9059cbb"
+    assert input_selector("0x") is None
+    assert input_selector("0xa9059c") is None
+    assert input_selector("0xa9059cbbf") is None
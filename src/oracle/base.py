@@ -1,6 +1,12 @@
+from collections.abc import Mapping
 from typing import Protocol
 from src.schemas.transaction import TransactionInput
 
 
 class BaseClassifier(Protocol):
-    def predict(self, transaction: TransactionInput) -> float: ...
+    # `features` are the sender aggregates of AddressFeatureStore, when enabled
+    def predict(
+        self,
+        transaction: TransactionInput,
+        features: Mapping[str, float] | None = None,
+    ) -> float: ...
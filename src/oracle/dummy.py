@@ -1,11 +1,17 @@
 import random
 import time
+from collections.abc import Mapping
 from src.schemas.transaction import TransactionInput
-from src.config.config import settings
+from src.config.config import get_settings
 
 
 class DummyClassifier:
-    def predict(self, transaction: TransactionInput) -> float:
+    def predict(
+        self,
+        transaction: TransactionInput,
+        features: Mapping[str, float] | None = None,
+    ) -> float:
+        settings = get_settings()
         time.sleep(
             random.uniform(
                 settings.calculation_time_min_ms / 1_000,
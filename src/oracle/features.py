@@ -0,0 +1,149 @@
+import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from src.schemas.transaction import TransactionInput
+
+# Per bucket and per window totals: transaction count, sum of value_eth and of gas price
+FIELDS = 3
+EMPTY_HEAD = -(2**62)
+# Rough cost of a slot map entry (20-byte key, int and the OrderedDict links)
+SLOT_OVERHEAD_BYTES = 200
+
+
+class AddressFeatureStore:
+    """Rolling per-sender aggregates over several time windows.
+
+    Every window is a ring of `buckets` buckets of `window / buckets` seconds with
+    running totals, so an update only touches the buckets that expired since the
+    sender was last seen. All the state lives in two preallocated arrays indexed by
+    slot, the slots are assigned to addresses in LRU order and the number of slots
+    is derived from `max_bytes`. Not thread safe, it is updated from the event loop.
+    """
+
+    def __init__(
+        self,
+        windows_s: Sequence[int] = (60, 600, 3600),
+        buckets: int = 12,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.windows_s = tuple(windows_s)
+        self.buckets = buckets
+        self.feature_names = tuple(
+            name
+            for window in self.windows_s
+            for name in (
+                f"tx_count_{window}s",
+                f"value_eth_sum_{window}s",
+                f"gas_price_ratio_{window}s",
+            )
+        )
+        # Integer widths keep the bucket computation in integer arithmetic
+        self._widths = tuple(
+            window // buckets if window % buckets == 0 else window / buckets
+            for window in self.windows_s
+        )
+        # Per window: the buckets followed by the running totals
+        self._window_size = (buckets + 1) * FIELDS
+        self._slot_size = len(self.windows_s) * self._window_size
+
+        slot_bytes = self._slot_size * 8 + len(self.windows_s) * 8 + SLOT_OVERHEAD_BYTES
+        self.capacity = max(1, max_bytes // slot_bytes)
+        self._data = array.array("d", bytes(self.capacity * self._slot_size * 8))
+        # Absolute index of the newest bucket of every window, an empty slot is so far
+        # behind that its first update clears every bucket
+        self._heads = array.array("q", [EMPTY_HEAD]) * (
+            self.capacity * len(self.windows_s)
+        )
+        self._zeros = array.array("d", bytes(self._slot_size * 8))
+        self._slots: OrderedDict[bytes, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _slot(self, key: bytes) -> int:
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+
+        if len(self._slots) < self.capacity:
+            slot = len(self._slots)
+        else:
+            # Evict the least recently seen sender and reuse its slot
+            _, slot = self._slots.popitem(last=False)
+            start = slot * self._slot_size
+            self._data[start : start + self._slot_size] = self._zeros
+            for w in range(len(self.windows_s)):
+                self._heads[slot * len(self.windows_s) + w] = EMPTY_HEAD
+        self._slots[key] = slot
+        return slot
+
+    def update(
+        self, address: str, timestamp: float, value_eth: float, gas_price: float
+    ) -> tuple[float, ...]:
+        """Adds a transaction and returns the window aggregates including it, in
+        the order of `feature_names`."""
+        slot = self._slot(bytes.fromhex(address[2:]))
+        data = self._data
+        heads = self._heads
+        buckets = self.buckets
+        window_size = self._window_size
+        totals_offset = buckets * FIELDS
+        features: list[float] = []
+
+        base = slot * self._slot_size
+        head_index = slot * len(self.windows_s)
+        for width in self._widths:
+            bucket = int(timestamp // width)
+            head = heads[head_index]
+            totals = base + totals_offset
+
+            if bucket > head:
+                if bucket - head >= buckets:
+                    data[base : base + window_size] = self._zeros[:window_size]
+                else:
+                    # Expire the buckets between the old head and the new one
+                    for expired in range(head + 1, bucket + 1):
+                        offset = base + (expired % buckets) * FIELDS
+                        data[totals] -= data[offset]
+                        data[totals + 1] -= data[offset + 1]
+                        data[totals + 2] -= data[offset + 2]
+                        data[offset] = data[offset + 1] = data[offset + 2] = 0.0
+                heads[head_index] = bucket
+                add = True
+            else:
+                # Late transactions older than the window are not counted
+                add = bucket > head - buckets
+
+            if add:
+                offset = base + (bucket % buckets) * FIELDS
+                data[offset] += 1
+                data[offset + 1] += value_eth
+                data[offset + 2] += gas_price
+                count = data[totals] = data[totals] + 1
+                value_sum = data[totals + 1] = data[totals + 1] + value_eth
+                gas_sum = data[totals + 2] = data[totals + 2] + gas_price
+            else:
+                count = data[totals]
+                value_sum = data[totals + 1]
+                gas_sum = data[totals + 2]
+
+            # Gas price against the window mean, > 1 is a spike for this sender
+            features += (
+                count,
+                value_sum,
+                gas_price * count / gas_sum if gas_sum > 0 else 1.0,
+            )
+            base += window_size
+            head_index += 1
+        return tuple(features)
+
+    def observe(self, transaction: TransactionInput) -> dict[str, float]:
+        """Updates the sender aggregates with `transaction` and returns them."""
+        values = self.update(
+            transaction.from_address,
+            transaction.timestamp,
+            transaction.value_eth,
+            transaction.gas_price_gwei,
+        )
+        return dict(zip(self.feature_names, values))
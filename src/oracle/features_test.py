@@ -0,0 +1,59 @@
+import pytest
+from .features import AddressFeatureStore
+from .linear import FEATURES, LinearClassifier, WEIGHTS_FILE, write_linear_model
+from .registry import synthetic_transaction
+
+SENDER = "0x742d35Cc6634C0532925a3b844Bc454e4438f44e"
+
+
+def test_windows_expire_old_transactions():
+    store = AddressFeatureStore(windows_s=(60, 600), buckets=6)
+
+    store.update(SENDER, 1_000, value_eth=1.0, gas_price=10)
+    store.update(SENDER, 1_030, value_eth=2.0, gas_price=10)
+    features = store.update(SENDER, 1_050, value_eth=4.0, gas_price=40)
+
+    # count, value_eth sum, gas price ratio per window
+    assert features == (3, 7.0, pytest.approx(2.0), 3, 7.0, pytest.approx(2.0))
+
+    # 100 s later the 1 min window only holds the new transaction
+    assert store.update(SENDER, 1_150, value_eth=8.0, gas_price=20)[:3] == (1, 8.0, 1.0)
+    assert store.update(SENDER, 1_151, value_eth=0.0, gas_price=20)[3:5] == (5, 15.0)
+
+    # Far in the future every window has been cleared
+    assert store.update(SENDER, 10_000, value_eth=1.0, gas_price=20)[::3] == (1, 1)
+
+
+def test_late_transactions_outside_the_window_are_ignored():
+    store = AddressFeatureStore(windows_s=(60,), buckets=6)
+
+    store.update(SENDER, 1_000, value_eth=1.0, gas_price=10)
+    assert store.update(SENDER, 900, value_eth=5.0, gas_price=10)[:2] == (1, 1.0)
+    assert store.update(SENDER.lower(), 990, value_eth=5.0, gas_price=10)[:2] == (
+        2,
+        6.0,
+    )
+
+
+def test_least_recently_seen_sender_is_evicted():
+    store = AddressFeatureStore(windows_s=(60,), buckets=6, max_bytes=1)
+    other = "0x" + "11" * 20
+
+    store.update(SENDER, 1_000, value_eth=1.0, gas_price=10)
+    store.update(other, 1_001, value_eth=1.0, gas_price=10)
+
+    assert len(store) == store.capacity == 1
+    assert store.update(SENDER, 1_002, value_eth=1.0, gas_price=10)[0] == 1
+
+
+def test_linear_classifier_uses_address_features(tmp_path):
+    store = AddressFeatureStore(windows_s=(60,))
+    names = (*FEATURES, "tx_count_60s")
+    write_linear_model(tmp_path, bias=-5, weights=[0.0, 0.0, 0.0, 1.0], features=names)
+    classifier = LinearClassifier(tmp_path / WEIGHTS_FILE, names)
+    transaction = synthetic_transaction()
+
+    assert classifier.predict(transaction) < 0.01
+    for _ in range(9):
+        features = store.observe(transaction)
+    assert classifier.predict(transaction, features) > 0.98
@@ -0,0 +1,76 @@
+import array
+import json
+import math
+import mmap
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from src.schemas.transaction import TransactionInput
+
+# Features computed from the transaction itself, a manifest may list sender aggregates
+# (AddressFeatureStore.feature_names) after them
+FEATURES = ("value_eth", "gas_price_gwei", "input_data_bytes")
+
+MANIFEST_FILE = "manifest.json"
+WEIGHTS_FILE = "weights.bin"
+
+
+def extract_features(transaction: TransactionInput) -> tuple[float, ...]:
+    return (
+        math.log1p(transaction.value_eth),
+        math.log1p(transaction.gas_price_gwei),
+        math.log1p(max(len(transaction.input_data) - 2, 0) / 2),
+    )
+
+
+class LinearClassifier:
+    """Logistic regression whose weights are memory-mapped from the artefact file.
+
+    The weights file holds `1 + len(features)` float64 values (bias first), the
+    pages are shared between every worker process that loads the same artefact.
+    Sender aggregates missing at prediction time count as 0.
+    """
+
+    def __init__(self, weights_path: Path, features: Sequence[str] = FEATURES):
+        if tuple(features[: len(FEATURES)]) != FEATURES:
+            raise ValueError(f"Features must start with {FEATURES}, got {features}")
+        with open(weights_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._weights = memoryview(self._mmap).cast("d")
+        if len(self._weights) != len(features) + 1:
+            raise ValueError(
+                f"Expected {len(features) + 1} weights, found {len(self._weights)}"
+            )
+        self._address_features = tuple(features[len(FEATURES) :])
+
+    def predict(
+        self,
+        transaction: TransactionInput,
+        features: Mapping[str, float] | None = None,
+    ) -> float:
+        weights = self._weights
+        z = weights[0]
+        for i, value in enumerate(extract_features(transaction), start=1):
+            z += weights[i] * value
+        if self._address_features and features:
+            offset = len(FEATURES) + 1
+            for i, name in enumerate(self._address_features, start=offset):
+                z += weights[i] * features.get(name, 0.0)
+        # Numerically stable sigmoid, math.exp overflows for large |z|
+        if z >= 0:
+            return 1 / (1 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1 + e)
+
+
+def write_linear_model(
+    path: Path, bias: float, weights: list[float], features: Sequence[str] = FEATURES
+) -> None:
+    """Writes a LinearClassifier artefact into the `path` directory."""
+    if len(weights) != len(features):
+        raise ValueError(f"Expected {len(features)} weights, got {len(weights)}")
+
+    path.mkdir(parents=True, exist_ok=True)
+    (path / WEIGHTS_FILE).write_bytes(array.array("d", [bias, *weights]).tobytes())
+    (path / MANIFEST_FILE).write_text(
+        json.dumps({"kind": "linear", "features": list(features)})
+    )
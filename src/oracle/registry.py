@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from src.oracle.base import BaseClassifier
+from src.oracle.linear import (
+    FEATURES,
+    MANIFEST_FILE,
+    WEIGHTS_FILE,
+    LinearClassifier,
+)
+from src.schemas.transaction import TransactionInput
+
+logger = logging.getLogger(__name__)
+
+# File in the model directory with the name of the version to serve
+CURRENT_FILE = "CURRENT"
+
+
+class ModelNotFoundError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    version: str
+    classifier: BaseClassifier
+
+
+def synthetic_transaction() -> TransactionInput:
+    return TransactionInput(
+        tx_hash="0x" + os.urandom(32).hex(),
+        from_address="0x" + os.urandom(20).hex(),
+        to_address="0x" + os.urandom(20).hex(),
+        value_eth=random.uniform(0, 100),
+        gas_price_gwei=random.randint(1, 500),
+        input_data="0x" + os.urandom(random.randint(0, 100)).hex(),
+        timestamp=int(time.time()),
+    )
+
+
+class ModelRegistry:
+    """Serves the model version named in `<model_dir>/CURRENT`.
+
+    Versions live in `<model_dir>/<version>/` with a manifest and their artefacts.
+    A new version is loaded and warmed up on synthetic transactions before it
+    replaces the active one, the swap is a single reference assignment so
+    in-flight predictions keep using the model they started with.
+    """
+
+    def __init__(self, model_dir: str | Path, warmup_samples: int = 100):
+        self.model_dir = Path(model_dir)
+        self.warmup_samples = warmup_samples
+        self._active: LoadedModel | None = None
+
+    @property
+    def active(self) -> LoadedModel:
+        if self._active is None:
+            raise ModelNotFoundError(f"No model loaded from {self.model_dir}")
+        return self._active
+
+    def predict(
+        self,
+        transaction: TransactionInput,
+        features: Mapping[str, float] | None = None,
+    ) -> float:
+        return self.active.classifier.predict(transaction, features)
+
+    def current_version(self) -> str:
+        try:
+            return (self.model_dir / CURRENT_FILE).read_text().strip()
+        except FileNotFoundError:
+            raise ModelNotFoundError(f"{CURRENT_FILE} not found in {self.model_dir}")
+
+    def load(self, version: str) -> LoadedModel:
+        path = self.model_dir / version
+        try:
+            manifest = json.loads((path / MANIFEST_FILE).read_text())
+        except FileNotFoundError:
+            raise ModelNotFoundError(f"Model {version} not found in {self.model_dir}")
+
+        kind = manifest.get("kind")
+        if kind == "linear":
+            classifier = LinearClassifier(
+                path / WEIGHTS_FILE, tuple(manifest.get("features", FEATURES))
+            )
+        else:
+            raise ModelNotFoundError(f"Unknown model kind {kind!r} for {version}")
+        return LoadedModel(version=version, classifier=classifier)
+
+    def warm_up(self, model: LoadedModel) -> None:
+        for _ in range(self.warmup_samples):
+            model.classifier.predict(synthetic_transaction())
+
+    def refresh(self) -> bool:
+        """Swaps in the version named in CURRENT if it changed, returns True on swap."""
+        version = self.current_version()
+        if self._active is not None and self._active.version == version:
+            return False
+
+        time_start = time.perf_counter()
+        model = self.load(version)
+        self.warm_up(model)
+        self._active = model
+        logger.info(
+            "Model %s loaded and warmed up in %.1f ms",
+            version,
+            (time.perf_counter() - time_start) * 1_000,
+        )
+        return True
+
+    def pin(self, version: str) -> LoadedModel:
+        """Loads and warms up `version` as the active model, whatever CURRENT says.
+
+        The model stays active as long as `refresh` is not called, e.g. to replay
+        transactions into a version that is not deployed yet.
+        """
+        model = self.load(version)
+        self.warm_up(model)
+        self._active = model
+        return model
+
+    async def watch(self, interval_s: float) -> None:
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                # Loading and warm-up run off the event loop, consumption is not paused
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("Could not reload model, keeping the active one")
@@ -0,0 +1,62 @@
+from pathlib import Path
+import pytest
+from src.worker.main import work_classify
+from .linear import write_linear_model
+from .registry import (
+    CURRENT_FILE,
+    ModelNotFoundError,
+    ModelRegistry,
+    synthetic_transaction,
+)
+
+
+def deploy(model_dir: Path, version: str, bias: float) -> None:
+    write_linear_model(model_dir / version, bias=bias, weights=[0.0, 0.0, 0.0])
+    (model_dir / CURRENT_FILE).write_text(version)
+
+
+def test_refresh_swaps_to_current_version(tmp_path: Path):
+    deploy(tmp_path, "v1", bias=-10)
+    registry = ModelRegistry(tmp_path, warmup_samples=5)
+
+    assert registry.refresh()
+    assert registry.active.version == "v1"
+    assert registry.predict(synthetic_transaction()) < 0.01
+    assert not registry.refresh()
+
+    deploy(tmp_path, "v2", bias=10)
+    assert registry.refresh()
+    assert registry.active.version == "v2"
+    assert registry.predict(synthetic_transaction()) > 0.99
+
+
+def test_failed_load_keeps_active_model(tmp_path: Path):
+    deploy(tmp_path, "v1", bias=0)
+    registry = ModelRegistry(tmp_path, warmup_samples=0)
+    registry.refresh()
+
+    (tmp_path / CURRENT_FILE).write_text("missing")
+    with pytest.raises(ModelNotFoundError):
+        registry.refresh()
+    assert registry.active.version == "v1"
+
+
+def test_work_classify_records_model_version(tmp_path: Path):
+    deploy(tmp_path, "v7", bias=10)
+    registry = ModelRegistry(tmp_path, warmup_samples=0)
+    registry.refresh()
+
+    result = work_classify(registry, synthetic_transaction())
+
+    assert result.model_version == "v7"
+
+
+def test_pin_serves_version_other_than_current(tmp_path: Path):
+    deploy(tmp_path, "v2", bias=10)
+    deploy(tmp_path, "v1", bias=-10)
+    registry = ModelRegistry(tmp_path, warmup_samples=0)
+
+    registry.pin("v2")
+
+    assert registry.active.version == "v2"
+    assert work_classify(registry, synthetic_transaction()).model_version == "v2"
@@ -0,0 +1,192 @@
+"""
+Address watchlists (sanctions, known scams) compiled into a memory-mapped file.
+
+File layout, little endian:
+    magic (4 bytes) | version (uint32) | number of keys (uint64)
+    prefix index: 65537 uint32, position of the first key of every 2-byte prefix
+    keys: sorted and unique 20-byte addresses
+
+Usage:
+    uv run python -m src.oracle.watchlist compile sanctions.txt scams.txt \\
+        -o watchlists/watchlist.bin
+"""
+
+import argparse
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+from src.schemas.transaction import TransactionInput
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WLST"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQ")
+PREFIXES = 1 << 16
+INDEX_SIZE = (PREFIXES + 1) * 4
+KEY_SIZE = 20
+KEYS_OFFSET = HEADER.size + INDEX_SIZE
+
+
+class WatchlistFormatError(Exception):
+    pass
+
+
+def address_key(address: str) -> bytes:
+    key = bytes.fromhex(address.removeprefix("0x").removeprefix("0X"))
+    if len(key) != KEY_SIZE:
+        raise ValueError(f"Not a 20-byte address: {address!r}")
+    return key
+
+
+def compile_watchlist(addresses: Iterable[str], path: str | Path) -> int:
+    """Writes the addresses as a watchlist file, returns the number of keys.
+
+    The file is written next to `path` and renamed over it, so readers polling
+    `path` only ever see a complete file.
+    """
+    keys = sorted({address_key(address) for address in addresses})
+
+    index = [0] * (PREFIXES + 1)
+    for key in keys:
+        index[(key[0] << 8 | key[1]) + 1] += 1
+    for prefix in range(PREFIXES):
+        index[prefix + 1] += index[prefix]
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(keys)))
+            f.write(struct.pack(f"<{PREFIXES + 1}I", *index))
+            f.write(b"".join(keys))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(keys)
+
+
+class WatchlistFile:
+    """Read-only view of a compiled watchlist.
+
+    The file is memory-mapped, so every worker process shares the same page cache
+    pages. A lookup reads one index entry and scans, in C with `mmap.find`, the few
+    keys sharing the 2-byte prefix of the address (about 30 for 2M addresses).
+    """
+
+    def __init__(self, path: str | Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < KEYS_OFFSET:
+            raise WatchlistFormatError(f"{path} is too short to be a watchlist")
+        magic, version, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise WatchlistFormatError(f"{path} is not a version {FORMAT_VERSION} file")
+        if len(self._mmap) != KEYS_OFFSET + count * KEY_SIZE:
+            raise WatchlistFormatError(f"{path} is truncated")
+        self._count = count
+        self._index = memoryview(self._mmap)[HEADER.size : KEYS_OFFSET].cast("I")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def contains_key(self, key: bytes) -> bool:
+        prefix = key[0] << 8 | key[1]
+        start = KEYS_OFFSET + self._index[prefix] * KEY_SIZE
+        end = KEYS_OFFSET + self._index[prefix + 1] * KEY_SIZE
+        position = self._mmap.find(key, start, end)
+        # A match straddling two keys is not a key, keep looking after it
+        while position != -1:
+            if (position - KEYS_OFFSET) % KEY_SIZE == 0:
+                return True
+            position = self._mmap.find(key, position + 1, end)
+        return False
+
+    def __contains__(self, address: str) -> bool:
+        return self.contains_key(bytes.fromhex(address[2:]))
+
+
+class Watchlist:
+    """Serves the watchlist at `path`, reloaded when the file is replaced.
+
+    The swap is a single reference assignment, like ModelRegistry, and a missing
+    file simply matches nothing.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file: WatchlistFile | None = None
+        self._stat: tuple[int, int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self._file) if self._file is not None else 0
+
+    def matches(self, transaction: TransactionInput) -> bool:
+        watchlist = self._file
+        if watchlist is None:
+            return False
+        return (
+            transaction.from_address in watchlist or transaction.to_address in watchlist
+        )
+
+    def refresh(self) -> bool:
+        """Loads the file if it was replaced since the last call, True on swap."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return False
+        # os.replace creates a new inode, mtime and size cover in-place rewrites
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._stat:
+            return False
+
+        self._file = WatchlistFile(self.path)
+        self._stat = key
+        logger.info("Watchlist %s loaded with %d addresses", self.path, len(self))
+        return True
+
+    async def watch(self, interval_s: float) -> None:
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("Could not reload watchlist, keeping the active one")
+
+
+def read_addresses(paths: Iterable[str]) -> Iterable[str]:
+    # One address per line, blank lines and `#` comments are skipped
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                address = line.split("#", 1)[0].strip()
+                if address:
+                    yield address
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Address watchlist tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compile_parser = subparsers.add_parser(
+        "compile", help="Compile address lists into a watchlist file"
+    )
+    compile_parser.add_argument("inputs", nargs="+", help="Text files, one per line")
+    compile_parser.add_argument("-o", "--output", required=True, help="Output file")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        count = compile_watchlist(read_addresses(args.inputs), args.output)
+        print(f"Compiled {count} addresses into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
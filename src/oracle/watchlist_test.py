@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+import pytest
+from src.oracle.registry import synthetic_transaction
+from .watchlist import (
+    Watchlist,
+    WatchlistFile,
+    WatchlistFormatError,
+    compile_watchlist,
+)
+
+
+def random_address() -> str:
+    return "0x" + os.urandom(20).hex()
+
+
+def test_compiled_file_lookups(tmp_path: Path):
+    listed = [random_address() for _ in range(5_000)]
+    # Keys sharing a 2-byte prefix make a long bucket for the prefix scan
+    listed += ["0x0000" + os.urandom(18).hex() for _ in range(50)]
+    # Two adjacent keys whose bytes, read across the boundary between them, spell
+    # an address of the same bucket: the scan finds it but it is not a key
+    listed = [address for address in listed if not address.startswith("0x0101")]
+    listed += ["0x0101" + "11" * 16 + "0101", "0x0101" + "22" * 18]
+    straddling = "0x0101" + "0101" + "22" * 16
+    path = tmp_path / "watchlist.bin"
+
+    assert compile_watchlist(listed + [listed[0].upper().replace("0X", "0x")], path)
+    watchlist = WatchlistFile(path)
+
+    assert len(watchlist) == len(listed)
+    assert all(address in watchlist for address in listed)
+    assert not any(random_address() in watchlist for _ in range(5_000))
+    assert "0x0000" + "00" * 18 not in watchlist
+    assert straddling not in watchlist
+
+
+def test_rejects_files_that_are_not_watchlists(tmp_path: Path):
+    path = tmp_path / "watchlist.bin"
+    path.write_bytes(b"not a watchlist")
+
+    with pytest.raises(WatchlistFormatError):
+        WatchlistFile(path)
+
+
+def test_watchlist_reloads_replaced_file(tmp_path: Path):
+    path = tmp_path / "watchlist.bin"
+    transaction = synthetic_transaction()
+    watchlist = Watchlist(path)
+
+    assert not watchlist.refresh()
+    assert not watchlist.matches(transaction)
+
+    compile_watchlist([random_address()], path)
+    assert watchlist.refresh()
+    assert not watchlist.matches(transaction)
+    assert not watchlist.refresh()
+
+    compile_watchlist([transaction.to_address], path)
+    assert watchlist.refresh()
+    assert watchlist.matches(transaction)
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+from aio_pika import ExchangeType, Message
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[Any], Awaitable[None]]
+
+
+class QueueNotFoundError(Exception):
+    pass
+
+
+@dataclass
+class DeclarationResult:
+    message_count: int
+    consumer_count: int
+
+
+class QueueState:
+    """Messages and consumers of a queue, shared by every channel declaring it."""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.messages: asyncio.Queue[Message] = asyncio.Queue(maxsize=maxsize)
+        self.consumers: dict[str, asyncio.Task] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def spawn(self, coroutine: Awaitable[None]) -> None:
+        # Keep a reference, the loop only holds weak references to tasks
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def put(self, message: Message, timeout: float | None = None) -> None:
+        await asyncio.wait_for(self.messages.put(message), timeout=timeout)
+
+    def requeue(self, message: Message) -> None:
+        try:
+            self.messages.put_nowait(message)
+        except asyncio.QueueFull:
+            # Room was taken by publishers meanwhile, wait for it off the consumer
+            self.spawn(self.messages.put(message))
+
+    def stop(self) -> None:
+        for tag in list(self.consumers):
+            self.consumers.pop(tag).cancel()
+
+
+class InProcessIncomingMessage:
+    """A delivered message, settled with ack/nack like an aio-pika one."""
+
+    def __init__(
+        self,
+        queue: QueueState,
+        message: Message,
+        on_settle: Callable[[], None] | None = None,
+    ):
+        self._queue = queue
+        self._message = message
+        self._on_settle = on_settle
+        self.settled = False
+        self.body = message.body
+        self.headers = message.headers
+        self.content_type = message.content_type
+        self.correlation_id = message.correlation_id
+        self.reply_to = message.reply_to
+        # Messages are published to queues through the default exchange
+        self.routing_key = queue.name
+
+    def _settle(self) -> None:
+        if self.settled:
+            raise RuntimeError("Message already acknowledged")
+        self.settled = True
+        if self._on_settle is not None:
+            self._on_settle()
+
+    async def ack(self, multiple: bool = False) -> None:
+        self._settle()
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        self._settle()
+        if requeue:
+            self._queue.requeue(self._message)
+
+    async def reject(self, requeue: bool = False) -> None:
+        await self.nack(requeue=requeue)
+
+
+class InProcessQueue:
+    """A queue as seen from a channel, consumers use the channel prefetch count.
+
+    Queues are bounded: publishers wait for room, so a slow consumer slows them
+    down instead of growing memory without limit.
+    """
+
+    def __init__(self, channel: "InProcessChannel", state: QueueState):
+        self.channel = channel
+        self.state = state
+        self.name = state.name
+
+    @property
+    def declaration_result(self) -> DeclarationResult:
+        return DeclarationResult(self.state.messages.qsize(), len(self.state.consumers))
+
+    async def bind(self, exchange: "InProcessExchange", routing_key: str = "") -> None:
+        exchange.bind(self.state, routing_key)
+
+    async def consume(self, callback: Callback, no_ack: bool = False) -> str:
+        tag = uuid.uuid4().hex
+        self.state.consumers[tag] = asyncio.create_task(
+            self._consume(callback, no_ack, self.channel.prefetch_count)
+        )
+        return tag
+
+    async def cancel(self, consumer_tag: str) -> None:
+        # Only stops new deliveries, the ones in progress still ack or nack
+        task = self.state.consumers.pop(consumer_tag, None)
+        if task is not None:
+            task.cancel()
+
+    async def _consume(self, callback: Callback, no_ack: bool, prefetch: int) -> None:
+        limit = asyncio.Semaphore(prefetch) if prefetch and not no_ack else None
+        while True:
+            if limit is not None:
+                await limit.acquire()
+            message = await self.state.messages.get()
+            incoming = InProcessIncomingMessage(
+                self.state, message, limit.release if limit is not None else None
+            )
+            if no_ack:
+                incoming.settled = True
+            # No await between get() and spawn(), a cancel can not lose the message
+            self.state.spawn(self._deliver(callback, incoming))
+
+    async def _deliver(
+        self, callback: Callback, message: InProcessIncomingMessage
+    ) -> None:
+        try:
+            await callback(message)
+        except Exception:
+            logger.exception("Unhandled error in consumer of %s", self.name)
+            # Requeued as RabbitMQ does once the channel of a failed consumer closes
+            if not message.settled:
+                await message.nack(requeue=True)
+
+
+class InProcessExchange:
+    """Routes by exact routing key; fanout exchanges ignore the key."""
+
+    def __init__(self, broker: "InProcessBroker", name: str, type: ExchangeType):
+        self.broker = broker
+        self.name = name
+        self.type = type
+        self._bindings: list[tuple[QueueState, str]] = []
+
+    def bind(self, queue: QueueState, routing_key: str) -> None:
+        self._bindings.append((queue, routing_key))
+
+    def unbind_queue(self, queue: QueueState) -> None:
+        self._bindings = [b for b in self._bindings if b[0] is not queue]
+
+    def route(self, routing_key: str) -> list[QueueState]:
+        if not self.name:
+            # Default exchange, the routing key is the queue name
+            queue = self.broker.queues.get(routing_key)
+            return [queue] if queue is not None else []
+        return [
+            queue
+            for queue, key in self._bindings
+            if self.type == ExchangeType.FANOUT or key in (routing_key, "#")
+        ]
+
+    async def publish(
+        self,
+        message: Message,
+        routing_key: str,
+        *,
+        mandatory: bool = True,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> None:
+        # Unroutable messages are dropped, as RabbitMQ does for the default exchange
+        for queue in self.route(routing_key):
+            await queue.put(message, timeout)
+
+
+class InProcessChannel:
+    """The subset of an aio-pika channel used by the API, worker and RPC client."""
+
+    def __init__(self, broker: "InProcessBroker"):
+        self.broker = broker
+        self.default_exchange = broker.default_exchange
+        self.prefetch_count = 0
+        self.is_closed = False
+        self._exclusive: list[QueueState] = []
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs: Any) -> None:
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(
+        self,
+        name: str | None = None,
+        *,
+        durable: bool = False,
+        exclusive: bool = False,
+        auto_delete: bool = False,
+        passive: bool = False,
+        arguments: dict | None = None,
+        **kwargs: Any,
+    ) -> InProcessQueue:
+        name = str(name.value if hasattr(name, "value") else name) if name else None
+        state = self.broker.queues.get(name) if name else None
+        if state is None:
+            if passive:
+                raise QueueNotFoundError(f"Queue {name!r} not found")
+            state = QueueState(
+                name or f"amq.gen-{uuid.uuid4().hex}", self.broker.queue_size
+            )
+            self.broker.queues[state.name] = state
+            if exclusive:
+                self._exclusive.append(state)
+        return InProcessQueue(self, state)
+
+    async def declare_exchange(
+        self,
+        name: str,
+        type: ExchangeType = ExchangeType.DIRECT,
+        durable: bool = False,
+        **kwargs: Any,
+    ) -> InProcessExchange:
+        name = str(name.value if hasattr(name, "value") else name)
+        exchange = self.broker.exchanges.get(name)
+        if exchange is None:
+            exchange = self.broker.exchanges[name] = InProcessExchange(
+                self.broker, name, type
+            )
+        return exchange
+
+    async def close(self) -> None:
+        # Exclusive queues belong to the channel that declared them
+        for queue in self._exclusive:
+            queue.stop()
+            self.broker.delete_queue(queue)
+        self._exclusive.clear()
+        self.is_closed = True
+
+
+class InProcessBroker:
+    """In-memory stand-in for RabbitMQ for a single process running the whole flow.
+
+    It implements the part of the aio-pika API the code relies on (default and
+    named exchanges, bounded queues, consumers with prefetch and ack/nack with
+    requeue) and can be used wherever a channel pool is expected. Messages are
+    lost when the process exits, and message expiration is not enforced.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.queues: dict[str, QueueState] = {}
+        self.exchanges: dict[str, InProcessExchange] = {}
+        self.default_exchange = InProcessExchange(self, "", ExchangeType.DIRECT)
+
+    def channel(self) -> InProcessChannel:
+        return InProcessChannel(self)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[InProcessChannel]:
+        # Same interface as aio_pika.pool.Pool, channels are free to create
+        yield self.channel()
+
+    def delete_queue(self, queue: QueueState) -> None:
+        self.queues.pop(queue.name, None)
+        for exchange in self.exchanges.values():
+            exchange.unbind_queue(queue)
+
+    async def close(self) -> None:
+        for queue in self.queues.values():
+            queue.stop()
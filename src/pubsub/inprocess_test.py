@@ -0,0 +1,199 @@
+import asyncio
+import pytest
+from aio_pika import ExchangeType, Message
+from httpx import ASGITransport, AsyncClient
+from asgi_lifespan import LifespanManager
+from src.config.config import settings
+from src.pubsub.pubsub import QueueName, publish_transaction
+from src.schemas.transaction import TransactionInput
+from .inprocess import InProcessBroker, QueueNotFoundError
+
+TRANSACTION = {
+    "tx_hash": "0x" + "ab" * 32,
+    "from_address": "0x" + "11" * 20,
+    "to_address": "0x" + "22" * 20,
+    "value_eth": 1.5,
+    "gas_price_gwei": 30,
+    "input_data": "0x",
+    "timestamp": 1_700_000_000,
+}
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.001)
+
+
+@pytest.mark.asyncio
+async def test_nack_requeues_and_ack_settles():
+    broker = InProcessBroker(queue_size=10)
+    channel = broker.channel()
+    queue = await channel.declare_queue(name="jobs")
+    deliveries: list[bytes] = []
+
+    async def callback(message) -> None:
+        deliveries.append(message.body)
+        if len(deliveries) == 1:
+            await message.nack()
+        else:
+            await message.ack()
+
+    await queue.consume(callback)
+    await channel.default_exchange.publish(Message(body=b"job"), routing_key="jobs")
+    await wait_for(lambda: len(deliveries) == 2)
+    await asyncio.sleep(0.01)
+
+    assert deliveries == [b"job", b"job"]
+    assert queue.declaration_result.message_count == 0
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_unsettled_message_is_redelivered_after_error():
+    broker = InProcessBroker(queue_size=10)
+    queue = await broker.channel().declare_queue(name="jobs")
+    attempts = 0
+
+    async def callback(message) -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("boom")
+        await message.ack()
+
+    await queue.consume(callback)
+    await broker.default_exchange.publish(Message(body=b"job"), routing_key="jobs")
+    await wait_for(lambda: attempts == 2)
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_limits_unacked_deliveries():
+    broker = InProcessBroker(queue_size=10)
+    channel = broker.channel()
+    await channel.set_qos(prefetch_count=2)
+    queue = await channel.declare_queue(name="jobs")
+    held = []
+
+    async def callback(message) -> None:
+        held.append(message)
+
+    await queue.consume(callback)
+    for i in range(5):
+        await channel.default_exchange.publish(
+            Message(body=str(i).encode()), routing_key="jobs"
+        )
+    await wait_for(lambda: len(held) == 2)
+    await asyncio.sleep(0.01)
+    assert len(held) == 2
+
+    await held[0].ack()
+    await wait_for(lambda: len(held) == 3)
+    assert queue.declaration_result.message_count == 2
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_to_publishers():
+    broker = InProcessBroker(queue_size=1)
+    channel = broker.channel()
+    await channel.declare_queue(name="jobs")
+    await channel.default_exchange.publish(Message(body=b"1"), routing_key="jobs")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await channel.default_exchange.publish(
+            Message(body=b"2"), routing_key="jobs", timeout=0.01
+        )
+
+
+@pytest.mark.asyncio
+async def test_exchanges_route_by_key_and_fanout():
+    broker = InProcessBroker(queue_size=10)
+    channel = broker.channel()
+    topic = await channel.declare_exchange("results", type=ExchangeType.TOPIC)
+    high = await channel.declare_queue(exclusive=True)
+    await high.bind(topic, routing_key="HIGH")
+    fanout = await channel.declare_exchange("members", type=ExchangeType.FANOUT)
+    members = await channel.declare_queue(exclusive=True)
+    await members.bind(fanout)
+
+    await topic.publish(Message(body=b"low"), routing_key="LOW")
+    await topic.publish(Message(body=b"high"), routing_key="HIGH")
+    await fanout.publish(Message(body=b"hello"), routing_key="")
+
+    assert high.declaration_result.message_count == 1
+    assert members.declaration_result.message_count == 1
+
+    await channel.close()
+    with pytest.raises(QueueNotFoundError):
+        await broker.channel().declare_queue(name=high.name, passive=True)
+
+
+@pytest.mark.asyncio
+async def test_embedded_pipeline_classifies_without_rabbitmq(monkeypatch):
+    monkeypatch.setattr(settings, "pipeline_mode", "embedded")
+    monkeypatch.setattr(settings, "embedded_persist", False)
+    monkeypatch.setattr(settings, "use_dummy", True)
+    monkeypatch.setattr(settings, "calculation_time_min_ms", 0)
+    monkeypatch.setattr(settings, "calculation_time_max_ms", 0)
+    monkeypatch.setattr(settings, "watchlist_file", "")
+    # Every transaction is HIGH, so every one is published to the results stream
+    monkeypatch.setattr(settings, "risk_threshold", -1.0)
+    from src.api.main import app
+
+    async with LifespanManager(app) as manager:
+        results = app.state.result_broadcaster.subscribe()
+        async with AsyncClient(
+            transport=ASGITransport(app=manager.app), base_url="http://test"
+        ) as client:
+            response = await client.post("/transactions/", json=TRANSACTION)
+            assert response.status_code == 202
+
+            result = await asyncio.wait_for(results.get(), timeout=5)
+            assert TRANSACTION["tx_hash"] in result.decode()
+
+            health = (await client.get("/healthz")).json()
+            assert health["rabbitmq"] == "ok"
+            assert health["postgres"] == "disabled"
+
+        # The channel pool is the in-process broker
+        _, success = await publish_transaction(
+            app.state.channel_pool, TransactionInput(**TRANSACTION)
+        )
+        assert success
+        assert QueueName.TRANSACTION.value in app.state.broker.queues
+
+
+@pytest.mark.asyncio
+async def test_classify_does_not_wait_behind_the_ingest_backlog(monkeypatch):
+    monkeypatch.setattr(settings, "pipeline_mode", "embedded")
+    monkeypatch.setattr(settings, "embedded_persist", False)
+    monkeypatch.setattr(settings, "use_dummy", True)
+    monkeypatch.setattr(settings, "calculation_time_min_ms", 50)
+    monkeypatch.setattr(settings, "calculation_time_max_ms", 50)
+    monkeypatch.setattr(settings, "watchlist_file", "")
+    monkeypatch.setattr(settings, "stale_after_s", 0.0)
+    monkeypatch.setattr(settings, "inference_max_workers", 2)
+    monkeypatch.setattr(settings, "inference_timeout_s", 0.0)
+    from src.api.main import app
+
+    async with LifespanManager(app) as manager:
+        # Every ingest slot is busy and the prefetch window is full behind them
+        for i in range(200):
+            tx = TransactionInput(**(TRANSACTION | {"tx_hash": f"0x{i:064x}"}))
+            _, success = await publish_transaction(app.state.channel_pool, tx)
+            assert success
+        backlog = app.state.broker.queues[QueueName.TRANSACTION.value].messages
+
+        async with AsyncClient(
+            transport=ASGITransport(app=manager.app), base_url="http://test"
+        ) as client:
+            started = asyncio.get_running_loop().time()
+            response = await client.post("/transactions/classify", json=TRANSACTION)
+            elapsed = asyncio.get_running_loop().time() - started
+
+        assert response.status_code == 200
+        assert response.json()["tx_hash"] == TRANSACTION["tx_hash"]
+        assert elapsed < 0.4
+        assert backlog.qsize() > 0
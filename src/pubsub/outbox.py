@@ -0,0 +1,384 @@
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import time
+import zlib
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length, crc32 of the payload, enqueue time in ns
+RECORD_HEADER = struct.Struct("<IIQ")
+SEGMENT_SUFFIX = ".log"
+# Replay position: segment number and offset of the next record to publish
+CURSOR_FILE = "cursor"
+CURSOR = struct.Struct("<QQ")
+# Records that can never be published, in the segment record format
+DEAD_LETTER_FILE = "dead-letter"
+# Held with flock by the process using the directory
+LOCK_FILE = "lock"
+# Subdirectory of the outbox of every API process but the first one
+PROCESS_DIR_PREFIX = "api-"
+
+# Publishes (body, enqueued_ns), returns False if the broker did not take it and
+# raises InvalidRecordError if the record itself can not be published
+Publisher = Callable[[bytes, int], Awaitable[bool]]
+
+
+class InvalidRecordError(Exception):
+    pass
+
+
+class OutboxLockedError(Exception):
+    pass
+
+
+@dataclass
+class OutboxStats:
+    pending_messages: int
+    segments: int
+    size_bytes: int
+    spilled_total: int
+    replayed_total: int
+    dead_lettered_total: int
+    replay_rate_per_s: float
+
+
+def segment_name(number: int) -> str:
+    return f"{number:020d}{SEGMENT_SUFFIX}"
+
+
+def process_outbox_dir(root: str | Path, index: int) -> Path:
+    # A segment has a single writer, so every API process has its own directory.
+    # The first one keeps the root, it replays what a single-process run left
+    return Path(root) if index == 0 else Path(root) / f"{PROCESS_DIR_PREFIX}{index}"
+
+
+def orphan_outbox_dirs(root: str | Path, processes: int) -> list[Path]:
+    """Directories of the API processes numbered `processes` or above, left by a
+    previous run with more of them."""
+    orphans = []
+    for path in Path(root).glob(f"{PROCESS_DIR_PREFIX}*"):
+        index = path.name.removeprefix(PROCESS_DIR_PREFIX)
+        if path.is_dir() and index.isdigit() and int(index) >= max(processes, 1):
+            orphans.append((int(index), path))
+    return [path for _, path in sorted(orphans)]
+
+
+class Outbox:
+    """Append-only log of messages that could not be published to the broker.
+
+    Records are appended to numbered segment files and fsync'd in groups: every
+    `append` waits for the next fsync, which covers all the records written since
+    the previous one. A replay task publishes the records in order, persists its
+    position in a cursor file and deletes the segments it has finished. Delivery
+    is at least once, a crash between a publish and the cursor write repeats it.
+    Records the publisher rejects as invalid are moved to a dead-letter file, so
+    they do not hold back the ones behind them.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        fsync_interval_s: float = 0.01,
+    ):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_interval_s = fsync_interval_s
+        self.pending = 0
+        self.spilled_total = 0
+        self.replayed_total = 0
+        self.dead_lettered_total = 0
+        self.replay_rate_per_s = 0.0
+        self._segments: list[int] = []
+        self._writer = None
+        self._written = 0
+        # Bytes of the active segment known to be on disk, replay never reads past it
+        self._durable = 0
+        self._waiters: list[asyncio.Future] = []
+        self._flush_task: asyncio.Task | None = None
+        # Serializes fsyncs and segment rolls, the fsync runs in a thread
+        self._lock = asyncio.Lock()
+        self._cursor = (0, 0)
+        self._lock_file = None
+
+    @property
+    def _active(self) -> int:
+        return self._segments[-1]
+
+    def open(self) -> None:
+        """Recovers the log left by a previous run and opens a new active segment.
+
+        Raises OutboxLockedError if another process has the directory open.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.directory / LOCK_FILE, "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise OutboxLockedError(f"Outbox {self.directory} is in use") from None
+        self._segments = sorted(
+            int(path.stem) for path in self.directory.glob(f"*{SEGMENT_SUFFIX}")
+        )
+        cursor_path = self.directory / CURSOR_FILE
+        if cursor_path.exists():
+            self._cursor = CURSOR.unpack(cursor_path.read_bytes())
+
+        for number in self._segments:
+            if number < self._cursor[0]:
+                (self.directory / segment_name(number)).unlink()
+                continue
+            offset = self._cursor[1] if number == self._cursor[0] else 0
+            count, valid_size = self._scan(number, offset)
+            self.pending += count
+            path = self.directory / segment_name(number)
+            if valid_size < path.stat().st_size:
+                # Torn tail of a record that was never acknowledged to the client
+                logger.warning("Truncating outbox segment %s at %d", path, valid_size)
+                os.truncate(path, valid_size)
+        self._segments = [n for n in self._segments if n >= self._cursor[0]]
+
+        # Appends always go to a new segment, after any recovered one
+        self._open_segment(max([*self._segments, self._cursor[0]]) + 1)
+        if self._cursor[0] not in self._segments:
+            self._cursor = (self._segments[0], 0)
+        if self.pending:
+            logger.warning("Outbox holds %d messages to replay", self.pending)
+
+    def _scan(self, number: int, offset: int) -> tuple[int, int]:
+        """Counts the valid records from `offset`, returns (count, valid size)."""
+        count = 0
+        with open(self.directory / segment_name(number), "rb") as f:
+            f.seek(offset)
+            for _, _, end in self._records(f, offset):
+                count += 1
+                offset = end
+        return count, offset
+
+    @staticmethod
+    def _records(f, offset: int, limit: int | None = None):
+        """Yields (payload, enqueued_ns, end offset) of the valid records."""
+        while limit is None or offset < limit:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, crc, enqueued_ns = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            offset += RECORD_HEADER.size + length
+            yield payload, enqueued_ns, offset
+
+    def _open_segment(self, number: int) -> None:
+        self._segments.append(number)
+        self._writer = open(self.directory / segment_name(number), "ab")
+        self._written = self._durable = self._writer.tell()
+
+    async def _roll(self, number: int) -> None:
+        """Moves the appends to a new segment, called holding the lock."""
+        previous = self._writer
+        self._open_segment(number)
+        if previous is not None:
+            # Pending appends are acknowledged by the next _sync, after this one
+            previous.flush()
+            await asyncio.to_thread(os.fsync, previous.fileno())
+            previous.close()
+
+    async def append(self, payload: bytes, enqueued_ns: int | None = None) -> None:
+        """Appends a record and returns once it has been fsync'd."""
+        if self._writer is None:
+            raise RuntimeError("Outbox is not open")
+        if self._written >= self.segment_max_bytes:
+            async with self._lock:
+                if self._written >= self.segment_max_bytes:
+                    await self._roll(self._active + 1)
+
+        header = RECORD_HEADER.pack(
+            len(payload), zlib.crc32(payload), enqueued_ns or time.time_ns()
+        )
+        self._writer.write(header + payload)
+        self._written += len(header) + len(payload)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await waiter
+        self.pending += 1
+        self.spilled_total += 1
+
+    async def _flush_later(self) -> None:
+        # Waiting a little lets concurrent appends share a single fsync
+        await asyncio.sleep(self.fsync_interval_s)
+        try:
+            await self._sync()
+        except Exception:
+            # The waiting appends get the error, the caller answers 503
+            logger.exception("Could not fsync the outbox")
+
+    async def _sync(self) -> None:
+        async with self._lock:
+            waiters, self._waiters = self._waiters, []
+            if self._writer is None:
+                return
+            written = self._written
+            try:
+                self._writer.flush()
+                await asyncio.to_thread(os.fsync, self._writer.fileno())
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                raise
+            self._durable = written
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self) -> OutboxStats:
+        size = 0
+        for number in self._segments:
+            try:
+                size += (self.directory / segment_name(number)).stat().st_size
+            except FileNotFoundError:
+                pass
+        return OutboxStats(
+            pending_messages=self.pending,
+            segments=len(self._segments),
+            size_bytes=size,
+            spilled_total=self.spilled_total,
+            replayed_total=self.replayed_total,
+            dead_lettered_total=self.dead_lettered_total,
+            replay_rate_per_s=round(self.replay_rate_per_s, 1),
+        )
+
+    def read_batch(self, max_records: int) -> list[tuple[bytes, int, int, int]]:
+        """Reads up to `max_records` from the cursor, as (payload, enqueued_ns,
+        segment, end offset), moving to the next segment when one is finished."""
+        batch: list[tuple[bytes, int, int, int]] = []
+        number, offset = self._cursor
+        while len(batch) < max_records and number in self._segments:
+            active = number == self._active
+            limit = self._durable if active else None
+            with open(self.directory / segment_name(number), "rb") as f:
+                f.seek(offset)
+                for payload, enqueued_ns, end in self._records(f, offset, limit):
+                    batch.append((payload, enqueued_ns, number, end))
+                    if len(batch) == max_records:
+                        break
+            if active or len(batch) == max_records:
+                break
+            number = self._segments[self._segments.index(number) + 1]
+            offset = 0
+        return batch
+
+    def commit(self, number: int, offset: int) -> None:
+        """Moves the cursor past a published record, deleting finished segments."""
+        self._cursor = (number, offset)
+        cursor_path = self.directory / CURSOR_FILE
+        tmp_path = cursor_path.with_suffix(".tmp")
+        tmp_path.write_bytes(CURSOR.pack(number, offset))
+        os.replace(tmp_path, cursor_path)
+        while self._segments[0] < number:
+            (self.directory / segment_name(self._segments.pop(0))).unlink()
+
+    def dead_letter(self, payload: bytes, enqueued_ns: int) -> None:
+        header = RECORD_HEADER.pack(len(payload), zlib.crc32(payload), enqueued_ns)
+        with open(self.directory / DEAD_LETTER_FILE, "ab") as f:
+            f.write(header + payload)
+        self.dead_lettered_total += 1
+
+    async def replay(
+        self,
+        publish: Publisher,
+        rate_per_s: float,
+        idle_interval_s: float = 1.0,
+        batch_size: int = 100,
+        until_empty: bool = False,
+    ) -> None:
+        """Publishes the pending records at up to `rate_per_s`, forever or, with
+        `until_empty`, until every record has been published."""
+        while True:
+            batch = self.read_batch(batch_size) if self.pending else []
+            if not batch:
+                self.replay_rate_per_s = 0.0
+                if until_empty:
+                    return
+                await asyncio.sleep(idle_interval_s)
+                continue
+
+            started = time.perf_counter()
+            published = 0
+            for payload, enqueued_ns, number, end in batch:
+                try:
+                    ok = await publish(payload, enqueued_ns)
+                except InvalidRecordError as e:
+                    logger.error(
+                        "Dead-lettering outbox record %d:%d: %s", number, end, e
+                    )
+                    self.dead_letter(payload, enqueued_ns)
+                    ok = True
+                except Exception:
+                    logger.exception("Could not replay outbox record")
+                    ok = False
+                if not ok:
+                    break
+                published += 1
+                self.pending -= 1
+                self.replayed_total += 1
+            if published:
+                _, _, number, end = batch[published - 1]
+                self.commit(number, end)
+
+            # Rate limit, and back off while the broker is still unavailable
+            elapsed = time.perf_counter() - started
+            delay = published / rate_per_s - elapsed if rate_per_s > 0 else 0
+            self.replay_rate_per_s = published / max(elapsed + max(delay, 0), 1e-9)
+            if published < len(batch):
+                await asyncio.sleep(idle_interval_s)
+            elif delay > 0:
+                await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            await self._sync()
+            self._writer.close()
+            self._writer = None
+        if self._lock_file is not None:
+            # Closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+
+async def replay_outboxes(
+    directories: Iterable[Path], publish: Publisher, rate_per_s: float
+) -> int:
+    """Replays the outboxes of `directories` no other process has open until they
+    are empty, returns the records published."""
+    replayed = 0
+    for directory in directories:
+        outbox = Outbox(directory)
+        try:
+            outbox.open()
+        except OutboxLockedError:
+            logger.info(
+                "Outbox %s is in use by another process, skipping it", directory
+            )
+            continue
+        try:
+            if outbox.pending:
+                logger.warning(
+                    "Replaying %d messages left in outbox %s", outbox.pending, directory
+                )
+            await outbox.replay(publish, rate_per_s, until_empty=True)
+            replayed += outbox.replayed_total
+        finally:
+            await outbox.close()
+    return replayed
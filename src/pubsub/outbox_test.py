@@ -0,0 +1,120 @@
+import asyncio
+from pathlib import Path
+import pytest
+from .outbox import DEAD_LETTER_FILE, InvalidRecordError, Outbox, segment_name
+
+
+async def append_all(outbox: Outbox, payloads: list[bytes]) -> None:
+    await asyncio.gather(*(outbox.append(payload) for payload in payloads))
+
+
+@pytest.mark.asyncio
+async def test_replay_publishes_in_order_across_segments(tmp_path: Path):
+    outbox = Outbox(tmp_path, segment_max_bytes=100, fsync_interval_s=0)
+    outbox.open()
+    payloads = [f"message-{i}".encode() for i in range(20)]
+    for payload in payloads:
+        await outbox.append(payload)
+    assert outbox.stats().segments > 1
+
+    published = []
+
+    async def publish(payload: bytes, enqueued_ns: int) -> bool:
+        published.append(payload)
+        return True
+
+    task = asyncio.create_task(outbox.replay(publish, rate_per_s=0, batch_size=7))
+    while outbox.pending:
+        await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert published == payloads
+    stats = outbox.stats()
+    assert stats.replayed_total == stats.spilled_total == 20
+    assert stats.segments == 1
+    await outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_share_fsync(tmp_path: Path, mocker):
+    fsync = mocker.spy(__import__("os"), "fsync")
+    outbox = Outbox(tmp_path, fsync_interval_s=0.01)
+    outbox.open()
+
+    await append_all(outbox, [b"x"] * 50)
+
+    assert outbox.pending == 50
+    assert fsync.call_count == 1
+    await outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_reopen_resumes_from_cursor_and_drops_torn_tail(tmp_path: Path):
+    outbox = Outbox(tmp_path, fsync_interval_s=0)
+    outbox.open()
+    await append_all(outbox, [b"a", b"b", b"c"])
+    first, _, number, end = outbox.read_batch(1)[0]
+    assert first == b"a"
+    outbox.commit(number, end)
+    await outbox.close()
+    # A record whose write was interrupted
+    with open(tmp_path / segment_name(number), "ab") as f:
+        f.write(b"\x05\x00")
+
+    reopened = Outbox(tmp_path, fsync_interval_s=0)
+    reopened.open()
+
+    assert reopened.pending == 2
+    assert [record[0] for record in reopened.read_batch(10)] == [b"b", b"c"]
+    await reopened.append(b"d")
+    assert [record[0] for record in reopened.read_batch(10)] == [b"b", b"c", b"d"]
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_stops_while_broker_is_down(tmp_path: Path):
+    outbox = Outbox(tmp_path, fsync_interval_s=0)
+    outbox.open()
+    await append_all(outbox, [b"a", b"b"])
+
+    async def publish(payload: bytes, enqueued_ns: int) -> bool:
+        return False
+
+    task = asyncio.create_task(outbox.replay(publish, rate_per_s=0, idle_interval_s=1))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert outbox.pending == 2
+    assert outbox.replayed_total == 0
+    await outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_dead_letters_invalid_records(tmp_path: Path):
+    outbox = Outbox(tmp_path, fsync_interval_s=0)
+    outbox.open()
+    await append_all(outbox, [b"a", b"not a transaction", b"c"])
+    published = []
+
+    async def publish(payload: bytes, enqueued_ns: int) -> bool:
+        if payload == b"not a transaction":
+            raise InvalidRecordError("invalid")
+        published.append(payload)
+        return True
+
+    task = asyncio.create_task(outbox.replay(publish, rate_per_s=0))
+    while outbox.pending:
+        await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert published == [b"a", b"c"]
+    assert outbox.stats().dead_lettered_total == 1
+    dead_letter = (tmp_path / DEAD_LETTER_FILE).read_bytes()
+    assert dead_letter.endswith(b"not a transaction")
+    await outbox.close()
+
+    # The cursor moved past it, a restart does not replay it again
+    reopened = Outbox(tmp_path, fsync_interval_s=0)
+    reopened.open()
+    assert reopened.pending == 0
+    await reopened.close()
@@ -1,38 +1,195 @@
 import aio_pika
+import time
 from enum import Enum
 from typing import Tuple
-from aio_pika import Message, DeliveryMode
-from aio_pika.abc import AbstractRobustConnection
+from aio_pika import ExchangeType, Message, DeliveryMode
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractQueue,
+    AbstractRobustConnection,
+)
 from aio_pika.pool import Pool
-from src.config.config import settings
-from src.schemas.transaction import TransactionInput
+from src.config.config import get_settings
+from src.pubsub.sharding import shard_for, shard_queue_name
+from src.pubsub.stream import stream_mode, stream_queue_arguments
+from src.schemas.transaction import ClassifiedTransaction, TransactionInput
+from src.telemetry.tracing import ENQUEUED_AT_HEADER, TRACEPARENT_HEADER, TraceContext
+
+
+# Times a transaction was republished after missing its inference deadline
+RETRY_COUNT_HEADER = "x-retry-count"
+# x- headers set by the publishers, the broker sets the others
+APPLICATION_X_HEADERS = frozenset({ENQUEUED_AT_HEADER, RETRY_COUNT_HEADER})
 
 
 class QueueName(str, Enum):
     TRANSACTION = "transaction"
+    # Synchronous classification requests, kept apart so they skip the ingest backlog
+    CLASSIFY = "transaction.classify"
+
+
+class ExchangeName(str, Enum):
+    # Topic exchange with every classification result, routed by priority (HIGH/LOW)
+    RESULTS = "results"
 
 
 async def get_connection() -> AbstractRobustConnection:
+    settings = get_settings()
     return await aio_pika.connect_robust(
         host=settings.rabbitmq_host, port=settings.rabbitmq_queue_port
     )
 
 
+async def declare_results_exchange(channel: AbstractChannel) -> AbstractExchange:
+    return await channel.declare_exchange(
+        name=ExchangeName.RESULTS, type=ExchangeType.TOPIC, durable=True
+    )
+
+
+async def declare_transaction_queue(channel: AbstractChannel) -> AbstractQueue:
+    # Every declaration must match, RabbitMQ rejects a queue redeclared with
+    # different arguments
+    return await channel.declare_queue(
+        name=QueueName.TRANSACTION,
+        durable=True,
+        arguments=stream_queue_arguments() if stream_mode() else None,
+    )
+
+
+def transaction_routing_key(tx: TransactionInput) -> str:
+    settings = get_settings()
+    if settings.shard_count > 0:
+        return shard_queue_name(shard_for(tx.from_address, settings.shard_count))
+    return QueueName.TRANSACTION
+
+
+def message_headers(
+    trace: TraceContext | None = None, enqueued_ns: int | None = None
+) -> dict:
+    headers: dict = {ENQUEUED_AT_HEADER: enqueued_ns or time.time_ns()}
+    if trace is not None:
+        headers[TRACEPARENT_HEADER] = trace.to_traceparent()
+    return headers
+
+
+def message_expiration(tx: TransactionInput) -> float | None:
+    """Seconds left of TRANSACTION_TTL_S, counted from the transaction timestamp."""
+    settings = get_settings()
+    if settings.transaction_ttl_s <= 0:
+        return None
+    return max(settings.transaction_ttl_s - (time.time() - tx.timestamp), 0.0)
+
+
 async def publish_transaction(
-    channel_pool: Pool, tx: TransactionInput
+    channel_pool: Pool,
+    tx: TransactionInput,
+    body: bytes | None = None,
+    trace: TraceContext | None = None,
+    enqueued_ns: int | None = None,
 ) -> Tuple[str, bool]:
+    """Publishes the transaction, reusing `body` when it holds the already validated JSON.
+
+    `enqueued_ns` keeps the original enqueue time of messages replayed from the outbox.
+    """
+    settings = get_settings()
+    if body is None:
+        body = tx.model_dump_json().encode(encoding="utf-8")
+
     try:
         async with channel_pool.acquire() as channel:
             message = Message(
-                body=tx.model_dump_json().encode(encoding="utf-8"),
+                body=body,
                 delivery_mode=DeliveryMode.PERSISTENT,
                 content_type="application/json",
+                headers=message_headers(trace, enqueued_ns),
+                # Classic queues only drop expired messages from the head of the
+                # queue, the worker checks the age again before inference
+                expiration=message_expiration(tx),
             )
             await channel.default_exchange.publish(
-                message, routing_key=QueueName.TRANSACTION
+                message,
+                routing_key=transaction_routing_key(tx),
+                timeout=settings.publish_confirm_timeout_s,
             )
 
         return ("", True)
 
     except Exception as e:
         return (f"Error: {e}", False)
+
+
+async def publish_result(
+    exchange: AbstractExchange, result: ClassifiedTransaction
+) -> Tuple[str, bool]:
+    # Results are a live feed, they are not persisted by the broker
+    try:
+        message = Message(
+            body=result.model_dump_json().encode(encoding="utf-8"),
+            delivery_mode=DeliveryMode.NOT_PERSISTENT,
+            content_type="application/json",
+        )
+        await exchange.publish(
+            message, routing_key=result.priority.value, mandatory=False
+        )
+
+        return ("", True)
+
+    except Exception as e:
+        return (f"Error: {e}", False)
+
+
+async def publish_reply(
+    exchange: AbstractExchange,
+    reply_to: str,
+    correlation_id: str | None,
+    result: ClassifiedTransaction,
+) -> Tuple[str, bool]:
+    try:
+        message = Message(
+            body=result.model_dump_json().encode(encoding="utf-8"),
+            delivery_mode=DeliveryMode.NOT_PERSISTENT,
+            content_type="application/json",
+            correlation_id=correlation_id,
+        )
+        # The caller may have timed out already and its reply queue may be gone
+        await exchange.publish(message, routing_key=reply_to, mandatory=False)
+
+        return ("", True)
+
+    except Exception as e:
+        return (f"Error: {e}", False)
+
+
+async def publish_retry(
+    exchange: AbstractExchange, message: AbstractIncomingMessage, retries: int
+) -> Tuple[str, bool]:
+    """Republishes a delivered transaction to the back of its queue."""
+    settings = get_settings()
+    # Other x- headers are set by the broker on delivery (e.g. x-stream-offset,
+    # x-death) and describe the original message, not the copy
+    headers = {
+        name: value
+        for name, value in (message.headers or {}).items()
+        if not name.startswith("x-") or name in APPLICATION_X_HEADERS
+    }
+    headers[RETRY_COUNT_HEADER] = retries
+    try:
+        retry = Message(
+            body=message.body,
+            delivery_mode=DeliveryMode.PERSISTENT,
+            content_type=message.content_type,
+            headers=headers,
+        )
+        # Published through the default exchange, the routing key is the queue name
+        await exchange.publish(
+            retry,
+            routing_key=message.routing_key or QueueName.TRANSACTION,
+            timeout=settings.publish_confirm_timeout_s,
+        )
+
+        return ("", True)
+
+    except Exception as e:
+        return (f"Error: {e}", False)
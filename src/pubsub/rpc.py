@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+from aio_pika import DeliveryMode, Message
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage, AbstractQueue
+from src.pubsub.pubsub import QueueName, message_headers
+
+
+class RpcClient:
+    """Request/reply over RabbitMQ with a single exclusive reply queue per process.
+
+    Every call registers a future under its correlation id, the reply consumer
+    resolves it, so any number of concurrent calls share one queue and consumer.
+    """
+
+    def __init__(self):
+        self._futures: dict[str, asyncio.Future[bytes]] = {}
+        self._channel: AbstractChannel | None = None
+        self._reply_queue: AbstractQueue | None = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._futures)
+
+    async def start(self, channel: AbstractChannel) -> None:
+        self._channel = channel
+        self._reply_queue = await channel.declare_queue(
+            exclusive=True, auto_delete=True
+        )
+        await self._reply_queue.consume(self.on_reply, no_ack=True)
+
+    def close(self) -> None:
+        for future in self._futures.values():
+            if not future.done():
+                future.cancel()
+        self._futures.clear()
+
+    async def on_reply(self, message: AbstractIncomingMessage) -> None:
+        future = self._futures.pop(message.correlation_id or "", None)
+        # Replies for calls that already timed out are discarded
+        if future is not None and not future.done():
+            future.set_result(message.body)
+
+    async def call(self, body: bytes, timeout: float) -> bytes:
+        if self._channel is None or self._reply_queue is None:
+            raise RuntimeError("RpcClient is not started")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        correlation_id = uuid.uuid4().hex
+        future = loop.create_future()
+        self._futures[correlation_id] = future
+        try:
+            message = Message(
+                body=body,
+                delivery_mode=DeliveryMode.NOT_PERSISTENT,
+                content_type="application/json",
+                correlation_id=correlation_id,
+                reply_to=self._reply_queue.name,
+                headers=message_headers(),
+                # Dropped by the broker if no worker takes it before the caller gives up
+                expiration=timeout,
+            )
+            await self._channel.default_exchange.publish(
+                message, routing_key=QueueName.CLASSIFY, timeout=timeout
+            )
+            return await asyncio.wait_for(future, timeout=deadline - loop.time())
+        finally:
+            self._futures.pop(correlation_id, None)
@@ -0,0 +1,50 @@
+import asyncio
+from unittest.mock import AsyncMock
+import pytest
+from pytest_mock import MockerFixture
+from .pubsub import QueueName
+from .rpc import RpcClient
+
+
+async def start_client(mocker: MockerFixture) -> tuple[RpcClient, AsyncMock]:
+    channel = mocker.Mock()
+    reply_queue = mocker.Mock()
+    reply_queue.name = "amq.gen-reply"
+    reply_queue.consume = AsyncMock()
+    channel.declare_queue = AsyncMock(return_value=reply_queue)
+    channel.default_exchange.publish = AsyncMock()
+
+    client = RpcClient()
+    await client.start(channel)
+    return client, channel.default_exchange.publish
+
+
+@pytest.mark.asyncio
+async def test_call_resolves_with_reply(mocker: MockerFixture):
+    client, publish = await start_client(mocker)
+
+    call = asyncio.create_task(client.call(b"{}", timeout=1))
+    await asyncio.sleep(0)
+
+    request = publish.call_args.args[0]
+    assert publish.call_args.kwargs["routing_key"] == QueueName.CLASSIFY
+    assert request.reply_to == "amq.gen-reply"
+
+    reply = mocker.Mock(correlation_id=request.correlation_id, body=b"result")
+    await client.on_reply(reply)
+
+    assert await call == b"result"
+    assert client.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_call_times_out_and_forgets_future(mocker: MockerFixture):
+    client, publish = await start_client(mocker)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.call(b"{}", timeout=0.01)
+
+    assert client.in_flight == 0
+    # A late reply is ignored
+    request = publish.call_args.args[0]
+    await client.on_reply(mocker.Mock(correlation_id=request.correlation_id))
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from aio_pika import DeliveryMode, ExchangeType, Message
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractQueue,
+)
+
+logger = logging.getLogger(__name__)
+
+SHARD_QUEUE_PREFIX = "transaction.shard."
+# Fanout exchange where the workers consuming shards announce themselves
+MEMBERSHIP_EXCHANGE = "transaction.shard.members"
+
+
+def shard_queue_name(shard: int) -> str:
+    return f"{SHARD_QUEUE_PREFIX}{shard}"
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): when `buckets` grows from n to n + 1
+    only 1 / (n + 1) of the keys move, all of them to the new bucket."""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_for(address: str, shard_count: int) -> int:
+    # Addresses are already uniformly distributed, the lowest 64 bits are the key
+    return jump_hash(int(address[-16:], 16), shard_count)
+
+
+def rendezvous_weight(member: str, shard: int) -> int:
+    digest = hashlib.blake2b(f"{member}:{shard}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def assign_shards(member: str, members: Iterable[str], shard_count: int) -> set[int]:
+    """Shards owned by `member`: each shard goes to the member with the highest
+    rendezvous weight, so a join or leave only moves that member's shards."""
+    members = list(members)
+    return {
+        shard
+        for shard in range(shard_count)
+        if max(members, key=lambda m: rendezvous_weight(m, shard)) == member
+    }
+
+
+async def declare_shard_queues(
+    channel: AbstractChannel, shard_count: int
+) -> list[AbstractQueue]:
+    # Only one worker gets the messages of a shard at a time, even while two of them
+    # consume it during a rebalance
+    return [
+        await channel.declare_queue(
+            name=shard_queue_name(shard),
+            durable=True,
+            arguments={"x-single-active-consumer": True},
+        )
+        for shard in range(shard_count)
+    ]
+
+
+class ShardMessage:
+    """A delivered shard message whose ack or nack is sent by its ShardConsumer."""
+
+    def __init__(self, message: AbstractIncomingMessage):
+        self._message = message
+        self.settle: Callable[[], Awaitable[None]] | None = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._message, name)
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.settle = self._message.ack
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        self.settle = lambda: self._message.nack(requeue=requeue)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.settle = lambda: self._message.reject(requeue=requeue)
+
+
+class ShardConsumer:
+    """Processes the messages of one shard queue one at a time, in delivery order.
+
+    The callback of a message ends before the next one starts, so the messages of
+    a sender are processed in order. On `release` the consumer is cancelled once
+    the message in progress is finished but before it is acked: with a prefetch
+    of 1 the next owner then starts right after it. Only a message delivered
+    while the cancel is in flight is requeued, and may be processed after the
+    next one.
+    """
+
+    def __init__(
+        self,
+        queue: AbstractQueue,
+        callback: Callable[[AbstractIncomingMessage], Awaitable[None]],
+    ):
+        self.queue = queue
+        self.callback = callback
+        self._lock = asyncio.Lock()
+        self._consumer_tag: str | None = None
+        self._releasing = False
+
+    async def start(self) -> None:
+        self._consumer_tag = await self.queue.consume(self.on_message)
+
+    async def on_message(self, message: AbstractIncomingMessage) -> None:
+        async with self._lock:
+            if self._consumer_tag is None:
+                # Delivered while releasing, it goes back to the queue for the next owner
+                await message.nack(requeue=True)
+                return
+            shard_message = ShardMessage(message)
+            try:
+                await self.callback(shard_message)
+            finally:
+                if self._releasing:
+                    await self._cancel()
+                if shard_message.settle is not None:
+                    await shard_message.settle()
+
+    async def release(self) -> None:
+        self._releasing = True
+        # Waits for the message in progress, its callback cancels the consumer
+        async with self._lock:
+            await self._cancel()
+
+    async def _cancel(self) -> None:
+        if self._consumer_tag is not None:
+            consumer_tag, self._consumer_tag = self._consumer_tag, None
+            await self.queue.cancel(consumer_tag)
+
+
+class ShardBalancer:
+    """Consumes the subset of shard queues owned by this worker.
+
+    Workers publish heartbeats to a fanout exchange and every worker computes the
+    same assignment from the live members, so no coordinator is needed. Members
+    missing heartbeats for `member_ttl_s` are dropped and their shards taken over.
+    Every shard is processed serially by a ShardConsumer, `channel` should have a
+    prefetch of 1 so that a worker holds no more than the message in progress.
+    """
+
+    def __init__(
+        self,
+        channel: AbstractChannel,
+        callback: Callable[[AbstractIncomingMessage], Awaitable[None]],
+        shard_count: int,
+        heartbeat_interval_s: float,
+        member_ttl_s: float,
+        member_id: str | None = None,
+    ):
+        self.channel = channel
+        self.callback = callback
+        self.shard_count = shard_count
+        self.heartbeat_interval_s = heartbeat_interval_s
+        self.member_ttl_s = member_ttl_s
+        self.member_id = member_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._last_seen: dict[str, float] = {}
+        self._queues: list[AbstractQueue] = []
+        self._consumers: dict[int, ShardConsumer] = {}
+        self._exchange: AbstractExchange | None = None
+        self._lock = asyncio.Lock()
+        self._stopped = False
+
+    @property
+    def owned(self) -> set[int]:
+        return set(self._consumers)
+
+    def members(self, now: float) -> list[str]:
+        alive = [
+            member
+            for member, seen in self._last_seen.items()
+            if now - seen <= self.member_ttl_s
+        ]
+        return sorted({*alive, self.member_id})
+
+    def on_heartbeat(self, member: str, leave: bool, now: float) -> None:
+        if leave:
+            self._last_seen.pop(member, None)
+        else:
+            self._last_seen[member] = now
+
+    async def on_message(self, message: AbstractIncomingMessage) -> None:
+        try:
+            data = json.loads(message.body)
+            self.on_heartbeat(
+                data["member"], data.get("leave", False), time.monotonic()
+            )
+        except (ValueError, KeyError):
+            logger.warning("Ignoring malformed shard heartbeat")
+            return
+        if data.get("leave"):
+            await self.rebalance()
+
+    async def start(self) -> None:
+        self._queues = await declare_shard_queues(self.channel, self.shard_count)
+        self._exchange = await self.channel.declare_exchange(
+            name=MEMBERSHIP_EXCHANGE, type=ExchangeType.FANOUT
+        )
+        membership_queue = await self.channel.declare_queue(
+            exclusive=True, auto_delete=True
+        )
+        await membership_queue.bind(self._exchange)
+        await membership_queue.consume(self.on_message, no_ack=True)
+        await self.heartbeat()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.heartbeat()
+                await self.rebalance()
+            except Exception:
+                logger.exception("Shard rebalance failed")
+            await asyncio.sleep(self.heartbeat_interval_s)
+
+    async def stop(self) -> None:
+        async with self._lock:
+            self._stopped = True
+            for shard in sorted(self.owned):
+                await self._release(shard)
+        # Lets the other workers take the shards over without waiting for the TTL
+        await self.heartbeat(leave=True)
+
+    async def heartbeat(self, leave: bool = False) -> None:
+        if self._exchange is None:
+            return
+        body = json.dumps({"member": self.member_id, "leave": leave}).encode()
+        await self._exchange.publish(
+            Message(body=body, delivery_mode=DeliveryMode.NOT_PERSISTENT),
+            routing_key="",
+        )
+
+    async def rebalance(self) -> None:
+        async with self._lock:
+            if self._stopped:
+                return
+            members = self.members(time.monotonic())
+            wanted = assign_shards(self.member_id, members, self.shard_count)
+            if wanted == self.owned:
+                return
+            logger.info(
+                "Rebalancing shards among %d workers: %s -> %s",
+                len(members),
+                sorted(self.owned),
+                sorted(wanted),
+            )
+            for shard in sorted(self.owned - wanted):
+                await self._release(shard)
+            for shard in sorted(wanted - self.owned):
+                consumer = ShardConsumer(self._queues[shard], self.callback)
+                await consumer.start()
+                self._consumers[shard] = consumer
+
+    async def _release(self, shard: int) -> None:
+        await self._consumers.pop(shard).release()
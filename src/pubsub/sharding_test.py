@@ -0,0 +1,140 @@
+import asyncio
+import os
+import random
+from collections import Counter
+from unittest.mock import AsyncMock, Mock
+import pytest
+from aio_pika import Message
+from .inprocess import InProcessBroker
+from .sharding import (
+    ShardBalancer,
+    ShardConsumer,
+    assign_shards,
+    jump_hash,
+    shard_for,
+    shard_queue_name,
+)
+
+
+def test_jump_hash_only_moves_keys_to_the_new_bucket():
+    keys = [int.from_bytes(os.urandom(8), "big") for _ in range(2_000)]
+
+    before = {key: jump_hash(key, 8) for key in keys}
+    after = {key: jump_hash(key, 9) for key in keys}
+
+    moved = [key for key in keys if before[key] != after[key]]
+    assert all(after[key] == 8 for key in moved)
+    # About 1/9 of the keys move
+    assert 0.05 < len(moved) / len(keys) < 0.2
+    assert set(before.values()) == set(range(8))
+
+
+def test_shard_for_is_stable_and_case_insensitive():
+    address = "0x742d35Cc6634C0532925a3b844Bc454e4438f44e"
+    counts = Counter(shard_for("0x" + os.urandom(20).hex(), 4) for _ in range(4_000))
+
+    assert shard_for(address, 16) == shard_for(address.lower(), 16)
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 800
+
+
+def test_assign_shards_partitions_and_moves_only_departed_shards():
+    members = ["w1", "w2", "w3"]
+    owned = {m: assign_shards(m, members, 32) for m in members}
+
+    assert set().union(*owned.values()) == set(range(32))
+    assert sum(len(shards) for shards in owned.values()) == 32
+
+    # When w3 leaves, w1 and w2 keep their shards and split the ones of w3
+    for member in ("w1", "w2"):
+        assert owned[member] <= assign_shards(member, ["w1", "w2"], 32)
+
+
+def test_balancer_expires_silent_members():
+    balancer = ShardBalancer(
+        channel=None,  # type: ignore[arg-type]
+        callback=None,  # type: ignore[arg-type]
+        shard_count=4,
+        heartbeat_interval_s=1,
+        member_ttl_s=3,
+        member_id="me",
+    )
+    balancer.on_heartbeat("other", leave=False, now=0.0)
+
+    assert balancer.members(now=2.0) == ["me", "other"]
+    assert balancer.members(now=5.0) == ["me"]
+
+    balancer.on_heartbeat("other", leave=False, now=5.0)
+    balancer.on_heartbeat("other", leave=True, now=6.0)
+    assert balancer.members(now=6.0) == ["me"]
+
+
+@pytest.mark.asyncio
+async def test_shard_consumer_processes_in_delivery_order():
+    broker = InProcessBroker(queue_size=100)
+    channel = broker.channel()
+    # A prefetch above 1 delivers several messages at once
+    await channel.set_qos(prefetch_count=10)
+    queue = await channel.declare_queue(name=shard_queue_name(0))
+    running = 0
+    overlapped = False
+    processed: list[int] = []
+
+    async def callback(message) -> None:
+        nonlocal running, overlapped
+        running += 1
+        overlapped |= running > 1
+        await asyncio.sleep(random.uniform(0, 0.005))
+        processed.append(int(message.body))
+        running -= 1
+        await message.ack()
+
+    consumer = ShardConsumer(queue, callback)
+    await consumer.start()
+    for i in range(30):
+        await channel.default_exchange.publish(
+            Message(body=str(i).encode()), routing_key=queue.name
+        )
+    async with asyncio.timeout(2):
+        while len(processed) < 30:
+            await asyncio.sleep(0.01)
+
+    assert processed == list(range(30))
+    assert not overlapped
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_shard_consumer_release_cancels_before_acking_the_last_message():
+    events: list[str] = []
+    started = asyncio.Event()
+    finish = asyncio.Event()
+    queue = Mock()
+    queue.consume = AsyncMock(return_value="tag")
+    queue.cancel = AsyncMock(side_effect=lambda tag: events.append("cancel"))
+    message = Mock()
+    message.ack = AsyncMock(side_effect=lambda: events.append("ack"))
+
+    async def callback(message) -> None:
+        started.set()
+        await finish.wait()
+        await message.ack()
+
+    consumer = ShardConsumer(queue, callback)
+    await consumer.start()
+    delivery = asyncio.create_task(consumer.on_message(message))
+    await started.wait()
+    release = asyncio.create_task(consumer.release())
+    await asyncio.sleep(0)
+    # The message in progress is finished first
+    assert events == []
+
+    finish.set()
+    await asyncio.gather(delivery, release)
+    assert events == ["cancel", "ack"]
+
+    # A late delivery goes back to the queue
+    late = Mock()
+    late.nack = AsyncMock()
+    await consumer.on_message(late)
+    late.nack.assert_called_once_with(requeue=True)
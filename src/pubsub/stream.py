@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from typing import Any
+from aio_pika.abc import AbstractIncomingMessage, AbstractQueue
+from src.config.config import get_settings
+from src.telemetry.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TYPES = ("classic", "stream")
+# Consume argument with the first offset to read, and header with the offset of
+# every delivered message
+STREAM_OFFSET = "x-stream-offset"
+
+STREAM_COMMITTED_OFFSET = REGISTRY.register(
+    Gauge(
+        "worker_stream_committed_offset",
+        "Last stream offset processed together with every offset before it",
+        ["consumer"],
+    )
+)
+STREAM_FAILED_TOTAL = REGISTRY.register(
+    Counter(
+        "worker_stream_failed_total",
+        "Stream messages rejected for good, they are only processed again by a replay",
+        ["consumer"],
+    )
+)
+STREAM_RETRIES_TOTAL = REGISTRY.register(
+    Counter(
+        "worker_stream_retries_total",
+        "Stream messages processed again after a failure, holding the commit point",
+        ["consumer"],
+    )
+)
+
+Callback = Callable[[Any], Awaitable[None]]
+Retry = Callable[["StreamMessage"], None]
+LoadOffset = Callable[[str], Awaitable[int | None]]
+SaveOffset = Callable[[str, int], Awaitable[None]]
+
+
+def stream_mode() -> bool:
+    settings = get_settings()
+    if settings.transaction_queue_type not in QUEUE_TYPES:
+        raise ValueError(
+            f"Unknown queue type {settings.transaction_queue_type!r}, use {QUEUE_TYPES}"
+        )
+    if settings.transaction_queue_type != "stream":
+        return False
+    if settings.shard_count > 0:
+        raise ValueError("Stream queues are not sharded, set SHARD_COUNT=0")
+    if settings.pipeline_mode == "embedded":
+        raise ValueError("Stream queues need RabbitMQ, not the embedded broker")
+    return True
+
+
+def stream_queue_arguments() -> dict:
+    settings = get_settings()
+    return {
+        "x-queue-type": "stream",
+        "x-max-age": settings.stream_max_age,
+        "x-max-length-bytes": settings.stream_max_length_bytes,
+    }
+
+
+class OffsetTracker:
+    """Commit point of a stream consumer whose messages finish out of order.
+
+    The committed offset is the last one finished together with every offset
+    delivered before it, so a restart from the next one loses nothing. Acks only
+    return credit on a stream, they are sent for the committed offset every
+    `ack_batch` messages with `multiple`.
+    """
+
+    def __init__(self, ack_batch: int = 100):
+        self.ack_batch = max(ack_batch, 1)
+        self.committed: int | None = None
+        # [offset, message, finished] in delivery order
+        self._pending: deque[list] = deque()
+        self._entries: dict[int, list] = {}
+        self._ack_message: AbstractIncomingMessage | None = None
+        self._unacked = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def delivered(self, offset: int, message: AbstractIncomingMessage) -> None:
+        entry = [offset, message, False]
+        self._pending.append(entry)
+        self._entries[offset] = entry
+
+    async def done(self, offset: int) -> None:
+        entry = self._entries.pop(offset, None)
+        if entry is None:
+            return
+        entry[2] = True
+        pending = self._pending
+        while pending and pending[0][2]:
+            self.committed, self._ack_message, _ = pending.popleft()
+            self._unacked += 1
+        if self._unacked >= self.ack_batch:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self._ack_message is not None and self._unacked:
+            message, self._ack_message, self._unacked = self._ack_message, None, 0
+            await message.ack(multiple=True)
+
+
+class StreamMessage:
+    """A delivered stream message, settled through its OffsetTracker.
+
+    A stream keeps every message, so a requeue is a retry in place: the offset
+    stays pending, which holds the commit point, and `retry` processes the
+    message again. Without requeue the message is given up and skipped.
+    """
+
+    def __init__(
+        self,
+        message: AbstractIncomingMessage,
+        tracker: OffsetTracker,
+        offset: int,
+        consumer: str,
+        retry: Retry | None = None,
+    ):
+        self._message = message
+        self._tracker = tracker
+        self._retry = retry
+        self.offset = offset
+        self.consumer = consumer
+        self.attempt = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._message, name)
+
+    async def ack(self, multiple: bool = False) -> None:
+        await self._tracker.done(self.offset)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        if requeue and self._retry is not None:
+            self._retry(self)
+            return
+        STREAM_FAILED_TOTAL.inc(self.consumer)
+        await self._tracker.done(self.offset)
+
+    async def reject(self, requeue: bool = False) -> None:
+        await self.nack(requeue=requeue)
+
+
+class StreamConsumer:
+    """Consumes a stream queue from the offset after the last committed one.
+
+    The committed offset is saved with `save_offset` every `commit_interval_s`
+    and on `close`. With `partitions` > 1 the consumer reads the whole stream
+    but only hands the offsets of its `partition` to `callback`, so several
+    workers can split a stream between them. A message nacked with requeue, or
+    whose callback raises, is handed again after `retry_delay_s`, doubled up to
+    `retry_max_delay_s` on every attempt, and the commit point waits for it.
+    """
+
+    def __init__(
+        self,
+        queue: AbstractQueue,
+        callback: Callback,
+        name: str,
+        start: str | int | datetime = "first",
+        load_offset: LoadOffset | None = None,
+        save_offset: SaveOffset | None = None,
+        ack_batch: int = 100,
+        commit_interval_s: float = 1.0,
+        partitions: int = 1,
+        partition: int = 0,
+        retry_delay_s: float = 1.0,
+        retry_max_delay_s: float = 60.0,
+    ):
+        if not 0 <= partition < partitions:
+            raise ValueError(f"Partition {partition} out of range for {partitions}")
+        self.queue = queue
+        self.callback = callback
+        self.name = name
+        self.start_offset = start
+        self.load_offset = load_offset
+        self.save_offset = save_offset
+        self.commit_interval_s = commit_interval_s
+        self.partitions = partitions
+        self.partition = partition
+        self.retry_delay_s = retry_delay_s
+        self.retry_max_delay_s = retry_max_delay_s
+        self.tracker = OffsetTracker(ack_batch)
+        self.last_delivery = time.monotonic()
+        self._first: int | None = None
+        self._saved: int | None = None
+        self._consumer_tag: str | None = None
+        self._task: asyncio.Task | None = None
+        self._retries: set[asyncio.Task] = set()
+        self._closing = False
+
+    @property
+    def retrying(self) -> int:
+        """Messages waiting to be retried."""
+        return len(self._retries)
+
+    async def start(self) -> None:
+        start = self.start_offset
+        committed = await self.load_offset(self.name) if self.load_offset else None
+        if committed is not None:
+            start = committed + 1
+            self._saved = committed
+        # The broker may start at the beginning of the chunk holding the offset
+        self._first = start if isinstance(start, int) else None
+        logger.info(
+            "Consuming stream %s as %s from %s", self.queue.name, self.name, start
+        )
+        self._consumer_tag = await self.queue.consume(
+            self.on_message, arguments={STREAM_OFFSET: start}
+        )
+        self._task = asyncio.create_task(self._commit_loop())
+
+    async def on_message(self, message: AbstractIncomingMessage) -> None:
+        self.last_delivery = time.monotonic()
+        offset = (message.headers or {}).get(STREAM_OFFSET)
+        if not isinstance(offset, int):
+            logger.warning("Stream message without offset, skipping it")
+            await message.ack()
+            return
+
+        tracker = self.tracker
+        tracker.delivered(offset, message)
+        if (self._first is not None and offset < self._first) or (
+            offset % self.partitions != self.partition
+        ):
+            await tracker.done(offset)
+            return
+        await self.handle(
+            StreamMessage(message, tracker, offset, self.name, self.retry)
+        )
+
+    async def handle(self, message: StreamMessage) -> None:
+        try:
+            await self.callback(message)
+        except Exception:
+            logger.exception(
+                "Unhandled error processing stream offset %d", message.offset
+            )
+            self.retry(message)
+
+    def retry(self, message: StreamMessage) -> None:
+        """Hands `message` to the callback again later, its offset stays pending."""
+        if self._closing:
+            # Not committed, the next start reads it again
+            return
+        delay = min(self.retry_delay_s * 2**message.attempt, self.retry_max_delay_s)
+        logger.warning(
+            "Retrying stream offset %d of %s in %.1f s",
+            message.offset,
+            self.name,
+            delay,
+        )
+        task = asyncio.create_task(self._retry_later(message, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry_later(self, message: StreamMessage, delay: float) -> None:
+        await asyncio.sleep(delay)
+        STREAM_RETRIES_TOTAL.inc(self.name)
+        message.attempt += 1
+        await self.handle(message)
+
+    async def _commit_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.commit_interval_s)
+            try:
+                await self.commit()
+            except Exception:
+                logger.exception("Could not commit offset of %s", self.name)
+
+    async def commit(self) -> None:
+        tracker = self.tracker
+        await tracker.flush()
+        if tracker.committed is None or tracker.committed == self._saved:
+            return
+        if self.save_offset is not None:
+            await self.save_offset(self.name, tracker.committed)
+        self._saved = tracker.committed
+        STREAM_COMMITTED_OFFSET.set(tracker.committed, self.name)
+
+    async def cancel(self) -> None:
+        """Stops new deliveries, the ones in progress still finish."""
+        if self._consumer_tag is not None:
+            await self.queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+
+    async def close(self) -> None:
+        self._closing = True
+        await self.cancel()
+        if self._task is not None:
+            self._task.cancel()
+        for task in list(self._retries):
+            task.cancel()
+        await asyncio.gather(*self._retries, return_exceptions=True)
+        await self.commit()
@@ -0,0 +1,206 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from pytest_mock import MockerFixture
+from src.config.config import settings
+from src.telemetry.tracing import ENQUEUED_AT_HEADER, TRACEPARENT_HEADER
+from .pubsub import RETRY_COUNT_HEADER, publish_retry
+from .stream import (
+    STREAM_OFFSET,
+    STREAM_RETRIES_TOTAL,
+    OffsetTracker,
+    StreamConsumer,
+    stream_mode,
+)
+
+
+async def ack(message) -> None:
+    await message.ack()
+
+
+async def reject(message) -> None:
+    await message.reject()
+
+
+def stream_message(mocker: MockerFixture, offset: int):
+    message = mocker.Mock()
+    message.headers = {STREAM_OFFSET: offset}
+    message.ack = AsyncMock()
+    return message
+
+
+@pytest.mark.asyncio
+async def test_tracker_commits_contiguous_offsets_and_batches_acks(
+    mocker: MockerFixture,
+):
+    tracker = OffsetTracker(ack_batch=3)
+    messages = [stream_message(mocker, offset) for offset in range(10, 14)]
+    for offset, message in enumerate(messages, start=10):
+        tracker.delivered(offset, message)
+
+    await tracker.done(11)
+    await tracker.done(13)
+    assert tracker.committed is None
+
+    await tracker.done(10)
+    assert tracker.committed == 11
+    # Two finished messages, below the batch
+    messages[1].ack.assert_not_called()
+    await tracker.flush()
+    messages[1].ack.assert_called_once_with(multiple=True)
+
+    await tracker.done(12)
+    assert tracker.committed == 13
+    messages[3].ack.assert_not_called()
+    last = stream_message(mocker, 14)
+    tracker.delivered(14, last)
+    tracker.delivered(15, stream_message(mocker, 15))
+    await tracker.done(14)
+    # 12, 13 and 14 make a batch, acked at once with the last of them
+    assert tracker.committed == 14
+    last.ack.assert_called_once_with(multiple=True)
+    messages[2].ack.assert_not_called()
+    assert tracker.pending == 1
+
+
+@pytest.mark.asyncio
+async def test_consumer_resumes_after_committed_offset(mocker: MockerFixture):
+    queue = mocker.Mock()
+    queue.consume = AsyncMock(return_value="tag")
+    queue.cancel = AsyncMock()
+    callback = AsyncMock(side_effect=ack)
+    saved = AsyncMock()
+    consumer = StreamConsumer(
+        queue,
+        callback,
+        "transaction:0/2",
+        load_offset=AsyncMock(return_value=99),
+        save_offset=saved,
+        ack_batch=100,
+        partitions=2,
+        partition=0,
+    )
+
+    await consumer.start()
+    assert queue.consume.call_args.kwargs["arguments"] == {STREAM_OFFSET: 100}
+
+    # The broker starts at the chunk boundary, offsets before 100 are skipped
+    for offset in range(98, 104):
+        await consumer.on_message(stream_message(mocker, offset))
+    handed = [call.args[0].offset for call in callback.call_args_list]
+    assert handed == [100, 102]
+
+    await consumer.close()
+    queue.cancel.assert_called_once_with("tag")
+    saved.assert_called_once_with("transaction:0/2", 103)
+
+
+@pytest.mark.asyncio
+async def test_rejected_message_still_advances_offset(mocker: MockerFixture):
+    queue = mocker.Mock()
+    queue.consume = AsyncMock(return_value="tag")
+    queue.cancel = AsyncMock()
+    consumer = StreamConsumer(queue, AsyncMock(side_effect=reject), "transaction")
+    await consumer.start()
+    await consumer.on_message(stream_message(mocker, 0))
+    await consumer.close()
+
+    assert consumer.tracker.committed == 0
+
+
+@pytest.mark.asyncio
+async def test_nacked_message_holds_the_commit_point_until_retried(
+    mocker: MockerFixture,
+):
+    queue = mocker.Mock()
+    queue.consume = AsyncMock(return_value="tag")
+    queue.cancel = AsyncMock()
+    attempts = []
+
+    async def save_once_the_database_is_back(message) -> None:
+        attempts.append(message.offset)
+        if message.offset == 0 and attempts.count(0) < 3:
+            await message.nack()
+        else:
+            await message.ack()
+
+    saved = AsyncMock()
+    consumer = StreamConsumer(
+        queue,
+        save_once_the_database_is_back,
+        "transaction",
+        save_offset=saved,
+        retry_delay_s=0.01,
+    )
+    before = STREAM_RETRIES_TOTAL.value("transaction")
+    await consumer.start()
+    await consumer.on_message(stream_message(mocker, 0))
+    await consumer.on_message(stream_message(mocker, 1))
+    # Offset 1 is done but the commit point waits for 0
+    await consumer.commit()
+    assert consumer.tracker.committed is None
+    assert consumer.retrying == 1
+
+    while consumer.retrying:
+        await asyncio.sleep(0.01)
+    await consumer.close()
+    assert attempts == [0, 1, 0, 0]
+    assert STREAM_RETRIES_TOTAL.value("transaction") == before + 2
+    saved.assert_called_once_with("transaction", 1)
+
+
+@pytest.mark.asyncio
+async def test_close_does_not_commit_past_a_message_waiting_for_retry(
+    mocker: MockerFixture,
+):
+    queue = mocker.Mock()
+    queue.consume = AsyncMock(return_value="tag")
+    queue.cancel = AsyncMock()
+    callback = AsyncMock(side_effect=[RuntimeError("database down"), None])
+    saved = AsyncMock()
+    consumer = StreamConsumer(
+        queue, callback, "transaction", save_offset=saved, retry_delay_s=60
+    )
+    await consumer.start()
+    await consumer.on_message(stream_message(mocker, 0))
+    await consumer.close()
+
+    assert consumer.retrying == 0
+    assert callback.call_count == 1
+    saved.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_retry_copy_drops_the_broker_headers(mocker: MockerFixture):
+    exchange = mocker.Mock()
+    exchange.publish = AsyncMock()
+    message = mocker.Mock()
+    message.body = b"{}"
+    message.content_type = "application/json"
+    message.routing_key = "transaction"
+    message.headers = {
+        STREAM_OFFSET: 41,
+        "x-death": [{"count": 1}],
+        TRACEPARENT_HEADER: "00-trace-span-01",
+        ENQUEUED_AT_HEADER: 123,
+        RETRY_COUNT_HEADER: 1,
+    }
+
+    assert await publish_retry(exchange, message, 2) == ("", True)
+
+    retry = exchange.publish.call_args.args[0]
+    assert retry.headers == {
+        TRACEPARENT_HEADER: "00-trace-span-01",
+        ENQUEUED_AT_HEADER: 123,
+        RETRY_COUNT_HEADER: 2,
+    }
+
+
+def test_stream_mode_rejects_sharding(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "transaction_queue_type", "stream")
+    monkeypatch.setattr(settings, "shard_count", 4)
+    with pytest.raises(ValueError):
+        stream_mode()
+
+    monkeypatch.setattr(settings, "shard_count", 0)
+    assert stream_mode()
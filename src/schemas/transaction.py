@@ -27,3 +27,8 @@ class ClassificationResult(BaseModel):
     risk_score: float = Field(..., ge=0, le=1)
     inference_time_ms: int = Field(..., ge=0)
     priority: Priority
+    model_version: str | None = None
+
+
+class ClassifiedTransaction(ClassificationResult):
+    tx_hash: str
@@ -0,0 +1,21 @@
+from .metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("messages_total", "Messages", ["outcome"]))
+    histogram = registry.register(Histogram("wait_seconds", "Wait", buckets=[0.1, 1]))
+
+    counter.inc("ack")
+    counter.inc("ack", amount=2)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+    assert 'messages_total{outcome="ack"} 3.0' in text
+    assert 'wait_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'wait_seconds_bucket{le="1"} 2.0' in text
+    assert 'wait_seconds_bucket{le="+Inf"} 3.0' in text
+    assert "wait_seconds_count 3.0" in text
+    assert histogram.count() == 3
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def collapse_stack(thread_name: str, frame: FrameType | None) -> str:
+    """Returns the stack as `thread;outermost;...;innermost`."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+@dataclass
+class Distribution:
+    samples: int
+    mean: float
+    max: float
+
+    @classmethod
+    def of(cls, values: list[float]) -> "Distribution":
+        if not values:
+            return cls(samples=0, mean=0.0, max=0.0)
+        return cls(samples=len(values), mean=statistics.fmean(values), max=max(values))
+
+
+@dataclass
+class ProfileReport:
+    duration_s: float
+    samples: int
+    event_loop_lag_ms: Distribution
+    executor_queue_depth: Distribution
+    collapsed_file: str
+    speedscope_file: str
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread from a background thread.
+
+    Nothing is installed in the profiled code, so there is no overhead at all while
+    the profiler is not running. While running, the sampler thread takes the GIL
+    once per `interval_s`.
+    """
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+
+    def sample(self) -> None:
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            self.stacks[
+                collapse_stack(names.get(thread_id, str(thread_id)), frame)
+            ] += 1
+        self.samples += 1
+
+    def run(self, duration_s: float, stop: threading.Event | None = None) -> None:
+        stop = stop or threading.Event()
+        deadline = time.monotonic() + duration_s
+        while time.monotonic() < deadline and not stop.is_set():
+            self.sample()
+            stop.wait(self.interval_s)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stacks, the input of flamegraph.pl/speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+    def speedscope(self, name: str) -> dict:
+        frames: list[dict] = []
+        frame_index: dict[str, int] = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.items():
+            indexes = []
+            for label in stack.split(";"):
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                indexes.append(frame_index[label])
+            samples.append(indexes)
+            weights.append(count)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "none",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+# Executors with a `queued` count of calls waiting for a slot, e.g. the worker
+# InferenceExecutor, sampled instead of the loop default executor
+_executors: set = set()
+
+
+def register_executor(executor) -> None:
+    _executors.add(executor)
+
+
+def unregister_executor(executor) -> None:
+    _executors.discard(executor)
+
+
+def executor_queue_depth(loop: asyncio.AbstractEventLoop) -> int:
+    """Calls waiting for a slot in the registered executors, else tasks waiting for
+    a thread in the loop default executor."""
+    if _executors:
+        return sum(executor.queued for executor in _executors)
+    # There is no public API for it, 0 if the executor has not been created yet
+    executor = getattr(loop, "_default_executor", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else 0
+
+
+_lock = asyncio.Lock()
+
+
+async def profile(
+    name: str, duration_s: float, output_dir: str | Path, interval_s: float = 0.005
+) -> ProfileReport:
+    """Profiles the process for `duration_s` and writes the collapsed stacks and a
+    speedscope file to `output_dir`, one profile at a time per process.
+
+    Meanwhile the event loop lag (how late a sleep wakes up) and the executor queue
+    depth (of the registered executors, else the loop default executor) are
+    measured from the loop.
+    """
+    if _lock.locked():
+        raise ProfilerBusyError("A profile is already running")
+
+    async with _lock:
+        loop = asyncio.get_running_loop()
+        profiler = SamplingProfiler(interval_s)
+        stop = threading.Event()
+        done = loop.create_future()
+
+        def run() -> None:
+            try:
+                profiler.run(duration_s, stop)
+            finally:
+                loop.call_soon_threadsafe(done.set_result, None)
+
+        # A dedicated thread, the default executor may be the bottleneck itself
+        thread = threading.Thread(target=run, name="profiler", daemon=True)
+        started = time.perf_counter()
+        thread.start()
+
+        lags_ms: list[float] = []
+        depths: list[float] = []
+        try:
+            while not done.done():
+                before = time.perf_counter()
+                await asyncio.sleep(interval_s)
+                lags_ms.append(
+                    max(time.perf_counter() - before - interval_s, 0.0) * 1_000
+                )
+                depths.append(executor_queue_depth(loop))
+        finally:
+            stop.set()
+            await done
+        elapsed = time.perf_counter() - started
+
+        output = Path(output_dir)
+        output.mkdir(parents=True, exist_ok=True)
+        stem = f"{name}-{time.strftime('%Y%m%dT%H%M%S')}"
+        collapsed_file = output / f"{stem}.collapsed"
+        speedscope_file = output / f"{stem}.speedscope.json"
+        collapsed_file.write_text(profiler.collapsed())
+        speedscope_file.write_text(json.dumps(profiler.speedscope(name)))
+
+        report = ProfileReport(
+            duration_s=round(elapsed, 3),
+            samples=profiler.samples,
+            event_loop_lag_ms=Distribution.of(lags_ms),
+            executor_queue_depth=Distribution.of(depths),
+            collapsed_file=str(collapsed_file),
+            speedscope_file=str(speedscope_file),
+        )
+        logger.info("Profile written: %s", json.dumps(asdict(report)))
+        return report
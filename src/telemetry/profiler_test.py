@@ -0,0 +1,84 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+import time
+import pytest
+from src.worker.inference import InferenceExecutor
+from . import profiler as profiler_module
+from .profiler import (
+    ProfilerBusyError,
+    SamplingProfiler,
+    profile,
+    register_executor,
+    unregister_executor,
+)
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1_000))
+
+
+def test_sampler_collects_other_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+    thread.start()
+    try:
+        profiler = SamplingProfiler(interval_s=0.001)
+        profiler.run(0.05)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profiler.samples > 0
+    assert any(
+        stack.startswith("busy;") and "busy_loop" in stack for stack in profiler.stacks
+    )
+    # The sampling thread itself is left out
+    assert f"sample ({profiler_module.__file__}" not in profiler.collapsed()
+
+    document = profiler.speedscope("test")
+    frames = document["shared"]["frames"]
+    (sampled,) = document["profiles"]
+    assert sum(sampled["weights"]) == sum(profiler.stacks.values())
+    assert all(i < len(frames) for stack in sampled["samples"] for i in stack)
+
+
+@pytest.mark.asyncio
+async def test_profile_writes_outputs_and_loop_lag(tmp_path: Path):
+    report = await profile("test", 0.1, tmp_path, interval_s=0.002)
+
+    assert report.samples > 0
+    assert report.event_loop_lag_ms.samples > 0
+    assert Path(report.collapsed_file).read_text()
+    speedscope = json.loads(Path(report.speedscope_file).read_text())
+    assert speedscope["profiles"][0]["type"] == "sampled"
+
+
+@pytest.mark.asyncio
+async def test_profile_samples_the_registered_executor_queue(tmp_path: Path):
+    executor = InferenceExecutor("thread", 1)
+    register_executor(executor)
+    try:
+        calls = [
+            asyncio.ensure_future(executor.run(5.0, time.sleep, 0.1)) for _ in range(5)
+        ]
+        report = await profile("test", 0.15, tmp_path, interval_s=0.005)
+        await asyncio.gather(*calls)
+    finally:
+        unregister_executor(executor)
+        executor.shutdown()
+
+    assert report.executor_queue_depth.samples > 0
+    assert report.executor_queue_depth.max >= 3
+    assert report.executor_queue_depth.mean > 0
+
+
+@pytest.mark.asyncio
+async def test_profile_runs_one_at_a_time(tmp_path: Path):
+    first = asyncio.create_task(profile("test", 0.1, tmp_path))
+    await asyncio.sleep(0.01)
+    with pytest.raises(ProfilerBusyError):
+        await profile("test", 0.1, tmp_path)
+    await first
@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Protocol
+from src.config.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# AMQP headers used to propagate the trace context and the enqueue time
+TRACEPARENT_HEADER = "traceparent"
+ENQUEUED_AT_HEADER = "x-enqueued-at-ns"
+
+
+@dataclass(frozen=True, slots=True)
+class TraceContext:
+    trace_id: str
+    span_id: str
+
+    def to_traceparent(self) -> str:
+        # W3C trace context, only sampled traces are propagated
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_traceparent(cls, value: Any) -> "TraceContext | None":
+        if isinstance(value, bytes):
+            value = value.decode()
+        if not isinstance(value, str):
+            return None
+        parts = value.split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        return cls(trace_id=parts[1], span_id=parts[2])
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def context(self) -> TraceContext:
+        return TraceContext(trace_id=self.trace_id, span_id=self.span_id)
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+
+class FileSpanExporter:
+    """Appends spans as JSON lines to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(
+                    json.dumps(
+                        {
+                            "name": span.name,
+                            "trace_id": span.trace_id,
+                            "span_id": span.span_id,
+                            "parent_id": span.parent_id,
+                            "start_ns": span.start_ns,
+                            "end_ns": span.end_ns,
+                            "duration_ms": (span.end_ns - span.start_ns) / 1_000_000,
+                            "attributes": span.attributes,
+                        }
+                    )
+                    + "\n"
+                )
+
+
+class OtlpHttpSpanExporter:
+    """Posts spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout_s: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout_s = timeout_s
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def export(self, spans: list[Span]) -> None:
+        # Only loaded when exporting over OTLP, urllib is costly to import
+        import urllib.request
+
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            self._attribute("service.name", self.service_name)
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "src.telemetry.tracing"},
+                            "spans": [
+                                {
+                                    "traceId": span.trace_id,
+                                    "spanId": span.span_id,
+                                    "parentSpanId": span.parent_id or "",
+                                    "name": span.name,
+                                    "kind": 1,
+                                    "startTimeUnixNano": str(span.start_ns),
+                                    "endTimeUnixNano": str(span.end_ns),
+                                    "attributes": [
+                                        self._attribute(k, v)
+                                        for k, v in span.attributes.items()
+                                    ],
+                                }
+                                for span in spans
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout_s):
+            pass
+
+
+class Tracer:
+    """Head-sampled tracer, finished spans are exported in batches by a thread.
+
+    Unsampled messages carry no trace context and every span call on them is a
+    no-op, so the cost with a low sample rate is a random() call per request.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        exporter: SpanExporter | None = None,
+        flush_interval_s: float = 1.0,
+        max_queue_size: int = 10_000,
+    ):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.flush_interval_s = flush_interval_s
+        # Bounded, the oldest spans are dropped if the exporter can not keep up
+        self._queue: deque[Span] = deque(maxlen=max_queue_size)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and self.exporter is not None
+
+    def start(self) -> None:
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="span-exporter", daemon=True
+            )
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def start_span(
+        self, name: str, parent: TraceContext | None = None, **attributes: Any
+    ) -> Span:
+        return Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        self._queue.append(span)
+
+    def record_span(
+        self,
+        name: str,
+        parent: TraceContext | None,
+        start_ns: int,
+        end_ns: int,
+        **attributes: Any,
+    ) -> None:
+        """Records a span measured elsewhere, a no-op for unsampled traces."""
+        if parent is None:
+            return
+        span = self.start_span(name, parent, **attributes)
+        span.start_ns = start_ns
+        span.end_ns = end_ns
+        self._queue.append(span)
+
+    @contextmanager
+    def span(
+        self, name: str, parent: TraceContext | None, **attributes: Any
+    ) -> Iterator[Span | None]:
+        """Times the block as a child of `parent`, a no-op for unsampled traces."""
+        if parent is None:
+            yield None
+            return
+        span = self.start_span(name, parent, **attributes)
+        try:
+            yield span
+        finally:
+            self.end_span(span)
+
+    def flush(self) -> None:
+        if self.exporter is None or not self._queue:
+            return
+        spans = []
+        while self._queue:
+            spans.append(self._queue.popleft())
+        try:
+            self.exporter.export(spans)
+        except Exception:
+            logger.exception("Could not export %d spans", len(spans))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+
+
+tracer = Tracer()
+
+
+def configure_tracing(service_name: str) -> Tracer:
+    """Configures the module tracer from the settings and starts exporting."""
+    settings = get_settings()
+    exporter: SpanExporter | None = None
+    if settings.trace_sample_rate > 0:
+        if settings.trace_exporter == "otlp":
+            exporter = OtlpHttpSpanExporter(
+                settings.trace_otlp_endpoint, service_name=service_name
+            )
+        else:
+            exporter = FileSpanExporter(settings.trace_file)
+
+    tracer.sample_rate = settings.trace_sample_rate
+    tracer.exporter = exporter
+    tracer.start()
+    return tracer
@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+from .tracing import FileSpanExporter, TraceContext, Tracer
+
+
+def test_traceparent_round_trip():
+    context = TraceContext(trace_id="a" * 32, span_id="b" * 16)
+
+    assert TraceContext.from_traceparent(context.to_traceparent()) == context
+    assert TraceContext.from_traceparent(b"00-" + b"a" * 32 + b"-" + b"b" * 16 + b"-01")
+    assert TraceContext.from_traceparent("garbage") is None
+    assert TraceContext.from_traceparent(None) is None
+
+
+def test_sampled_spans_are_exported_with_parent(tmp_path: Path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=1.0, exporter=FileSpanExporter(str(path)))
+
+    assert tracer.sample()
+    root = tracer.start_span("root")
+    with tracer.span("child", root.context, step="decode"):
+        pass
+    tracer.record_span("queue.wait", root.context, start_ns=1, end_ns=2)
+    tracer.end_span(root)
+    tracer.flush()
+
+    spans = {s["name"]: s for s in map(json.loads, path.read_text().splitlines())}
+    assert spans["child"]["parent_id"] == root.span_id
+    assert spans["child"]["attributes"] == {"step": "decode"}
+    assert spans["queue.wait"]["trace_id"] == root.trace_id
+    assert spans["root"]["parent_id"] is None
+
+
+def test_unsampled_trace_records_nothing(tmp_path: Path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(sample_rate=0.0, exporter=FileSpanExporter(str(path)))
+
+    assert not tracer.sample()
+    with tracer.span("child", None) as span:
+        assert span is None
+    tracer.record_span("queue.wait", None, start_ns=1, end_ns=2)
+    tracer.flush()
+
+    assert not path.exists()
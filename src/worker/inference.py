@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, TypeVar
+from src.telemetry.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+EXECUTOR_KINDS = ("thread", "process")
+
+INFERENCE_ABANDONED = REGISTRY.register(
+    Gauge(
+        "worker_inference_abandoned",
+        "Inference threads still running after their deadline",
+    )
+)
+INFERENCE_POOL_RESTARTS_TOTAL = REGISTRY.register(
+    Counter(
+        "worker_inference_pool_restarts_total",
+        "Executor pools replaced because of calls stuck past their deadline",
+    )
+)
+
+
+class InferenceTimeoutError(Exception):
+    pass
+
+
+class InferenceExecutor:
+    """Runs the inference calls off the event loop, each one with a deadline.
+
+    The deadline covers the wait for a free slot plus the call itself. A call
+    still queued when it expires is cancelled. A running one can not be
+    interrupted in a thread: it is abandoned, and once every thread of the pool is
+    held by an abandoned call the pool is replaced, so new messages get fresh
+    threads. Child processes can be killed: the pool is replaced and the stuck
+    children terminated, the other calls running on it are retried on the new pool
+    within their own deadline.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 0,
+        initializer: Callable[..., None] | None = None,
+        initargs: tuple = (),
+    ):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind {kind!r}, use {EXECUTOR_KINDS}")
+        self.kind = kind
+        if max_workers <= 0:
+            cpus = os.cpu_count() or 1
+            max_workers = cpus if kind == "process" else min(32, cpus + 4)
+        self.max_workers = max_workers
+        self._initializer = initializer
+        self._initargs = initargs
+        self._abandoned = 0
+        # Abandoned calls of every pool still running, set from the pool threads
+        self._running_abandoned = 0
+        # Calls submitted to the current pool and not finished, running or queued
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = self._create()
+
+    def _create(self) -> Executor:
+        if self.kind == "process":
+            # Spawned, a forked child would inherit the event loop and its threads
+            return ProcessPoolExecutor(
+                self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer,
+                initargs=self._initargs,
+            )
+        return ThreadPoolExecutor(
+            self.max_workers,
+            thread_name_prefix="inference",
+            initializer=self._initializer,
+            initargs=self._initargs,
+        )
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a free slot, abandoned calls still hold theirs."""
+        return max(self._pending - self.max_workers, 0)
+
+    def _replace(self) -> None:
+        old = self._executor
+        with self._lock:
+            self._executor = self._create()
+            self._pending = 0
+        self._abandoned = 0
+        INFERENCE_POOL_RESTARTS_TOTAL.inc()
+        # There is no public API to stop a busy worker process
+        processes = list((getattr(old, "_processes", None) or {}).values())
+        # Calls still queued on the old pool are cancelled and retried by `run`
+        old.shutdown(wait=False, cancel_futures=True)
+        if self.kind == "process":
+            for process in processes:
+                process.kill()
+            logger.warning(
+                "Inference pool replaced, killed %d worker processes", len(processes)
+            )
+        else:
+            logger.warning("Inference pool replaced, every thread was stuck")
+
+    def _abandon(self, executor: Executor, future: Future) -> None:
+        if future.cancel() or future.done():
+            # Still queued (or just finished), no slot is held
+            return
+        if executor is not self._executor:
+            return
+        if self.kind == "process":
+            self._replace()
+            return
+
+        self._abandoned += 1
+        self._count_abandoned(1)
+        future.add_done_callback(lambda _: self._count_abandoned(-1))
+        if self._abandoned >= self.max_workers:
+            self._replace()
+
+    def _track(self, executor: Executor, future: Future) -> None:
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(lambda _: self._untrack(executor))
+
+    def _untrack(self, executor: Executor) -> None:
+        # Called from the pool threads, calls of a replaced pool were reset
+        with self._lock:
+            if executor is self._executor:
+                self._pending -= 1
+
+    def _count_abandoned(self, delta: int) -> None:
+        with self._lock:
+            self._running_abandoned += delta
+            INFERENCE_ABANDONED.set(self._running_abandoned)
+
+    async def run(self, timeout: float | None, fn: Callable[..., R], *args: Any) -> R:
+        """Returns `fn(*args)`, raises InferenceTimeoutError after `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            executor = self._executor
+            future = executor.submit(fn, *args)
+            self._track(executor, future)
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+            except asyncio.TimeoutError:
+                self._abandon(executor, future)
+                raise InferenceTimeoutError(
+                    f"Inference did not finish within {timeout} s"
+                ) from None
+            except (BrokenProcessPool, asyncio.CancelledError):
+                task = asyncio.current_task()
+                if executor is self._executor or (task and task.cancelling()):
+                    raise
+                # The pool was replaced because of another call, not this one
+                if deadline is not None and loop.time() >= deadline:
+                    raise InferenceTimeoutError(
+                        f"Inference did not finish within {timeout} s"
+                    ) from None
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LifoGate:
+    """Admits up to `slots` holders at a time, the last one to arrive goes first.
+
+    Under overload the messages waiting for an inference slot are the prefetch
+    window of the consumer, serving the newest one first keeps the scored
+    transactions fresh while the older ones age out.
+    """
+
+    def __init__(self, slots: int):
+        self._free = slots
+        self._waiters: list[asyncio.Future] = []
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def __aenter__(self) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.cancelled():
+                self._waiters.remove(waiter)
+            else:
+                # The slot was handed over just before the cancellation
+                self._release()
+            raise
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.pop()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+import pytest
+from .inference import InferenceExecutor, InferenceTimeoutError, LifoGate
+
+
+def sleep_and_return(seconds: float, value: int) -> int:
+    time.sleep(seconds)
+    return value
+
+
+def child_pid() -> int:
+    return os.getpid()
+
+
+@pytest.mark.asyncio
+async def test_thread_executor_returns_result():
+    executor = InferenceExecutor("thread", 2)
+    try:
+        assert await executor.run(1.0, sleep_and_return, 0, 42) == 42
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stuck_threads_replace_the_pool():
+    executor = InferenceExecutor("thread", 1)
+    try:
+        with pytest.raises(InferenceTimeoutError):
+            await executor.run(0.05, sleep_and_return, 0.5, 1)
+        # The only thread is still busy, without a new pool this would time out
+        assert await executor.run(0.2, sleep_and_return, 0, 2) == 2
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_queued_call_is_cancelled_at_its_deadline():
+    executor = InferenceExecutor("thread", 2)
+    try:
+        slow = asyncio.ensure_future(executor.run(1.0, sleep_and_return, 0.3, 1))
+        busy = asyncio.ensure_future(executor.run(1.0, sleep_and_return, 0.3, 2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(InferenceTimeoutError):
+            await executor.run(0.05, sleep_and_return, 0, 3)
+        assert await asyncio.gather(slow, busy) == [1, 2]
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stuck_process_is_killed():
+    executor = InferenceExecutor("process", 1)
+    try:
+        pid = await executor.run(30.0, child_pid)
+        with pytest.raises(InferenceTimeoutError):
+            await executor.run(0.5, sleep_and_return, 60, 1)
+
+        assert await executor.run(30.0, sleep_and_return, 0, 2) == 2
+        assert await executor.run(30.0, child_pid) != pid
+        await asyncio.sleep(0.1)
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_lifo_gate_admits_newest_waiter_first():
+    gate = LifoGate(1)
+    order = []
+
+    async def hold(name: str) -> None:
+        async with gate:
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    first = asyncio.ensure_future(hold("first"))
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(hold(name)) for name in ("old", "mid", "new")]
+    await asyncio.sleep(0)
+    waiters[1].cancel()
+    await asyncio.gather(first, *waiters, return_exceptions=True)
+
+    assert order == ["first", "new", "old"]
+    assert gate.waiting == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["thread", "process"])
+async def test_queued_counts_calls_waiting_for_a_slot(kind: str):
+    executor = InferenceExecutor(kind, 1)
+    try:
+        calls = [
+            asyncio.ensure_future(executor.run(30.0, sleep_and_return, 0.2, i))
+            for i in range(4)
+        ]
+        await asyncio.sleep(0)
+        assert executor.queued == 3
+        assert await asyncio.gather(*calls) == [0, 1, 2, 3]
+        assert executor.queued == 0
+    finally:
+        executor.shutdown()
@@ -1,18 +1,57 @@
 import asyncio
+import contextlib
 import logging
 import signal
+import threading
 import time
-from typing import Awaitable, Callable
+from collections.abc import Mapping
+from typing import Any, Awaitable, Callable, TypeVar
 from pydantic import ValidationError
-from asyncpg import PostgresError
-from aio_pika.abc import AbstractIncomingMessage
-from src.db import crud
-from src.db.database import SessionLocal
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractQueue,
+)
 from src.oracle.base import BaseClassifier
 from src.oracle.dummy import DummyClassifier
-from src.schemas.transaction import ClassificationResult, Priority, TransactionInput
-from src.config.config import settings
-from src.pubsub.pubsub import get_connection, QueueName
+from src.oracle.features import AddressFeatureStore
+from src.oracle.registry import LoadedModel, ModelRegistry
+from src.oracle.watchlist import Watchlist
+from src.schemas.transaction import (
+    ClassificationResult,
+    ClassifiedTransaction,
+    Priority,
+    TransactionInput,
+)
+from src.config.config import get_settings
+from src.telemetry.metrics import (
+    REGISTRY,
+    Counter,
+    Histogram,
+    start_metrics_server,
+)
+from src.telemetry import profiler
+from src.telemetry.tracing import (
+    ENQUEUED_AT_HEADER,
+    TRACEPARENT_HEADER,
+    TraceContext,
+    configure_tracing,
+    tracer,
+)
+from src.pubsub.sharding import ShardBalancer
+from src.pubsub.pubsub import (
+    RETRY_COUNT_HEADER,
+    QueueName,
+    declare_results_exchange,
+    declare_transaction_queue,
+    get_connection,
+    publish_reply,
+    publish_result,
+    publish_retry,
+)
+from src.pubsub.stream import StreamConsumer, stream_mode
+from src.worker.inference import InferenceExecutor, InferenceTimeoutError, LifoGate
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -20,54 +59,502 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 shutdown_event = asyncio.Event()
+background_tasks: set[asyncio.Task] = set()
+
+R = TypeVar("R")
+
+# SQLAlchemy is only imported once the first HIGH transaction has to be saved (or by
+# the background warm-up), so the worker starts consuming without paying for it
+SessionLocal = None
+_database_lock = threading.Lock()
+
+
+QUEUE_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "worker_queue_wait_seconds", "Time from publish until delivery to the worker"
+    )
+)
+EXECUTOR_WAIT_SECONDS = REGISTRY.register(
+    Histogram("worker_executor_wait_seconds", "Time waiting for a free executor slot")
+)
+INFERENCE_SECONDS = REGISTRY.register(
+    Histogram("worker_inference_seconds", "Time spent in classifier.predict")
+)
+DB_WRITE_SECONDS = REGISTRY.register(
+    Histogram("worker_db_write_seconds", "Time spent saving HIGH transactions")
+)
+MESSAGES_TOTAL = REGISTRY.register(
+    Counter("worker_messages_total", "Processed messages by outcome", ["outcome"])
+)
+WATCHLIST_MATCHES_TOTAL = REGISTRY.register(
+    Counter("worker_watchlist_matches_total", "Messages matched by the watchlist")
+)
+INFERENCE_DEADLINE_EXCEEDED_TOTAL = REGISTRY.register(
+    Counter(
+        "worker_inference_deadline_exceeded_total",
+        "Classifications past their deadline by action taken",
+        ["action"],
+    )
+)
+STALE_TOTAL = REGISTRY.register(
+    Counter(
+        "worker_stale_total",
+        "Transactions older than STALE_AFTER_S by action taken",
+        ["action"],
+    )
+)
+TRANSACTION_AGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "worker_transaction_age_seconds",
+        "Age of the transaction (from its timestamp) when it is scored",
+        buckets=(0.5, 1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600),
+    )
+)
+
+# Recorded as the model version of the transactions flagged by the watchlist
+WATCHLIST_MODEL_VERSION = "watchlist"
+# and of the ones that missed their inference deadline without a fallback model
+UNSCORED_MODEL_VERSION = "unscored"
+
+TIMEOUT_POLICIES = ("requeue", "fallback", "unscored")
+STALE_POLICIES = ("skip", "fallback")
+SCHEDULING = ("fifo", "lifo")
+
+# Classifier of an inference child process, see InferenceExecutor
+_process_classifier: BaseClassifier | None = None
+_process_refreshed = 0.0
+
+
+class PersistenceError(Exception):
+    pass
+
+
+class InFlight:
+    """Counts messages being processed, so shutdown can wait for them."""
+
+    def __init__(self):
+        self.count = 0
+        # Futures of the running loop, the counter outlives a loop in embedded mode
+        self._waiters: list[asyncio.Future] = []
+
+    def __enter__(self) -> None:
+        self.count += 1
+
+    def __exit__(self, *exc_info) -> None:
+        self.count -= 1
+        if self.count == 0:
+            for waiter in self._waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            self._waiters.clear()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        if self.count == 0:
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+in_flight = InFlight()
+
+
+def timed(fn: Callable[..., R], *args: Any) -> tuple[R, int, int]:
+    """Runs `fn` returning its result with the wall clock start and end in ns."""
+    start_ns = time.time_ns()
+    result = fn(*args)
+    return result, start_ns, time.time_ns()
 
 
 def work_classify(
-    classifier: BaseClassifier, transaction: TransactionInput
+    classifier: BaseClassifier,
+    transaction: TransactionInput,
+    features: Mapping[str, float] | None = None,
 ) -> ClassificationResult:
+    settings = get_settings()
+    model_version = None
+    if isinstance(classifier, ModelRegistry):
+        # Pin the active model, a hot swap may happen while predicting
+        model = classifier.active
+        classifier, model_version = model.classifier, model.version
+
     time_start = time.perf_counter()
-    risk_score = classifier.predict(transaction)
+    risk_score = classifier.predict(transaction, features)
     time_end = time.perf_counter()
 
     inference_time_ms = round((time_end - time_start) * 1_000)
     priority = Priority.HIGH if risk_score > settings.risk_threshold else Priority.LOW
 
     return ClassificationResult(
-        risk_score=risk_score, inference_time_ms=inference_time_ms, priority=priority
+        risk_score=risk_score,
+        inference_time_ms=inference_time_ms,
+        priority=priority,
+        model_version=model_version,
+    )
+
+
+def watchlist_result() -> ClassificationResult:
+    return ClassificationResult(
+        risk_score=1.0,
+        inference_time_ms=0,
+        priority=Priority.HIGH,
+        model_version=WATCHLIST_MODEL_VERSION,
+    )
+
+
+def unscored_result() -> ClassificationResult:
+    settings = get_settings()
+    risk_score = settings.inference_unscored_risk_score
+    return ClassificationResult(
+        risk_score=risk_score,
+        inference_time_ms=0,
+        priority=Priority.HIGH
+        if risk_score > settings.risk_threshold
+        else Priority.LOW,
+        model_version=UNSCORED_MODEL_VERSION,
+    )
+
+
+def fallback_result(
+    fallback: LoadedModel | None,
+    transaction: TransactionInput,
+    features: Mapping[str, float] | None = None,
+) -> ClassificationResult:
+    if fallback is None:
+        return unscored_result()
+    # Runs on the event loop, the fallback is meant to be a cheap linear model
+    result = work_classify(fallback.classifier, transaction, features)
+    return result.model_copy(update={"model_version": fallback.version})
+
+
+def get_fallback_model() -> LoadedModel | None:
+    settings = get_settings()
+    if not settings.inference_fallback_version:
+        return None
+    return ModelRegistry(settings.model_dir).load(settings.inference_fallback_version)
+
+
+def init_inference_process(dummy: bool) -> None:
+    global _process_classifier
+    # Shutdown is driven by the parent, a Ctrl-C reaches the whole process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _process_classifier = get_classifier(dummy)
+
+
+def process_classify(
+    transaction: TransactionInput, features: Mapping[str, float] | None = None
+) -> ClassificationResult:
+    global _process_refreshed
+    settings = get_settings()
+    classifier = _process_classifier
+    if classifier is None:
+        raise RuntimeError("Inference process not initialized")
+    if isinstance(classifier, ModelRegistry):
+        # No event loop to watch the model directory, it is checked between calls
+        now = time.monotonic()
+        if now - _process_refreshed >= settings.model_poll_interval_s:
+            _process_refreshed = now
+            try:
+                classifier.refresh()
+            except Exception:
+                logger.exception("Could not reload model, keeping the active one")
+    return work_classify(classifier, transaction, features)
+
+
+def get_inference_executor(max_workers: int | None = None) -> InferenceExecutor:
+    settings = get_settings()
+    if max_workers is None:
+        max_workers = settings.inference_max_workers
+    if settings.inference_executor == "process":
+        return InferenceExecutor(
+            "process",
+            max_workers,
+            init_inference_process,
+            (settings.use_dummy,),
+        )
+    return InferenceExecutor(settings.inference_executor, max_workers)
+
+
+def get_watchlist() -> Watchlist | None:
+    settings = get_settings()
+    if not settings.watchlist_file:
+        return None
+    watchlist = Watchlist(settings.watchlist_file)
+    watchlist.refresh()
+    return watchlist
+
+
+def get_feature_store() -> AddressFeatureStore | None:
+    settings = get_settings()
+    if not settings.address_feature_windows_s:
+        return None
+    return AddressFeatureStore(
+        settings.address_feature_windows_s,
+        settings.address_feature_buckets,
+        settings.address_feature_memory_mb * 1024 * 1024,
     )
 
 
 def get_classifier(dummy: bool) -> BaseClassifier:
+    settings = get_settings()
     if dummy:
         return DummyClassifier()
     else:
-        raise Exception("Real ML Oracle not implemented")
+        registry = ModelRegistry(settings.model_dir, settings.model_warmup_samples)
+        registry.refresh()
+        return registry
+
+
+def init_database():
+    """Imports the database layer and binds the engine, once, from any thread."""
+    global SessionLocal
+    with _database_lock:
+        if SessionLocal is None:
+            import src.db.crud  # noqa: F401
+            from src.db.database import SessionLocal as session_factory, init_engine
+
+            init_engine()
+            SessionLocal = session_factory
+    return SessionLocal
+
+
+async def get_session_factory():
+    if SessionLocal is not None:
+        return SessionLocal
+    # Waits for the warm-up thread if it is already importing, off the event loop
+    return await asyncio.to_thread(init_database)
+
+
+async def save_transaction(
+    transaction: TransactionInput, result: ClassificationResult
+) -> None:
+    session_factory = await get_session_factory()
+    from sqlalchemy.exc import SQLAlchemyError
+    from src.db import crud
+
+    try:
+        async with session_factory() as session:
+            await crud.create_transaction(session, transaction, result)
+    except SQLAlchemyError as e:
+        raise PersistenceError(e) from e
+
+
+async def load_stream_offset(name: str) -> int | None:
+    session_factory = await get_session_factory()
+    from src.db import crud
+
+    async with session_factory() as session:
+        return await crud.get_stream_offset(session, name)
+
+
+async def save_stream_offset(name: str, offset: int) -> None:
+    session_factory = await get_session_factory()
+    from src.db import crud
+
+    async with session_factory() as session:
+        await crud.save_stream_offset(session, name, offset)
+
+
+def stream_consumer_name() -> str:
+    settings = get_settings()
+    return (
+        f"{QueueName.TRANSACTION.value}:"
+        f"{settings.stream_partition}/{settings.stream_partitions}"
+    )
 
 
 def callback_with_classifier(
-    classifier: BaseClassifier,
+    classifier: BaseClassifier | None,
+    results_exchange: AbstractExchange | None = None,
+    reply_exchange: AbstractExchange | None = None,
+    feature_store: AddressFeatureStore | None = None,
+    watchlist: Watchlist | None = None,
+    persist: bool = True,
+    executor: InferenceExecutor | None = None,
+    retry_exchange: AbstractExchange | None = None,
+    fallback: LoadedModel | None = None,
 ) -> Callable[[AbstractIncomingMessage], Awaitable[None]]:
+    """Builds the consumer callback.
+
+    `classifier` is None when `executor` runs in child processes, each one loads
+    its own. A message that misses the inference deadline is republished through
+    `retry_exchange` or classified by the timeout policy. Transactions older than
+    STALE_AFTER_S are skipped or scored by `fallback` instead of the model.
+    """
+    settings = get_settings()
+    if executor is None:
+        executor = InferenceExecutor("thread", settings.inference_max_workers)
+    timeout = settings.inference_timeout_s or None
+    policy = settings.inference_timeout_policy
+    if policy not in TIMEOUT_POLICIES:
+        raise ValueError(f"Unknown timeout policy {policy!r}, use {TIMEOUT_POLICIES}")
+    stale_after_s = settings.stale_after_s
+    stale_policy = settings.stale_policy
+    if stale_policy not in STALE_POLICIES:
+        raise ValueError(f"Unknown stale policy {stale_policy!r}, use {STALE_POLICIES}")
+    if settings.worker_scheduling not in SCHEDULING:
+        raise ValueError(
+            f"Unknown scheduling {settings.worker_scheduling!r}, use {SCHEDULING}"
+        )
+    # Prefetched messages wait here for an executor slot, the newest one goes first
+    gate = (
+        LifoGate(executor.max_workers) if settings.worker_scheduling == "lifo" else None
+    )
+
     async def callback(message: AbstractIncomingMessage) -> None:
+        received_ns = time.time_ns()
+        headers = message.headers or {}
+        parent = TraceContext.from_traceparent(headers.get(TRACEPARENT_HEADER))
+        enqueued_ns = headers.get(ENQUEUED_AT_HEADER)
+        if isinstance(enqueued_ns, int):
+            QUEUE_WAIT_SECONDS.observe(max(received_ns - enqueued_ns, 0) / 1e9)
+            tracer.record_span("queue.wait", parent, enqueued_ns, received_ns)
+
+        with in_flight, tracer.span("worker.process", parent) as span:
+            await process(message, span.context if span else None)
+
+    async def classify(
+        transaction: TransactionInput,
+        features: Mapping[str, float] | None,
+        trace: TraceContext | None,
+    ) -> ClassificationResult:
+        submitted_ns = time.time_ns()
+        if executor.kind == "process":
+            call = (process_classify, transaction, features)
+        else:
+            call = (work_classify, classifier, transaction, features)
+        result, started_ns, ended_ns = await executor.run(timeout, timed, *call)
+        EXECUTOR_WAIT_SECONDS.observe((started_ns - submitted_ns) / 1e9)
+        INFERENCE_SECONDS.observe((ended_ns - started_ns) / 1e9)
+        tracer.record_span("executor.wait", trace, submitted_ns, started_ns)
+        tracer.record_span("inference", trace, started_ns, ended_ns)
+        return result
+
+    async def retry(message: AbstractIncomingMessage) -> bool:
+        """Republishes the message after a missed deadline, False if it should not."""
+        retries = (message.headers or {}).get(RETRY_COUNT_HEADER, 0)
+        if (
+            policy != "requeue"
+            or retry_exchange is None
+            # A synchronous caller is waiting, it gets the fallback instead
+            or message.reply_to
+            or not isinstance(retries, int)
+            or retries >= settings.inference_max_retries
+        ):
+            return False
+        msg, success = await publish_retry(retry_exchange, message, retries + 1)
+        if not success:
+            logger.warning("Could not requeue transaction: %s", msg)
+        return success
+
+    async def score(
+        message: AbstractIncomingMessage,
+        transaction: TransactionInput,
+        features: Mapping[str, float] | None,
+        trace: TraceContext | None,
+    ) -> ClassificationResult | None:
+        """Returns None when the message was settled without a result."""
+        age_s = max(time.time() - transaction.timestamp, 0.0)
+        TRANSACTION_AGE_SECONDS.observe(age_s)
+        # A synchronous caller is waiting for an answer whatever the age
+        if stale_after_s and age_s > stale_after_s and not message.reply_to:
+            if stale_policy == "skip":
+                STALE_TOTAL.inc("skipped")
+                await message.ack()
+                MESSAGES_TOTAL.inc("stale")
+                return None
+            result = fallback_result(fallback, transaction, features)
+            STALE_TOTAL.inc(
+                "unscored"
+                if result.model_version == UNSCORED_MODEL_VERSION
+                else "fallback"
+            )
+            return result
+
         try:
-            transaction = TransactionInput.model_validate_json(message.body)
-            result = await asyncio.get_event_loop().run_in_executor(
-                None, work_classify, classifier, transaction
+            return await classify(transaction, features, trace)
+        except InferenceTimeoutError as e:
+            if await retry(message):
+                logger.warning("%s, requeued %s", e, transaction.tx_hash)
+                INFERENCE_DEADLINE_EXCEEDED_TOTAL.inc("requeue")
+                await message.ack()
+                MESSAGES_TOTAL.inc("requeue")
+                return None
+            result = fallback_result(
+                None if policy == "unscored" else fallback, transaction, features
+            )
+            logger.warning(
+                "%s, %s scored by %s", e, transaction.tx_hash, result.model_version
             )
+            INFERENCE_DEADLINE_EXCEEDED_TOTAL.inc(
+                "unscored"
+                if result.model_version == UNSCORED_MODEL_VERSION
+                else "fallback"
+            )
+            return result
+
+    async def process(
+        message: AbstractIncomingMessage, trace: TraceContext | None
+    ) -> None:
+        try:
+            with tracer.span("decode", trace):
+                transaction = TransactionInput.model_validate_json(message.body)
+
+            # Updated on the event loop, the store is not shared with executor threads
+            features = None
+            if feature_store is not None:
+                features = feature_store.observe(transaction)
 
-            if result.priority == Priority.HIGH:
-                async with SessionLocal() as session:
-                    await crud.create_transaction(session, transaction, result)
+            if watchlist is not None and watchlist.matches(transaction):
+                WATCHLIST_MATCHES_TOTAL.inc()
+                result = watchlist_result()
+            else:
+                async with gate or contextlib.nullcontext():
+                    scored = await score(message, transaction, features, trace)
+                if scored is None:
+                    return
+                result = scored
+
+            if persist and result.priority == Priority.HIGH:
+                with tracer.span("db.write", trace):
+                    db_start = time.perf_counter()
+                    await save_transaction(transaction, result)
+                    DB_WRITE_SECONDS.observe(time.perf_counter() - db_start)
+
+            classified = ClassifiedTransaction(
+                tx_hash=transaction.tx_hash, **result.model_dump()
+            )
+            # Best effort: a failed publish must not requeue a saved transaction
+            if results_exchange is not None:
+                msg, success = await publish_result(results_exchange, classified)
+                if not success:
+                    logger.warning("Could not publish classification result: %s", msg)
+            if reply_exchange is not None and message.reply_to:
+                msg, success = await publish_reply(
+                    reply_exchange, message.reply_to, message.correlation_id, classified
+                )
+                if not success:
+                    logger.warning("Could not reply to %s: %s", message.reply_to, msg)
             await message.ack()
+            MESSAGES_TOTAL.inc("ack")
 
         except ValidationError as e:
             logger.error("Could not parse message into transaction: %s", e)
-            await message.nack()
-        except PostgresError as e:
+            # It will never parse, a requeue would deliver it forever
+            await message.reject()
+            MESSAGES_TOTAL.inc("reject")
+        except PersistenceError as e:
             logger.error("Could not save transaction to database: %s", e)
             await message.nack()
+            MESSAGES_TOTAL.inc("nack")
         except Exception:
             logger.exception("Unexpected error processing message")
             await message.nack()
+            MESSAGES_TOTAL.inc("nack")
 
     return callback
 
@@ -77,27 +564,232 @@ def handle_shutdown(sig: signal.Signals) -> None:
     shutdown_event.set()
 
 
+def handle_profile() -> None:
+    settings = get_settings()
+
+    async def run() -> None:
+        try:
+            await profiler.profile(
+                "worker",
+                settings.profile_duration_s,
+                settings.profile_dir,
+                settings.profile_interval_s,
+            )
+        except profiler.ProfilerBusyError:
+            logger.warning("Ignoring SIGUSR1, a profile is already running")
+        except Exception:
+            logger.exception("Profiling failed")
+
+    logger.info(
+        "Received SIGUSR1, profiling for %.0f s...", settings.profile_duration_s
+    )
+    profile_task = asyncio.create_task(run())
+    # Keep a reference, the loop only holds weak references to tasks
+    background_tasks.add(profile_task)
+    profile_task.add_done_callback(background_tasks.discard)
+
+
+class WorkerConsumer:
+    """Consumes the transaction queues of `channel` until `stop`.
+
+    Runs in the worker process and, in embedded mode, inside the API process on a
+    channel of the in-process broker. Without `persist` the HIGH transactions are
+    only published as results, for deployments without a database. Synchronous
+    classifications are consumed on `classify_channel`, with its own prefetch,
+    and run on their own executor, so a caller does not wait behind the ingest
+    backlog. Shards are consumed on `shard_channel`, which should have a
+    prefetch of 1, see ShardBalancer.
+    """
+
+    def __init__(
+        self,
+        channel: AbstractChannel,
+        persist: bool = True,
+        classify_channel: AbstractChannel | None = None,
+        shard_channel: AbstractChannel | None = None,
+    ):
+        self.channel = channel
+        self.persist = persist
+        self.classify_channel = classify_channel or channel
+        self.shard_channel = shard_channel or channel
+        self._consumers: list[tuple[AbstractQueue, str]] = []
+        self._balancer: ShardBalancer | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._warm_up_task: asyncio.Task | None = None
+        self._executor: InferenceExecutor | None = None
+        self._classify_executor: InferenceExecutor | None = None
+        self._stream: StreamConsumer | None = None
+
+    async def start(self) -> None:
+        settings = get_settings()
+        channel = self.channel
+        queue = await declare_transaction_queue(channel)
+        classify_channel = self.classify_channel
+        classify_queue = await classify_channel.declare_queue(
+            name=QueueName.CLASSIFY, durable=True
+        )
+        results_exchange = await declare_results_exchange(channel)
+        self._executor = get_inference_executor()
+        self._classify_executor = get_inference_executor(settings.classify_max_workers)
+        profiler.register_executor(self._executor)
+        profiler.register_executor(self._classify_executor)
+        # The inference processes load their own model
+        classifier = None
+        if self._executor.kind == "thread":
+            classifier = get_classifier(settings.use_dummy)
+        watchlist = get_watchlist()
+        feature_store = get_feature_store()
+        fallback = get_fallback_model()
+        callback = callback_with_classifier(
+            classifier,
+            results_exchange,
+            channel.default_exchange,
+            feature_store,
+            watchlist,
+            self.persist,
+            self._executor,
+            channel.default_exchange,
+            fallback,
+        )
+        classify_callback = callback_with_classifier(
+            classifier,
+            results_exchange,
+            classify_channel.default_exchange,
+            feature_store,
+            watchlist,
+            self.persist,
+            self._classify_executor,
+            fallback=fallback,
+        )
+        self._consumers.append(
+            (classify_queue, await classify_queue.consume(classify_callback))
+        )
+        consumed_queues = []
+        if stream_mode():
+            # Offsets are only kept with a database, else a restart begins again
+            # at STREAM_START_OFFSET
+            self._stream = StreamConsumer(
+                queue,
+                callback,
+                stream_consumer_name(),
+                settings.stream_start_offset,
+                load_stream_offset if self.persist else None,
+                save_stream_offset if self.persist else None,
+                settings.stream_ack_batch,
+                settings.stream_commit_interval_s,
+                settings.stream_partitions,
+                settings.stream_partition,
+                settings.stream_retry_delay_s,
+                settings.stream_retry_max_delay_s,
+            )
+            await self._stream.start()
+        else:
+            # The unsharded queue is still consumed, it may hold messages from
+            # before sharding was enabled
+            consumed_queues.append(queue)
+        for consumed in consumed_queues:
+            self._consumers.append((consumed, await consumed.consume(callback)))
+
+        if settings.shard_count > 0:
+            self._balancer = ShardBalancer(
+                self.shard_channel,
+                callback,
+                settings.shard_count,
+                settings.shard_heartbeat_interval_s,
+                settings.shard_member_ttl_s,
+            )
+            await self._balancer.start()
+            self._tasks.append(asyncio.create_task(self._balancer.run()))
+
+        if isinstance(classifier, ModelRegistry):
+            self._tasks.append(
+                asyncio.create_task(classifier.watch(settings.model_poll_interval_s))
+            )
+        if watchlist is not None:
+            self._tasks.append(
+                asyncio.create_task(watchlist.watch(settings.watchlist_poll_interval_s))
+            )
+
+        if self.persist:
+            # The database is only needed for HIGH results, get it ready in the background
+            self._warm_up_task = asyncio.create_task(asyncio.to_thread(init_database))
+
+    async def stop(self) -> None:
+        settings = get_settings()
+        logger.info("Stopping consumer...")
+        for queue, consumer_tag in self._consumers:
+            await queue.cancel(consumer_tag)
+        self._consumers.clear()
+        if self._stream is not None:
+            await self._stream.cancel()
+        for task in self._tasks:
+            task.cancel()
+        if self._balancer is not None:
+            await self._balancer.stop()
+
+        # Delivered messages are finished and acked before closing the connection,
+        # the rest of the prefetched ones are requeued by the broker
+        logger.info("Draining %d in-flight messages...", in_flight.count)
+        if not await in_flight.wait_idle(settings.worker_drain_timeout_s):
+            logger.warning(
+                "Drain timed out, %d messages will be redelivered", in_flight.count
+            )
+        if self._stream is not None:
+            # Commits the offset of everything finished, the rest is read again
+            await self._stream.close()
+        if self._warm_up_task is not None:
+            await self._warm_up_task
+        for executor in (self._executor, self._classify_executor):
+            if executor is not None:
+                profiler.unregister_executor(executor)
+                executor.shutdown()
+
+
 async def main() -> None:
+    settings = get_settings()
+    time_start = time.perf_counter()
     loop = asyncio.get_running_loop()
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(sig, handle_shutdown, sig)
+    loop.add_signal_handler(signal.SIGUSR1, handle_profile)
+
+    configure_tracing("worker")
+    metrics_server = None
+    if settings.worker_metrics_port:
+        metrics_server = await start_metrics_server(settings.worker_metrics_port)
 
     connection = await get_connection()
     async with connection:
         channel = await connection.channel()
-        await channel.set_qos(prefetch_count=32)
-        queue = await channel.declare_queue(name=QueueName.TRANSACTION, durable=True)
-        classifier = get_classifier(settings.use_dummy)
-        callback = callback_with_classifier(classifier)
-        consumer_tag = await queue.consume(callback)
+        # Streams need a prefetch count, the credit is returned by the batched acks
+        prefetch_count = (
+            settings.stream_prefetch_count
+            if stream_mode()
+            else settings.worker_prefetch_count
+        )
+        await channel.set_qos(prefetch_count=prefetch_count)
+        classify_channel = await connection.channel()
+        await classify_channel.set_qos(prefetch_count=settings.classify_prefetch_count)
+        shard_channel = None
+        if settings.shard_count > 0:
+            # Each shard is processed serially, nothing is prefetched behind it
+            shard_channel = await connection.channel()
+            await shard_channel.set_qos(prefetch_count=1)
+        consumer = WorkerConsumer(
+            channel, classify_channel=classify_channel, shard_channel=shard_channel
+        )
+        await consumer.start()
 
-        logger.info("Worker started, waiting for messages...")
+        logger.info(
+            "Worker started in %.0f ms, waiting for messages...",
+            (time.perf_counter() - time_start) * 1_000,
+        )
         await shutdown_event.wait()
+        await consumer.stop()
 
-        logger.info("Stopping consumer...")
-        await queue.cancel(consumer_tag)
-        # It immediately closes, it does not wait for messages that are being processed
-
+    if metrics_server is not None:
+        metrics_server.close()
+    tracer.shutdown()
     logger.info("Worker shutdown complete")
 
 
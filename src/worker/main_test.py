@@ -1,4 +1,7 @@
+import subprocess
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
 import pytest
 import pytest_asyncio
@@ -6,14 +9,17 @@ from unittest.mock import AsyncMock, patch
 from pytest_mock import MockerFixture
 from testcontainers.postgres import PostgresContainer
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from src.schemas.transaction import Priority, TransactionInput
+from src.schemas.transaction import ClassifiedTransaction, Priority, TransactionInput
 from src.config.config import settings
 from src.db.database import Base
 from src.db import crud
-from .main import work_classify, callback_with_classifier
+from src.oracle.registry import LoadedModel
+from src.oracle.watchlist import Watchlist, compile_watchlist
+from src.pubsub.pubsub import RETRY_COUNT_HEADER
+from .main import work_classify, callback_with_classifier, init_database
 
 
-def create_transaction(tx_hash_char: str = "a") -> TransactionInput:
+def create_transaction(tx_hash_char: str = "a", age_s: int = 0) -> TransactionInput:
     return TransactionInput(
         tx_hash="0x" + tx_hash_char * 64,
         from_address="0x" + "a" * 40,
@@ -21,7 +27,7 @@ def create_transaction(tx_hash_char: str = "a") -> TransactionInput:
         value_eth=1.0,
         gas_price_gwei=10,
         input_data="0x",
-        timestamp=int(time.time()),
+        timestamp=int(time.time()) - age_s,
     )
 
 
@@ -54,6 +60,34 @@ def test_work_classify_low_priority(mocker: MockerFixture):
     assert result.priority == Priority.LOW
 
 
+def test_import_does_not_build_settings():
+    code = (
+        "import src.worker.main\n"
+        "from src.config.config import get_settings\n"
+        "print(get_settings.cache_info().misses)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "0"
+
+
+def test_init_database_runs_once_across_threads(mocker: MockerFixture):
+    mocker.patch("src.worker.main.SessionLocal", None)
+
+    def slow_init_engine():
+        time.sleep(0.05)
+
+    init_engine = mocker.patch(
+        "src.db.database.init_engine", side_effect=slow_init_engine
+    )
+    with ThreadPoolExecutor(4) as pool:
+        factories = list(pool.map(lambda _: init_database(), range(4)))
+
+    init_engine.assert_called_once()
+    assert all(factory is factories[0] for factory in factories)
+
+
 # ------------------------------
 # Testcontainers - postgres
 # ------------------------------
@@ -134,3 +168,183 @@ async def test_callback_does_not_save_low_risk_transaction(
     async with db_session() as session:
         transactions = await crud.get_transactions(session, offset=0, limit=10)
         assert len(transactions) == 0
+
+
+@pytest.mark.asyncio
+async def test_callback_publishes_result(mocker: MockerFixture):
+    mock_classifier = mocker.Mock()
+    mock_classifier.predict.return_value = settings.risk_threshold
+    results_exchange = mocker.Mock()
+    results_exchange.publish = AsyncMock()
+
+    tx = create_transaction("c")
+    mock_message = create_mock_message(mocker, tx)
+
+    callback = callback_with_classifier(mock_classifier, results_exchange)
+    await callback(mock_message)
+
+    mock_message.ack.assert_called_once()
+    published = results_exchange.publish.call_args
+    assert published.kwargs["routing_key"] == Priority.LOW.value
+    result = ClassifiedTransaction.model_validate_json(published.args[0].body)
+    assert result.tx_hash == tx.tx_hash
+    assert result.risk_score == settings.risk_threshold
+
+
+@pytest.mark.asyncio
+async def test_watchlist_match_skips_classifier(mocker: MockerFixture, tmp_path):
+    tx = create_transaction("d")
+    compile_watchlist([tx.from_address], tmp_path / "watchlist.bin")
+    watchlist = Watchlist(tmp_path / "watchlist.bin")
+    watchlist.refresh()
+    mock_classifier = mocker.Mock()
+    save = mocker.patch("src.worker.main.save_transaction", new=AsyncMock())
+    mock_message = create_mock_message(mocker, tx)
+
+    callback = callback_with_classifier(mock_classifier, watchlist=watchlist)
+    await callback(mock_message)
+
+    mock_classifier.predict.assert_not_called()
+    mock_message.ack.assert_called_once()
+    _, result = save.call_args.args
+    assert result.priority == Priority.HIGH
+    assert result.model_version == "watchlist"
+
+
+def slow_classifier(mocker: MockerFixture, seconds: float):
+    mock_classifier = mocker.Mock()
+    mock_classifier.predict.side_effect = lambda *_: time.sleep(seconds) or 0.5
+    return mock_classifier
+
+
+@pytest.mark.asyncio
+async def test_missed_deadline_requeues_with_retry_count(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "inference_timeout_s", 0.05)
+    monkeypatch.setattr(settings, "inference_timeout_policy", "requeue")
+    retry_exchange = mocker.Mock()
+    retry_exchange.publish = AsyncMock()
+    results_exchange = mocker.Mock()
+    results_exchange.publish = AsyncMock()
+    mock_message = create_mock_message(mocker, create_transaction("e"))
+    mock_message.headers = {}
+    mock_message.reply_to = None
+    mock_message.routing_key = "transaction"
+
+    callback = callback_with_classifier(
+        slow_classifier(mocker, 0.3), results_exchange, retry_exchange=retry_exchange
+    )
+    await callback(mock_message)
+
+    mock_message.ack.assert_called_once()
+    results_exchange.publish.assert_not_called()
+    published = retry_exchange.publish.call_args
+    assert published.kwargs["routing_key"] == "transaction"
+    assert published.args[0].headers[RETRY_COUNT_HEADER] == 1
+
+
+@pytest.mark.asyncio
+async def test_missed_deadline_after_retries_is_unscored(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "inference_timeout_s", 0.05)
+    monkeypatch.setattr(settings, "inference_timeout_policy", "requeue")
+    monkeypatch.setattr(settings, "inference_max_retries", 2)
+    retry_exchange = mocker.Mock()
+    retry_exchange.publish = AsyncMock()
+    results_exchange = mocker.Mock()
+    results_exchange.publish = AsyncMock()
+    mock_message = create_mock_message(mocker, create_transaction("f"))
+    mock_message.headers = {RETRY_COUNT_HEADER: 2}
+    mock_message.reply_to = None
+
+    callback = callback_with_classifier(
+        slow_classifier(mocker, 0.3), results_exchange, retry_exchange=retry_exchange
+    )
+    await callback(mock_message)
+
+    mock_message.ack.assert_called_once()
+    retry_exchange.publish.assert_not_called()
+    result = ClassifiedTransaction.model_validate_json(
+        results_exchange.publish.call_args.args[0].body
+    )
+    assert result.model_version == "unscored"
+    assert result.risk_score == settings.inference_unscored_risk_score
+
+
+@pytest.mark.asyncio
+async def test_missed_deadline_uses_fallback_model(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "inference_timeout_s", 0.05)
+    monkeypatch.setattr(settings, "inference_timeout_policy", "fallback")
+    fallback_classifier = mocker.Mock()
+    fallback_classifier.predict.return_value = settings.risk_threshold + 0.1
+    save = mocker.patch("src.worker.main.save_transaction", new=AsyncMock())
+    mock_message = create_mock_message(mocker, create_transaction("1"))
+
+    callback = callback_with_classifier(
+        slow_classifier(mocker, 0.3),
+        fallback=LoadedModel(version="fallback-v1", classifier=fallback_classifier),
+    )
+    started = time.perf_counter()
+    await callback(mock_message)
+
+    assert time.perf_counter() - started < 0.25
+    mock_message.ack.assert_called_once()
+    _, result = save.call_args.args
+    assert result.priority == Priority.HIGH
+    assert result.model_version == "fallback-v1"
+
+
+@pytest.mark.asyncio
+async def test_stale_transaction_is_skipped(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "stale_after_s", 30.0)
+    monkeypatch.setattr(settings, "stale_policy", "skip")
+    mock_classifier = mocker.Mock()
+    results_exchange = mocker.Mock()
+    results_exchange.publish = AsyncMock()
+    mock_message = create_mock_message(mocker, create_transaction("2", age_s=60))
+    mock_message.reply_to = None
+
+    callback = callback_with_classifier(mock_classifier, results_exchange)
+    await callback(mock_message)
+
+    mock_classifier.predict.assert_not_called()
+    results_exchange.publish.assert_not_called()
+    mock_message.ack.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_transaction_is_scored_by_fallback(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "stale_after_s", 30.0)
+    monkeypatch.setattr(settings, "stale_policy", "fallback")
+    mock_classifier = mocker.Mock()
+    fallback_classifier = mocker.Mock()
+    fallback_classifier.predict.return_value = 0.1
+    save = mocker.patch("src.worker.main.save_transaction", new=AsyncMock())
+    fresh = create_mock_message(mocker, create_transaction("3", age_s=5))
+    fresh.reply_to = None
+    mock_classifier.predict.return_value = settings.risk_threshold + 0.1
+    stale = create_mock_message(mocker, create_transaction("4", age_s=60))
+    stale.reply_to = None
+
+    callback = callback_with_classifier(
+        mock_classifier,
+        fallback=LoadedModel(version="fallback-v1", classifier=fallback_classifier),
+    )
+    await callback(fresh)
+    await callback(stale)
+
+    mock_classifier.predict.assert_called_once()
+    fallback_classifier.predict.assert_called_once()
+    stale.ack.assert_called_once()
+    # Only the fresh one was HIGH
+    save.assert_called_once()
+    _, result = save.call_args.args
+    assert result.model_version is None
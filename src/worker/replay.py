@@ -0,0 +1,155 @@
+"""
+Replays the transaction stream into a model version.
+
+Reads the stream (TRANSACTION_QUEUE_TYPE=stream) from an offset or a timestamp
+and classifies every transaction with `--model-version` of MODEL_DIR, which
+does not need to be the deployed one. HIGH results are saved with that model
+version next to the live ones, so the versions can be compared. The replay
+stops once no message arrived for `--idle-s` seconds. Its offset is committed
+as `replay:<version>`, and `--resume` continues from there.
+
+Usage:
+    uv run python -m src.worker.replay --model-version v2 --since 2026-10-19
+    uv run python -m src.worker.replay --model-version v2 --offset 1500000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from src.config.config import get_settings
+from src.oracle.registry import ModelRegistry
+from src.pubsub.pubsub import declare_transaction_queue, get_connection
+from src.pubsub.stream import StreamConsumer, stream_mode
+from src.worker.inference import InferenceExecutor
+from src.worker.main import (
+    callback_with_classifier,
+    get_feature_store,
+    get_watchlist,
+    in_flight,
+    load_stream_offset,
+    save_stream_offset,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def start_offset(value: str) -> datetime:
+    # Epoch seconds or an ISO 8601 date, e.g. 2026-01-31 or 2026-01-31T12:00:00+00:00
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value), tz=timezone.utc)
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+async def replay(
+    version: str,
+    start: int | datetime | str,
+    resume: bool = False,
+    idle_s: float = 10.0,
+    persist: bool = True,
+) -> tuple[int, int | None]:
+    """Returns the transactions replayed and the last committed offset."""
+    settings = get_settings()
+    if not stream_mode():
+        raise ValueError("Replay needs TRANSACTION_QUEUE_TYPE=stream")
+
+    registry = ModelRegistry(settings.model_dir, settings.model_warmup_samples)
+    registry.pin(version)
+    # Replayed transactions are old by definition
+    settings.stale_after_s = 0.0
+    # Threads share the pinned model, inference processes would load CURRENT
+    executor = InferenceExecutor("thread", settings.inference_max_workers)
+    classify = callback_with_classifier(
+        registry,
+        feature_store=get_feature_store(),
+        watchlist=get_watchlist(),
+        persist=persist,
+        executor=executor,
+    )
+    replayed = 0
+
+    async def callback(message) -> None:
+        nonlocal replayed
+        # Retries of a failed offset come through here again, count it once
+        if message.attempt == 0:
+            replayed += 1
+        await classify(message)
+
+    connection = await get_connection()
+    async with connection:
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=settings.stream_prefetch_count)
+        queue = await declare_transaction_queue(channel)
+        consumer = StreamConsumer(
+            queue,
+            callback,
+            f"replay:{version}",
+            start,
+            load_stream_offset if resume else None,
+            save_stream_offset if persist else None,
+            settings.stream_ack_batch,
+            settings.stream_commit_interval_s,
+            retry_delay_s=settings.stream_retry_delay_s,
+            retry_max_delay_s=settings.stream_retry_max_delay_s,
+        )
+        await consumer.start()
+        while (
+            in_flight.count
+            or consumer.retrying
+            or time.monotonic() - consumer.last_delivery < idle_s
+        ):
+            await asyncio.sleep(0.5)
+
+        await consumer.cancel()
+        await in_flight.wait_idle(settings.worker_drain_timeout_s)
+        await consumer.close()
+    executor.shutdown()
+    return replayed, consumer.tracker.committed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the transaction stream")
+    parser.add_argument("--model-version", required=True)
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--since", type=start_offset, help="Epoch seconds or ISO date")
+    start.add_argument("--offset", type=int)
+    start.add_argument(
+        "--resume", action="store_true", help="Continue the last replay of the version"
+    )
+    parser.add_argument("--idle-s", type=float, default=10.0)
+    parser.add_argument(
+        "--no-persist", action="store_true", help="Do not save HIGH results"
+    )
+    args = parser.parse_args()
+
+    if args.since is not None:
+        offset = args.since
+    elif args.offset is not None:
+        offset = args.offset
+    else:
+        offset = "first"
+    time_start = time.perf_counter()
+    replayed, committed = asyncio.run(
+        replay(
+            args.model_version,
+            offset,
+            args.resume,
+            args.idle_s,
+            not args.no_persist,
+        )
+    )
+    elapsed = time.perf_counter() - time_start
+    logger.info(
+        "Replayed %d transactions into %s in %.1f s (%.0f/s), last offset %s",
+        replayed,
+        args.model_version,
+        elapsed,
+        replayed / elapsed if elapsed else 0,
+        committed,
+    )
+
+
+if __name__ == "__main__":
+    main()